@@ -0,0 +1,51 @@
+# Contenido para: benchmarks/embedding_throughput.py
+
+"""
+Throughput de embeddings de consultas con y sin micro-batching.
+
+Carga el modelo real de `src/rag_retriever.py` y lanza N consultas distintas desde
+`--concurrency` hilos (como planificadores, auditores y el enrutador de varias tareas
+a la vez), primero contra el modelo directamente y después a través de `BatchedEmbeddings`.
+
+Uso:
+    python -m benchmarks.embedding_throughput --queries 256 --concurrency 16
+"""
+
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from src.embedding_batcher import BatchedEmbeddings
+from src.rag_retriever import model_name, model_kwargs, encode_kwargs
+
+
+def measure_throughput(embeddings, queries, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(embeddings.embed_query, queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de embeddings con y sin micro-batching.")
+    parser.add_argument("--queries", type=int, default=256, help="Consultas distintas por medición.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Hilos que piden embeddings a la vez.")
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs, encode_kwargs=encode_kwargs)
+    model.embed_query("calentamiento")
+    queries = [f"Crear una API REST para gestionar pedidos del cliente número {i}" for i in range(args.queries)]
+
+    direct = measure_throughput(model, queries, args.concurrency)
+    batched_embeddings = BatchedEmbeddings(model)
+    batched = measure_throughput(batched_embeddings, [f"{q}." for q in queries], args.concurrency)
+
+    print(f"Sin batching:  {direct:8.1f} consultas/s")
+    print(f"Con batching:  {batched:8.1f} consultas/s  (x{batched / direct:.1f})")
+    print(f"Métricas del batcher: {batched_embeddings.stats()}")
+
+
+if __name__ == "__main__":
+    main()
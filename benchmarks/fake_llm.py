@@ -0,0 +1,203 @@
+# Contenido para: benchmarks/fake_llm.py
+
+"""
+LLM falso y guionizado para medir la sobrecarga propia del grafo sin red.
+
+`ScriptedFakeLLM` es un `BaseChatModel` de LangChain: soporta `ainvoke`, `astream`
+y los callbacks de tokens, de modo que el streaming, la extracción de código y la
+instrumentación se ejercitan igual que con Groq o Gemini.
+"""
+
+import re
+import json
+import time
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def _messages_to_text(messages: List[BaseMessage]) -> str:
+    parts = []
+    for message in messages:
+        if isinstance(message.content, str):
+            parts.append(message.content)
+        else:
+            parts.extend(block.get("text", "") for block in message.content if isinstance(block, dict))
+    return "\n".join(parts)
+
+
+def _split_tokens(text: str) -> List[str]:
+    """Trocea el texto en "tokens" de ~4 caracteres conservando los espacios."""
+    return re.findall(r"\s*\S{1,4}|\s+", text)
+
+
+class ScriptedFakeLLM(BaseChatModel):
+    """
+    Responde con `script(prompt)` simulando la latencia de un proveedor real:
+    `latency_s` hasta el primer token y después `tokens_per_second`.
+    """
+
+    script: Callable[[str], str]
+    model_name: str = "fake-llm"
+    latency_s: float = 0.2
+    tokens_per_second: float = 400.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def _usage(self, prompt: str, text: str) -> dict:
+        input_tokens = len(prompt) // 4 + 1
+        output_tokens = len(text) // 4 + 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = _messages_to_text(messages)
+        text = self.script(prompt)
+        time.sleep(self.latency_s + len(_split_tokens(text)) / self.tokens_per_second)
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = _messages_to_text(messages)
+        text = self.script(prompt)
+        await asyncio.sleep(self.latency_s + len(_split_tokens(text)) / self.tokens_per_second)
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = _messages_to_text(messages)
+        text = self.script(prompt)
+        await asyncio.sleep(self.latency_s)
+        tokens = _split_tokens(text)
+        for index, token in enumerate(tokens):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk_message = AIMessageChunk(content=token)
+            if index == len(tokens) - 1:
+                chunk_message = AIMessageChunk(content=token, usage_metadata=self._usage(prompt, text))
+            chunk = ChatGenerationChunk(message=chunk_message)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+# --- Respuestas guionizadas ---
+
+FRONTEND_CODE = """<!--- index.html_CODE_START --->
+<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="UTF-8"><title>Benchmark</title><link rel="stylesheet" href="./style.css"></head>
+<body><main id="app"><h1>Hola</h1><button id="btn">Pulsar</button></main><script src="./script.js"></script></body>
+</html>
+<!--- index.html_CODE_END --->
+/* --- style.css_CODE_START --- */
+body { font-family: sans-serif; margin: 0; }
+#app { padding: 2rem; }
+/* --- style.css_CODE_END --- */
+// --- script.js_CODE_START ---
+document.getElementById("btn").addEventListener("click", () => alert("Hola"));
+// --- script.js_CODE_END ---
+"""
+
+BACKEND_CODE = """<!--- main.py_CODE_START --->
+from flask import Flask, jsonify
+
+app = Flask(__name__)
+
+@app.get("/api/items")
+def list_items():
+    return jsonify([])
+<!--- main.py_CODE_END --->
+<!--- requirements.txt_CODE_START --->
+flask
+<!--- requirements.txt_CODE_END --->
+"""
+
+DATABASE_CODE = """-- --- create_tables.sql_CODE_START ---
+CREATE TABLE items (id SERIAL PRIMARY KEY, name TEXT NOT NULL);
+-- --- create_tables.sql_CODE_END ---
+"""
+
+UI_SPEC = """## 1. Estructura General y Layout
+Cabecera, contenido central y pie.
+## 2. Paleta de Colores
+- #1E88E5 primario
+## 3. Tipografía
+Sans-serif 16px.
+## 4. Desglose de Componentes
+Botón primario.
+## 5. Recursos (Assets)
+Ninguno.
+"""
+
+PLANS = {
+    "database": {"plan_type": "database", "db_task": "Esquema de inventario.", "db_tech": "PostgreSQL"},
+    "frontend": {"plan_type": "frontend", "frontend_task": "Página a partir del mockup.", "frontend_tech": "HTML, CSS y JavaScript"},
+    "both": {
+        "plan_type": "both",
+        "frontend_task": "Interfaz de inventario.", "frontend_tech": "HTML, CSS y JavaScript",
+        "backend_task": "API REST de inventario.", "backend_tech": "Python con Flask",
+        "db_task": "Esquema de inventario.", "db_tech": "PostgreSQL",
+    },
+}
+
+_SCENARIO_TAG = re.compile(r"\[bench:(\w+):(\w+):(\d+)\]")
+
+
+class BenchmarkScript:
+    """
+    Decide la respuesta a partir del prompt. Cada petición de usuario lleva una
+    etiqueta `[bench:<escenario>:<sesión>:<rechazos>]` que fija el plan y cuántas
+    veces debe rechazar el auditor antes de aprobar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._audits: Dict[str, int] = {}
+
+    def __call__(self, prompt: str) -> str:
+        tag = _SCENARIO_TAG.search(prompt)
+        scenario, session, rejections = (tag.group(1), tag.group(2), int(tag.group(3))) if tag else ("chat", "?", 0)
+
+        if "enrutador de tareas experto" in prompt:
+            return {"chat": "conversational_agent", "database": "database_architech"}.get(scenario, "planner")
+        if "Eres DevTeam-Bot" in prompt:
+            return "[DECISION]\nEND\n[RESPONSE]\n¡Hola! Soy DevTeam-Bot, listo para ayudarte."
+        if "jefe de proyecto técnico" in prompt:
+            return json.dumps(PLANS.get(scenario, PLANS["both"]), ensure_ascii=False)
+        if "auditor de calidad" in prompt:
+            with self._lock:
+                done = self._audits.get(session, 0)
+                self._audits[session] = done + 1
+            if done < rejections:
+                return json.dumps({"approved": False, "feedback": "Añade validación de entradas y manejo de errores."})
+            return json.dumps({"approved": True, "feedback": "El código cumple con los estándares de calidad."})
+        if "diseñador UI/UX" in prompt:
+            return UI_SPEC
+        if "analista" in prompt:
+            return "El archivo contiene una captura de una interfaz web sencilla."
+        if "capa de datos" in prompt:
+            return DATABASE_CODE
+        if "código backend" in prompt:
+            return BACKEND_CODE
+        return FRONTEND_CODE
+
+
+def build_fake_llms(latency_s: float, tokens_per_second: float) -> dict:
+    """Crea los tres LLM falsos (mismo guion, distintos nombres de modelo)."""
+    script = BenchmarkScript()
+    return {
+        name: ScriptedFakeLLM(
+            script=script, model_name=f"fake-{name}", latency_s=latency_s,
+            tokens_per_second=tokens_per_second, cache=False,
+        )
+        for name in ("analytical", "creative", "conversational")
+    }
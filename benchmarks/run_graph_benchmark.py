@@ -0,0 +1,211 @@
+# Contenido para: benchmarks/run_graph_benchmark.py
+
+"""
+Benchmark offline del grafo multiagente.
+
+Sustituye los tres LLM por `ScriptedFakeLLM` (latencia y velocidad de tokens
+configurables) y el retriever de RAG por uno en memoria, y ejecuta escenarios
+representativos a través de `astream` con N sesiones concurrentes.
+
+Uso:
+    python -m benchmarks.run_graph_benchmark --sessions 8 --rounds 3 --latency 0.3 --tps 300
+"""
+
+import os
+
+# El clasificador por embeddings del enrutador local cargaría torch: se desactiva
+# antes de importar el grafo para medir solo la sobrecarga de la orquestación.
+os.environ.setdefault("FAST_ROUTER_EMBEDDINGS", "false")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("ANALYSIS_CACHE_ENABLED", "false")
+# Sin cuotas de proveedor: el LLM falso no tiene límites y se mide la orquestación.
+for _limit in ("RPM", "TPM", "RPD", "MAX_CONCURRENCY"):
+    os.environ.setdefault(f"GROQ_{_limit}", "0")
+    os.environ.setdefault(f"GEMINI_{_limit}", "0")
+
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import List
+
+from langchain_core.documents import Document
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.fake_llm import build_fake_llms
+from src import rag_retriever
+from src.model import override_llms
+from src.graph.workflow import build_graph
+from src.tools.workspace import get_workspace_dir
+
+BENCH_ASSETS_DIR = os.path.join("benchmarks", ".assets")
+
+# (nombre, petición del usuario, adjunta imagen, rechazos del auditor)
+SCENARIOS = {
+    "chat": ("Hola", False, 0),
+    "database": ("Solo necesito el esquema SQL de un inventario", False, 0),
+    "frontend": ("Crea la página web a partir de este mockup", True, 0),
+    "both": ("Crea una aplicación de inventario con API, base de datos e interfaz", False, 2),
+}
+
+
+class InMemoryRetriever:
+    """Retriever falso: evita cargar el modelo de embeddings y Chroma."""
+
+    def invoke(self, query: str) -> List[Document]:
+        return [Document(page_content=f"Principio de calidad relevante para: {query[:40]}") for _ in range(4)]
+
+
+@dataclass
+class SessionResult:
+    scenario: str
+    latency_s: float
+    time_to_first_token_s: float | None
+    supervisor_hops: int
+    events: int
+    error: str | None = None
+
+
+@dataclass
+class ScenarioReport:
+    scenario: str
+    sessions: int
+    p50_s: float
+    p95_s: float
+    mean_ttft_s: float | None
+    throughput_sessions_per_s: float
+    avg_supervisor_hops: float
+    errors: int
+    results: List[SessionResult] = field(default_factory=list)
+
+
+def _make_mockup() -> str:
+    """Crea un PNG mínimo para los escenarios que adjuntan una imagen."""
+    os.makedirs(BENCH_ASSETS_DIR, exist_ok=True)
+    path = os.path.join(BENCH_ASSETS_DIR, "mockup.png")
+    if not os.path.exists(path):
+        import base64
+        png = base64.b64decode(
+            "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        )
+        with open(path, "wb") as f:
+            f.write(png)
+    return path
+
+
+async def run_session(app, scenario: str, mockup_path: str) -> SessionResult:
+    text, with_file, rejections = SCENARIOS[scenario]
+    thread_id = f"bench-{uuid.uuid4().hex[:12]}"
+    session = thread_id.split("-")[1]
+    inputs = {
+        "user_input": f"{text} [bench:{scenario}:{session}:{rejections}]",
+        "supervisor_iterations": 0,
+        "file_paths": [mockup_path] if with_file else [],
+        "workspace_dir": get_workspace_dir(thread_id),
+        "chat_history": [],
+    }
+    config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 60}
+
+    start = time.perf_counter()
+    first_token = None
+    hops = 0
+    events = 0
+    error = None
+    try:
+        async for mode, chunk in app.astream(inputs, config=config, stream_mode=["updates", "messages", "custom"]):
+            events += 1
+            if mode == "messages" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif mode == "updates" and "supervisor" in chunk:
+                hops += 1
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        shutil.rmtree(inputs["workspace_dir"], ignore_errors=True)
+
+    return SessionResult(scenario, time.perf_counter() - start, first_token, hops, events, error)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(app, scenario: str, sessions: int, rounds: int, mockup_path: str) -> ScenarioReport:
+    results: List[SessionResult] = []
+    wall_start = time.perf_counter()
+    for _ in range(rounds):
+        results.extend(await asyncio.gather(*(run_session(app, scenario, mockup_path) for _ in range(sessions))))
+    wall = time.perf_counter() - wall_start
+
+    latencies = [r.latency_s for r in results]
+    ttfts = [r.time_to_first_token_s for r in results if r.time_to_first_token_s is not None]
+    return ScenarioReport(
+        scenario=scenario,
+        sessions=len(results),
+        p50_s=round(statistics.median(latencies), 3),
+        p95_s=round(_percentile(latencies, 95), 3),
+        mean_ttft_s=round(statistics.mean(ttfts), 3) if ttfts else None,
+        throughput_sessions_per_s=round(len(results) / wall, 2),
+        avg_supervisor_hops=round(statistics.mean(r.supervisor_hops for r in results), 2),
+        errors=sum(1 for r in results if r.error),
+        results=results,
+    )
+
+
+async def main_async(args) -> dict:
+    fake_llms = build_fake_llms(latency_s=args.latency, tokens_per_second=args.tps)
+    override_llms(**fake_llms)
+    rag_retriever.retriever = InMemoryRetriever()
+
+    app = build_graph(checkpointer=MemorySaver())
+    mockup_path = _make_mockup()
+
+    tracemalloc.start()
+    reports = []
+    for scenario in args.scenarios:
+        report = await run_scenario(app, scenario, args.sessions, args.rounds, mockup_path)
+        reports.append(report)
+        print(
+            f"{scenario:<10} sesiones={report.sessions:<4} p50={report.p50_s:>7.3f}s p95={report.p95_s:>7.3f}s "
+            f"ttft={report.mean_ttft_s}s throughput={report.throughput_sessions_per_s:>6.2f}/s "
+            f"hops={report.avg_supervisor_hops:>5.2f} errores={report.errors}"
+        )
+        for failed in [r for r in report.results if r.error][:3]:
+            print(f"   error: {failed.error}")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = {
+        "config": {"sessions": args.sessions, "rounds": args.rounds, "latency_s": args.latency, "tokens_per_second": args.tps},
+        "peak_python_memory_mb": round(peak / 1024 / 1024, 2),
+        "scenarios": [{k: v for k, v in asdict(r).items() if k != "results"} for r in reports],
+    }
+    print(f"Memoria Python máxima: {summary['peak_python_memory_mb']} MB")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del grafo con un LLM falso.")
+    parser.add_argument("--sessions", type=int, default=4, help="Sesiones concurrentes por ronda.")
+    parser.add_argument("--rounds", type=int, default=2, help="Rondas por escenario.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Segundos hasta el primer token.")
+    parser.add_argument("--tps", type=float, default=400.0, help="Tokens por segundo del LLM falso.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--json", dest="json_path", help="Guarda el resumen en este archivo JSON.")
+    args = parser.parse_args()
+
+    summary = asyncio.run(main_async(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,86 +3,334 @@
 import uvicorn
 import uuid
 import os
-import shutil
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from src.graph.workflow import build_graph
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from src.graph.checkpointer import open_checkpointer, prune_checkpoints, touch_thread
+from src.graph.memory import build_memory_graph, load_memory, append_turns, collect_turns
+from src.llm_cache import get_llm_cache_stats
+from src.tools.analysis_cache import get_analysis_cache_stats
+from src.model import validate_configuration
+from src.rag_retriever import initialize_rag, is_rag_ready, get_rag_cache_stats
+from src.tools.workspace import get_workspace_dir, cleanup_workspaces
+from src.tools.uploads import (
+    store_upload_stream, resolve_upload_paths, cleanup_uploads,
+    UploadTooLargeError, UPLOAD_WRITE_CHUNK_BYTES,
+)
+from src.tools.fast_router import router_metrics
+from src.tools.artifact_store import get_text, cleanup_artifacts
+from src.telemetry import setup_tracing, shutdown_tracing, node_metrics
+from src.llm_scheduler import llm_scheduler
+from src.model_router import model_router_metrics
+from src.events import EventChannel
 
-app = FastAPI()
+# Nodos cuyos tokens se reenvían al cliente a medida que el LLM los genera.
+STREAMED_NODES = {
+    "conversational_agent", "planner",
+    "develop_frontend", "develop_backend", "database_architech",
+}
+
+# Estado del calentamiento en segundo plano (modelos LLM, embeddings y Chroma).
+warmup_status = {"llm": False, "rag": False, "error": None, "seconds": None}
+
+def warm_up():
+    """Carga en segundo plano todo lo costoso que antes se hacía al importar los módulos."""
+    start = time.perf_counter()
+    try:
+        warmup_status["llm"] = validate_configuration()
+        initialize_rag()
+        warmup_status["rag"] = is_rag_ready()
+    except Exception as e:
+        print(f"Error durante el calentamiento: {e}")
+        warmup_status["error"] = str(e)
+    warmup_status["seconds"] = round(time.perf_counter() - start, 2)
+    print(f"Calentamiento finalizado en {warmup_status['seconds']}s: {warmup_status}")
+
+_retention_lock_file = None
+
+def acquire_retention_leadership() -> bool:
+    """
+    Con varios workers (serve.py) solo uno aplica la retención: el que consigue el
+    candado del archivo. Si ese worker muere, otro lo obtiene en su siguiente intento.
+    """
+    global _retention_lock_file
+    if _retention_lock_file is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True  # Windows: sin serve.py hay un único proceso
+    os.makedirs(".cache", exist_ok=True)
+    lock_file = open(os.path.join(".cache", "retention.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _retention_lock_file = lock_file
+    return True
+
+async def workspace_retention_loop(checkpointer):
+    """Aplica periódicamente la retención de carpetas de sesión, subidas, artefactos y checkpoints."""
+    while True:
+        if not acquire_retention_leadership():
+            await asyncio.sleep(3600)
+            continue
+        # Cada limpieza va protegida por separado: un fallo (un archivo ya borrado,
+        # un EACCES) no debe matar la tarea ni saltarse las demás.
+        for name, cleanup in (
+            ("carpetas de sesión", cleanup_workspaces),
+            ("subidas", cleanup_uploads),
+            ("artefactos", cleanup_artifacts),
+        ):
+            try:
+                await asyncio.to_thread(cleanup)
+            except Exception as e:
+                print(f"Error limpiando {name}: {e}")
+        try:
+            await prune_checkpoints(checkpointer)
+        except Exception as e:
+            print(f"Error podando checkpoints: {e}")
+        await asyncio.sleep(3600)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_tracing()
+    # El servidor empieza a aceptar conexiones de inmediato; la carga ocurre en un hilo.
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    async with open_checkpointer() as checkpointer:
+        # El grafo se compila una sola vez y todas las conexiones comparten el checkpointer,
+        # así una tarea sobrevive a la desconexión del websocket y se puede reanudar.
+        app.state.checkpointer = checkpointer
+        app.state.graph = build_graph(checkpointer=checkpointer)
+        app.state.memory_graph = build_memory_graph(checkpointer)
+        retention_task = asyncio.create_task(workspace_retention_loop(checkpointer))
+        yield
+        warmup_task.cancel()
+        retention_task.cancel()
+    shutdown_tracing()
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.get("/")
 async def get_root():
     return FileResponse("static/index.html")
 
+@app.get("/ready")
+async def readiness():
+    ready = warmup_status["llm"] and warmup_status["rag"]
+    return JSONResponse(content={"ready": ready, **warmup_status}, status_code=200 if ready else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return JSONResponse(content={
+        "llm": get_llm_cache_stats(),
+        "rag": get_rag_cache_stats(),
+        "analysis": get_analysis_cache_stats(),
+    })
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    """Contenido de un artefacto (código o texto largo) referenciado en los eventos del grafo."""
+    try:
+        text = await asyncio.to_thread(get_text, artifact_id)
+    except FileNotFoundError:
+        return JSONResponse(content={"error": "Artefacto no encontrado o caducado."}, status_code=404)
+    # Direccionado por contenido: el navegador puede cachearlo indefinidamente.
+    return PlainTextResponse(text, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/router/stats")
+async def router_stats():
+    return JSONResponse(content=router_metrics.snapshot())
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return JSONResponse(content=llm_scheduler.snapshot())
+
+@app.get("/models/stats")
+async def models_stats():
+    return JSONResponse(content=model_router_metrics.snapshot())
+
+@app.get("/metrics")
+async def metrics():
+    # Formato de exposición de Prometheus: histogramas por nodo y uso de tokens por modelo.
+    body = node_metrics.render_prometheus() + llm_scheduler.render_prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.put("/upload/{session_id}")
+async def upload_file_stream(session_id: str, filename: str, request: Request):
+    """
+    Subida en streaming de un único archivo (el cuerpo de la petición son sus bytes).
+    Se escribe y se hashea a medida que llega, sin pasar por el parser multipart.
+    """
+    declared_size = request.headers.get("content-length")
+    try:
+        stored = await store_upload_stream(
+            request.stream(), filename, session_id, int(declared_size) if declared_size else None
+        )
+    except UploadTooLargeError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return JSONResponse(content=stored)
+
+async def _iter_upload(file: UploadFile):
+    while chunk := await file.read(UPLOAD_WRITE_CHUNK_BYTES):
+        yield chunk
+
 @app.post("/upload")
-async def upload_files(files: list[UploadFile] = File(...)):
-    if not os.path.exists("uploads"):
-        os.makedirs("uploads")
-    filenames = []
-    for file in files:
-        file_path = os.path.join("uploads", file.filename)
-        with open(file_path, "wb", buffering=0) as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        filenames.append(file.filename)
-    return JSONResponse(content={"filenames": filenames})
+async def upload_files(session_id: str = Form(...), files: list[UploadFile] = File(...)):
+    """Subida multipart (compatibilidad): usa el mismo almacenamiento por sesión."""
+    stored = []
+    try:
+        for file in files:
+            stored.append(await store_upload_stream(_iter_upload(file), file.filename, session_id, file.size))
+    except UploadTooLargeError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return JSONResponse(content={"files": stored, "file_ids": [f["file_id"] for f in stored]})
+
+async def stream_task(channel: EventChannel, graph, inputs, config: dict) -> None:
+    """Ejecuta (o reanuda, si `inputs` es None) una tarea y reenvía sus eventos al cliente."""
+    # "updates": resultado de cada nodo (se envía como delta); "messages": tokens del LLM;
+    # "custom": eventos emitidos por los nodos (inicio de nodo, archivo escrito).
+    async for mode, chunk in graph.astream(
+        inputs, config=config, stream_mode=["updates", "messages", "custom"]
+    ):
+        if mode == "messages":
+            message_chunk, metadata = chunk
+            node_name = metadata.get("langgraph_node")
+            if node_name in STREAMED_NODES and isinstance(message_chunk.content, str) and message_chunk.content:
+                await channel.token(node_name, message_chunk.content)
+        elif mode == "custom":
+            await channel.custom(chunk)
+        elif chunk:
+            for node_name, update in chunk.items():
+                if not node_name.startswith("__"):
+                    await channel.node_update(node_name, update)
+
+# Actualizaciones de memoria en curso por conversación (además evita que el GC las cancele).
+_memory_tasks = {}
+
+async def remember_task(app, conversation_id, config):
+    """Añade a la memoria de la conversación los turnos de una tarea terminada."""
+    try:
+        snapshot = await app.state.graph.aget_state(config)
+        if snapshot.next:
+            return  # tarea interrumpida: se recordará al reanudarla
+        await append_turns(app.state.memory_graph, app.state.checkpointer, conversation_id, collect_turns(snapshot.values))
+    except Exception as e:
+        print(f"Error actualizando la memoria de la conversación {conversation_id}: {e}")
+
+def schedule_remember(app, conversation_id, config):
+    # El resumen puede requerir una llamada al LLM: no debe retrasar la siguiente petición.
+    task = asyncio.create_task(remember_task(app, conversation_id, config))
+    pending = _memory_tasks.setdefault(conversation_id, set())
+    pending.add(task)
+
+    def _forget(done):
+        pending.discard(done)
+        if not pending and _memory_tasks.get(conversation_id) is pending:
+            del _memory_tasks[conversation_id]
+
+    task.add_done_callback(_forget)
+
+async def wait_for_memory(conversation_id):
+    """Espera a que se guarden los turnos anteriores antes de construir el siguiente prompt."""
+    pending = _memory_tasks.get(conversation_id)
+    if pending:
+        # asyncio.wait no cancela las actualizaciones si se cancela quien espera.
+        await asyncio.wait(set(pending))
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("Nuevo cliente conectado. Las sesiones se crearán por tarea.")
+    graph = websocket.app.state.graph
+    checkpointer = websocket.app.state.checkpointer
+    channel = EventChannel(websocket)
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+            print(f"Mensaje recibido del cliente: {data}")
+
+            # --- Saludo: versión del protocolo y compresión de los eventos ---
+            if data.get("type") == "hello":
+                await channel.hello(data)
+                continue
 
-    async with AsyncSqliteSaver.from_conn_string(":memory:") as memory:
-        langgraph_app = build_graph(checkpointer=memory)
-        
+            # --- Reanudar una tarea interrumpida por una desconexión ---
+            resume_thread_id = data.get("resume_thread_id")
+            if resume_thread_id:
+                config = {"configurable": {"thread_id": resume_thread_id}}
+                snapshot = await graph.aget_state(config)
+                if snapshot.next:
+                    print(f"Reanudando la tarea {resume_thread_id} en {snapshot.next}")
+                    await channel.session(resume_thread_id, resumed=True)
+                    await touch_thread(checkpointer, resume_thread_id)
+                    await stream_task(channel, graph, None, config)
+                    schedule_remember(websocket.app, data.get("session_id"), config)
+                await channel.done(resume_thread_id)
+                continue
+
+            thread_id = str(uuid.uuid4())
+            config = {"configurable": {"thread_id": thread_id}}
+            print(f"Iniciando nueva tarea con sesión: {thread_id}")
+
+            user_input = data.get("user_input")
+            # Identificadores direccionados por contenido devueltos por /upload.
+            file_ids = data.get("file_ids", [])
+            # La sesión del navegador identifica también la conversación cuya memoria se usa.
+            session_id = data.get("session_id")
+
+            if not user_input and not file_ids:
+                continue
+
+            try:
+                file_paths = resolve_upload_paths(session_id, file_ids)
+            except ValueError as e:
+                await channel.error(str(e))
+                continue
+            workspace_dir = get_workspace_dir(thread_id)
+
+            # El historial vive en el servidor: turnos recientes literales + resumen de lo anterior.
+            await wait_for_memory(session_id)
+            summary, recent_turns = await load_memory(websocket.app.state.memory_graph, session_id)
+            inputs = {
+                "user_input": user_input,
+                "supervisor_iterations": 0,
+                "file_paths": file_paths,
+                "workspace_dir": workspace_dir,
+                "chat_history": recent_turns,
+                "conversation_summary": summary or None,
+            }
+
+            print(f"Invocando el grafo con la entrada ({len(recent_turns)} turnos de memoria): {inputs}")
+            # El cliente guarda el thread_id para poder reanudar si se corta la conexión.
+            await channel.session(thread_id)
+            await touch_thread(checkpointer, thread_id)
+            await stream_task(channel, graph, inputs, config)
+            schedule_remember(websocket.app, session_id, config)
+
+            # Los archivos subidos se conservan para la sesión del navegador (se
+            # pueden reutilizar sin volver a subirlos) y los elimina la retención.
+            await channel.done(thread_id)
+
+    except WebSocketDisconnect:
+        print("Cliente desconectado. Las tareas en curso se pueden reanudar desde su último checkpoint.")
+    except Exception as e:
+        print(f"Error fatal en el WebSocket: {e}")
         try:
-            while True:
-                data = await websocket.receive_json()
-                print(f"Mensaje recibido del cliente: {data}")
-                
-                thread_id = str(uuid.uuid4())
-                config = {"configurable": {"thread_id": thread_id}}
-                print(f"Iniciando nueva tarea con sesión: {thread_id}")
-
-                user_input = data.get("user_input")
-                file_names = data.get("file_names", [])
-                
-                # <-- CAMBIO CLAVE: Recibimos el historial conversacional del frontend
-                chat_history = data.get("chat_history", [])
-
-                if not user_input and not file_names:
-                    continue
-
-                file_paths = [os.path.join("uploads", f) for f in file_names]
-                
-                # <-- CAMBIO CLAVE: Inyectamos el historial en el estado inicial de la nueva tarea
-                inputs = {
-                    "user_input": user_input,
-                    "supervisor_iterations": 0,
-                    "file_paths": file_paths,
-                    "chat_history": chat_history 
-                }
-
-                print(f"Invocando el grafo con la entrada (con historial): {inputs}")
-                
-                async for event in langgraph_app.astream(inputs, config=config):
-                    if event:
-                        await websocket.send_json(event)
-                
-                for file_path in file_paths:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                print(f"Archivos de la tarea limpiados: {file_names}")
-
-                await websocket.send_json({"type": "done"})
-
-        except WebSocketDisconnect:
-            print(f"Cliente desconectado.")
-        except Exception as e:
-            print(f"Error fatal en el WebSocket: {e}")
-            await websocket.send_json({"error": str(e)})
+            await channel.error(str(e))
+        except Exception:
+            pass  # la conexión ya estaba cerrada
 
 if __name__ == "__main__":
     if not os.path.exists("uploads"): os.makedirs("uploads")
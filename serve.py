@@ -0,0 +1,84 @@
+# Contenido para: serve.py
+
+"""
+Punto de entrada de producción: varios workers de uvicorn + un servicio de embeddings compartido.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+  - Un proceso aparte carga una sola vez el modelo de embeddings y Chroma
+    (src/embedding_service.py); los workers le piden embeddings y recuperación RAG
+    por un socket local autenticado, en lugar de cargar cada uno su copia de torch.
+  - El estado de las tareas y de la memoria vive en el checkpointer SQLite compartido,
+    así que cualquier worker puede reanudar la tarea de cualquier conexión.
+  - La cuota de los proveedores LLM se comparte entre los workers a través de SQLite
+    (LLM_QUOTA_DB, ver src/llm_scheduler.py): cualquier worker puede gastar lo que los
+    demás no usan.
+
+Para desarrollo sigue bastando con `python main.py` (un solo proceso, sin servicio).
+"""
+
+import os
+import sys
+import time
+import secrets
+import argparse
+import multiprocessing
+
+import uvicorn
+
+
+def _default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", max(2, min(8, os.cpu_count() or 2))))
+
+
+def _start_embedding_service(address: str, authkey: str) -> multiprocessing.Process:
+    from src.embedding_service import serve_forever
+
+    # No es daemon: la ingesta de la base de conocimientos usa su propio pool de procesos.
+    process = multiprocessing.Process(target=serve_forever, args=(address, authkey), name="embedding-service")
+    process.start()
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor de producción con varios workers.")
+    parser.add_argument("--workers", type=int, default=_default_workers())
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--embedding-address", default=os.getenv("EMBEDDING_SERVICE_ADDRESS") or "127.0.0.1:8765",
+                        help="'host:puerto' o ruta de un socket Unix para el servicio de embeddings.")
+    args = parser.parse_args()
+
+    # El estado compartido entre workers requiere el checkpointer en disco.
+    if os.getenv("CHECKPOINT_BACKEND", "sqlite").lower() != "sqlite":
+        print("El modo multi-worker necesita CHECKPOINT_BACKEND=sqlite (el estado se comparte entre procesos).")
+        sys.exit(1)
+
+    # Los workers heredan estas variables: se fijan antes de crear cualquier proceso.
+    os.environ["EMBEDDING_SERVICE_ADDRESS"] = args.embedding_address
+    os.environ.setdefault("EMBEDDING_SERVICE_AUTHKEY", secrets.token_hex(32))
+    os.environ.setdefault("LLM_QUOTA_WORKERS", str(args.workers))
+    for directory in ("uploads", "outputs", ".cache"):
+        os.makedirs(directory, exist_ok=True)
+
+    service = _start_embedding_service(args.embedding_address, os.environ["EMBEDDING_SERVICE_AUTHKEY"])
+    start = time.perf_counter()
+    # Se espera a que el modelo esté cargado para que ningún worker arranque sin RAG.
+    from src.embedding_service import wait_until_ready, EmbeddingServiceError
+    try:
+        status = wait_until_ready()
+    except EmbeddingServiceError as e:
+        print(f"El servicio de embeddings no arrancó: {e}")
+        service.terminate()
+        sys.exit(1)
+    print(f"Servicio de embeddings disponible en {time.perf_counter() - start:.1f}s: {status}")
+
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        service.terminate()
+        service.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 # Contenido para: src/agents/backend_developer.py
 
-from src.model import creative_llm
-from src.tools.code_extractor import extract_and_save_code 
+import asyncio
+from src.model import creative_llm, llm_for_node
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langgraph.config import get_stream_writer
+from src.tools.code_extractor import StreamingCodeExtractor, CodeStreamCallbackHandler 
+from src.tools.patch_applier import (
+    PATCH_MODE_ENABLED, PATCH_MODE_INSTRUCTIONS, patch_retry_feedback,
+)
+from src.tools.artifact_store import put_files, resolve
 
-def backend_developer_node(state: dict) -> dict:
+async def backend_developer_node(state: dict, config: RunnableConfig) -> dict:
     """
     Agente que genera el código de la aplicación backend en la tecnología especificada.
     Utiliza el plan, la tarea específica y el esquema de la base de datos como contexto.
@@ -20,17 +28,17 @@ def backend_developer_node(state: dict) -> dict:
     db_tech = plan.get("db_tech", "la base de datos especificada")
     task = plan.get("backend_task")
     feedback = state.get("review_feedback")
-    db_schema = state.get("db_schema", "No se proporcionó un esquema de base de datos específico. Asume un diseño apropiado.")
+    db_schema = resolve(state.get("db_schema")) or "No se proporcionó un esquema de base de datos específico. Asume un diseño apropiado."
     
     prompt_additions = ""
     # --- CORRECCIÓN CLAVE ---
     if feedback:
-        existing_backend_code = state.get("backend_code", {})
+        existing_backend_code = resolve(state.get("backend_code", {}))
         existing_code_prompt = "" # Inicializar la variable
         if isinstance(existing_backend_code, dict):
             full_existing_code = []
-            for lang, code in existing_backend_code.items():
-                full_existing_code.append(f"--- {lang.upper()} ---\n{code}")
+            for filename, code in existing_backend_code.items():
+                full_existing_code.append(f"--- ARCHIVO: {filename} ---\n{code}")
             
             existing_code_prompt = "\n\n".join(full_existing_code)
 
@@ -43,6 +51,7 @@ def backend_developer_node(state: dict) -> dict:
         ```
         {existing_code_prompt}
         ```
+        {PATCH_MODE_INSTRUCTIONS if PATCH_MODE_ENABLED else ""}
         """
 
     # --- Construcción del Prompt Final y Corregido ---
@@ -67,18 +76,33 @@ def backend_developer_node(state: dict) -> dict:
     ---
     {prompt_additions}
     """
-    response = creative_llm.invoke(prompt)
+    # Los archivos se guardan en cuanto su bloque se cierra durante el streaming de tokens.
+    writer = get_stream_writer()
+    extractor = StreamingCodeExtractor(
+        default_folder="backend",
+        base_dir=state.get("workspace_dir") or "outputs",
+        track_changes=bool(feedback),
+        on_file_saved=lambda filename, path: writer({"type": "file_written", "node": "develop_backend", "file": path}),
+    )
+    response = await llm_for_node(creative_llm, "develop_backend").ainvoke(
+        prompt, config=merge_configs(config, {"callbacks": [CodeStreamCallbackHandler(extractor)]})
+    )
     full_code = response.content
 
     print("\n--- SALIDA COMPLETA DEL LLM (PARA DEPURACIÓN) ---\n")
     print(full_code)
     print("\n--- FIN DE LA SALIDA DE DEPURACIÓN ---\n")
 
-    extracted_code_dict = extract_and_save_code(full_code, default_folder="backend")
+    extracted_code_dict = await asyncio.to_thread(extractor.finalize, full_code)
+    extracted_code_dict = await asyncio.to_thread(put_files, extracted_code_dict, extractor.saved_paths)
+    if feedback and PATCH_MODE_ENABLED and isinstance(state.get("backend_code"), dict):
+        # En modo parche solo llegan los archivos modificados: se conservan los demás.
+        extracted_code_dict = {**state["backend_code"], **extracted_code_dict}
     
     return {
         "backend_code": extracted_code_dict,
-        "last_code_generated": "backend",
-        "review_feedback": None,
+        "code_changes": extractor.changes,
+        "generated_files": list(extractor.saved_paths.values()),
+        "review_feedback": patch_retry_feedback(feedback, extractor.unapplied_patches(), "backend"),
         "supervisor_iterations": state.get("supervisor_iterations")+1
     }
\ No newline at end of file
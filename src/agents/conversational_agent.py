@@ -1,9 +1,9 @@
 # Contenido para: src/agents/conversational_agent.py
 
 # Usaremos un único modelo para conversar y para decidir la lógica.
-from src.model import conversational_llm
+from src.model import conversational_llm, llm_for_node
 
-def conversational_node(state: dict) -> dict:
+async def conversational_node(state: dict) -> dict:
     """
     Este agente se especializa en generar una respuesta conversacional.
     Usa un único LLM con un prompt estructurado para generar la respuesta Y
@@ -13,6 +13,13 @@ def conversational_node(state: dict) -> dict:
     user_input = state["user_input"]
     chat_history = state.get("chat_history", [])
     history_str = "\n".join(chat_history[-6:])
+    summary = state.get("conversation_summary")
+    summary_block = f"""
+    Resumen de la conversación anterior:
+    <resumen>
+    {summary}
+    </resumen>
+""" if summary else ""
 
     # Prompt estructurado que pide al LLM dos cosas: una decisión y una respuesta.
     prompt = f"""
@@ -20,6 +27,7 @@ def conversational_node(state: dict) -> dict:
     1.  Decidir si la conversación actual justifica continuar con un flujo de trabajo de desarrollo (CONTINUE) o si es una interacción simple que puede terminar (END).
     2.  Generar una respuesta amigable y apropiada para el usuario.
 
+{summary_block}
     Historial de conversación:
     <historial>
     {history_str}
@@ -61,7 +69,7 @@ def conversational_node(state: dict) -> dict:
     """
 
     # --- PASO ÚNICO: Invocar al LLM y analizar la respuesta estructurada ---
-    response = conversational_llm.invoke(prompt)
+    response = await llm_for_node(conversational_llm, "conversational_agent").ainvoke(prompt)
     raw_output = response.content.strip()
 
     print(f"--- Salida bruta del LLM: {raw_output[:100]}... ---")
@@ -92,11 +100,11 @@ def conversational_node(state: dict) -> dict:
         # Usamos la salida cruda como respuesta si el parseo falla
         final_bot_response = raw_output
 
-    # Actualizamos el historial y devolvemos el estado
-    new_history = chat_history + [f"Usuario: {user_input}", f"Bot: {final_bot_response}"]
+    # El reductor del estado añade estos turnos al historial (y lo mantiene acotado).
+    new_turns = [f"Usuario: {user_input}", f"Bot: {final_bot_response}"]
     return {
         "final_response": final_bot_response,
         "task_complete": is_task_complete,
-        "chat_history": new_history,
+        "chat_history": new_turns,
         "supervisor_iterations": state.get("supervisor_iterations")+1
     }
\ No newline at end of file
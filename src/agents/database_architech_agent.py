@@ -1,9 +1,17 @@
 # Contenido para: src/nodes/database_developer_node.py
 
-from src.model import creative_llm
-from src.tools.code_extractor import extract_and_save_code
+import asyncio
+from src.model import creative_llm, llm_for_node
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langgraph.config import get_stream_writer
+from src.tools.code_extractor import StreamingCodeExtractor, CodeStreamCallbackHandler
+from src.tools.patch_applier import (
+    PATCH_MODE_ENABLED, PATCH_MODE_INSTRUCTIONS, patch_retry_feedback,
+)
+from src.tools.artifact_store import put_files, resolve
 
-def database_architech_node(state: dict) -> dict:
+async def database_architech_node(state: dict, config: RunnableConfig) -> dict:
     """
     Agente que genera código para la capa de datos (SQL, NoSQL, scripts, etc.)
     basado en un análisis, la solicitud del usuario y el feedback de una revisión.
@@ -11,15 +19,19 @@ def database_architech_node(state: dict) -> dict:
     """
     print("---AGENTE: DESARROLLADOR DE LA CAPA DE DATOS---")
 
-    analysis_result = state.get("analysis_result")
+    analysis_result = resolve(state.get("analysis_result"))
     feedback = state.get("review_feedback")
     user = state.get("user_input")
     
     prompt_additions = ""
     if feedback:
-        existing_db_code = state.get("database_code", {})
+        existing_db_code = resolve(state.get("db_schema")) or {}
         # Toma el primer fragmento de código encontrado, sea cual sea su lenguaje.
-        first_code_snippet = next(iter(existing_db_code.values()), None)
+        first_filename, first_code_snippet = next(iter(existing_db_code.items()), (None, None))
+        regeneration_instructions = (
+            PATCH_MODE_INSTRUCTIONS if PATCH_MODE_ENABLED
+            else "Por favor, genera la versión COMPLETA y CORREGIDA del código. No solo los cambios."
+        )
 
         if first_code_snippet:
             prompt_additions = f"""
@@ -29,11 +41,12 @@ def database_architech_node(state: dict) -> dict:
             ---
             
             **CÓDIGO EXISTENTE (MODIFICA ESTE CÓDIGO PARA INCORPORAR LAS CORRECCIONES):**
+            --- ARCHIVO: {first_filename} ---
             ```
             {first_code_snippet}
             ```
             
-            Por favor, genera la versión COMPLETA y CORREGIDA del código. No solo los cambios.
+            {regeneration_instructions}
             """
 
     prompt = f"""
@@ -57,7 +70,17 @@ def database_architech_node(state: dict) -> dict:
 
     {prompt_additions}
     """
-    response = creative_llm.invoke(prompt)
+    # Los archivos se guardan en cuanto su bloque se cierra durante el streaming de tokens.
+    writer = get_stream_writer()
+    extractor = StreamingCodeExtractor(
+        default_folder="database",
+        base_dir=state.get("workspace_dir") or "outputs",
+        track_changes=bool(feedback),
+        on_file_saved=lambda filename, path: writer({"type": "file_written", "node": "database_architech", "file": path}),
+    )
+    response = await llm_for_node(creative_llm, "database_architech").ainvoke(
+        prompt, config=merge_configs(config, {"callbacks": [CodeStreamCallbackHandler(extractor)]})
+    )
     full_code = response.content
 
     print("\n--- INICIO DE LA SALIDA DE DEPURACIÓN (LLM Response) ---")
@@ -65,11 +88,16 @@ def database_architech_node(state: dict) -> dict:
     print("--- FIN DE LA SALIDA DE DEPURACIÓN ---\n")
 
     # Pasamos el contexto de la carpeta: este nodo siempre genera código de backend.
-    extracted_code_dict = extract_and_save_code(full_code, default_folder="database")
+    extracted_code_dict = await asyncio.to_thread(extractor.finalize, full_code)
+    extracted_code_dict = await asyncio.to_thread(put_files, extracted_code_dict, extractor.saved_paths)
+    if feedback and PATCH_MODE_ENABLED and isinstance(state.get("db_schema"), dict):
+        # En modo parche solo llegan los archivos modificados: se conservan los demás.
+        extracted_code_dict = {**state["db_schema"], **extracted_code_dict}
 
     return {
         "db_schema": extracted_code_dict,
-        "last_code_generated": "database",
-        "review_feedback": None ,
+        "code_changes": extractor.changes,
+        "generated_files": list(extractor.saved_paths.values()),
+        "review_feedback": patch_retry_feedback(feedback, extractor.unapplied_patches(), "database"),
         "supervisor_iterations": state.get("supervisor_iterations")+1
     }
\ No newline at end of file
@@ -1,9 +1,17 @@
 # Contenido para: src/agents/frontend_developer.py
 
-from src.model import creative_llm
-from src.tools.code_extractor import extract_and_save_code
+import asyncio
+from src.model import creative_llm, llm_for_node
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+from langgraph.config import get_stream_writer
+from src.tools.code_extractor import StreamingCodeExtractor, CodeStreamCallbackHandler
+from src.tools.patch_applier import (
+    PATCH_MODE_ENABLED, PATCH_MODE_INSTRUCTIONS, patch_retry_feedback,
+)
+from src.tools.artifact_store import put_files, resolve
 
-def frontend_developer_node(state: dict) -> dict:
+async def frontend_developer_node(state: dict, config: RunnableConfig) -> dict:
     print("---AGENTE: DESARROLLADOR FRONTEND---")
     plan = state.get("dev_plan")
     if not plan or not plan.get("frontend_task"):
@@ -18,13 +26,18 @@ def frontend_developer_node(state: dict) -> dict:
     existing_code_prompt = ""
     if feedback:
         # Si hay feedback, incluimos el código existente para que el LLM lo modifique.
-        existing_frontend_code = state.get("frontend_code", {})
+        existing_frontend_code = resolve(state.get("frontend_code", {}))
         if isinstance(existing_frontend_code, dict):
             full_existing_code = []
-            for lang, code in existing_frontend_code.items():
-                full_existing_code.append(f"--- {lang.upper()} ---\n{code}")
+            for filename, code in existing_frontend_code.items():
+                full_existing_code.append(f"--- ARCHIVO: {filename} ---\n{code}")
             existing_code_prompt = "\n\n".join(full_existing_code)
 
+        regeneration_instructions = (
+            PATCH_MODE_INSTRUCTIONS if PATCH_MODE_ENABLED
+            else "Por favor, genera la versión COMPLETA y CORREGIDA del código. No solo los cambios."
+        )
+
         prompt_additions = f"""
         **Feedback de la Revisión Anterior (Debes Corregirlo):**
         ---
@@ -36,7 +49,7 @@ def frontend_developer_node(state: dict) -> dict:
         {existing_code_prompt}
         ```
         
-        Por favor, genera la versión COMPLETA y CORREGIDA del código. No solo los cambios.
+        {regeneration_instructions}
         """
 
     prompt = f"""
@@ -64,11 +77,21 @@ def frontend_developer_node(state: dict) -> dict:
 
     **Especificación Técnica de UI/UX (Debes seguirla al pie de la letra):**
     ---
-    {state.get('ui_ux_spec', 'No se proporcionó una especificación detallada.')}
+    {resolve(state.get('ui_ux_spec')) or 'No se proporcionó una especificación detallada.'}
     ---
     {prompt_additions}
     """
-    response = creative_llm.invoke(prompt)
+    # Los archivos se guardan en cuanto su bloque se cierra durante el streaming de tokens.
+    writer = get_stream_writer()
+    extractor = StreamingCodeExtractor(
+        default_folder="frontend",
+        base_dir=state.get("workspace_dir") or "outputs",
+        track_changes=bool(feedback),
+        on_file_saved=lambda filename, path: writer({"type": "file_written", "node": "develop_frontend", "file": path}),
+    )
+    response = await llm_for_node(creative_llm, "develop_frontend").ainvoke(
+        prompt, config=merge_configs(config, {"callbacks": [CodeStreamCallbackHandler(extractor)]})
+    )
     full_code = response.content
 
     # --- PASO DE DEPURACIÓN ---
@@ -78,11 +101,17 @@ def frontend_developer_node(state: dict) -> dict:
     print("\n--- FIN DE LA SALIDA DE DEPURACIÓN ---\n")
 
     # Usar la nueva herramienta para extraer y guardar el código
-    extracted_code_dict = extract_and_save_code(full_code, default_folder="frontend")
-    # Devolvemos todos los bloques de código y limpiamos el feedback
+    extracted_code_dict = await asyncio.to_thread(extractor.finalize, full_code)
+    # En el estado solo quedan los handles del almacén de artefactos, no el código.
+    extracted_code_dict = await asyncio.to_thread(put_files, extracted_code_dict, extractor.saved_paths)
+    if feedback and PATCH_MODE_ENABLED and isinstance(state.get("frontend_code"), dict):
+        # En modo parche solo llegan los archivos modificados: se conservan los demás.
+        extracted_code_dict = {**state["frontend_code"], **extracted_code_dict}
+    # Devolvemos todos los bloques de código y limpiamos el feedback (salvo parches fallidos)
     return {
         "frontend_code": extracted_code_dict,
-        "last_code_generated": "frontend",
-        "review_feedback": None,
+        "code_changes": extractor.changes,
+        "generated_files": list(extractor.saved_paths.values()),
+        "review_feedback": patch_retry_feedback(feedback, extractor.unapplied_patches(), "frontend"),
         "supervisor_iterations": state.get("supervisor_iterations")+1
     }
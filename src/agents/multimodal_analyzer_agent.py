@@ -1,8 +1,14 @@
-from src.model import creative_llm
+import asyncio
+from src.model import creative_llm, llm_for_node
 from src.tools.file_analyzer import prepare_multimodal_input
+from src.tools.analysis_cache import analysis_cache_key, get_cached_analysis, store_analysis, model_identity
+from src.tools.artifact_store import put_text
 from langchain_core.messages import HumanMessage
 
-def multimodal_analyzer_node(state: dict) -> dict:
+# Subir al cambiar el prompt: invalida los análisis cacheados.
+ANALYSIS_PROMPT_VERSION = 1
+
+async def multimodal_analyzer_node(state: dict) -> dict:
     """
     Este agente se especializa en describir el contenido de los archivos.
     Su única responsabilidad es analizar y devolver el resultado.
@@ -13,6 +19,19 @@ def multimodal_analyzer_node(state: dict) -> dict:
     
     if not file_paths:
         return {"analysis_result": "No se proporcionaron archivos para analizar."}
+
+    # Mismos archivos + misma petición + mismo prompt y modelo -> se reutiliza el análisis.
+    cache_key = await asyncio.to_thread(
+        analysis_cache_key, "multimodal_analyzer", ANALYSIS_PROMPT_VERSION,
+        model_identity(creative_llm), file_paths, user_input
+    )
+    cached_result = await asyncio.to_thread(get_cached_analysis, cache_key)
+    if cached_result is not None:
+        print("--- ANÁLISIS MULTIMODAL RECUPERADO DE LA CACHÉ ---")
+        return {
+            "analysis_result": await asyncio.to_thread(put_text, cached_result),
+            "supervisor_iterations": state.get("supervisor_iterations")+1
+            }
     # El prompt puede permanecer igual, es muy bueno.
     prompt_text = f"""
     Eres un experto analista. La petición del usuario es: "{user_input}".
@@ -23,16 +42,18 @@ def multimodal_analyzer_node(state: dict) -> dict:
         Si es un audio acerca de como implementar un proyecto 
     """
     
-    multimodal_content = prepare_multimodal_input(prompt_text, file_paths)
+    # Leer y codificar los archivos en Base64 es I/O bloqueante: se delega a un hilo.
+    multimodal_content = await asyncio.to_thread(prepare_multimodal_input, prompt_text, file_paths)
     message = HumanMessage(content=multimodal_content)
-    response = creative_llm.invoke([message])
+    response = await llm_for_node(creative_llm, "multimodal_analyzer").ainvoke([message])
     
     analysis_result = response.content.strip()
+    await asyncio.to_thread(store_analysis, cache_key, analysis_result)
 
     print(f"--- SALIDA DEL ANALISTA MULTIMODAL: {analysis_result[:100]}... ---")
 
 
     return {
-        "analysis_result": analysis_result,
+        "analysis_result": await asyncio.to_thread(put_text, analysis_result),
         "supervisor_iterations": state.get("supervisor_iterations")+1
         } 
\ No newline at end of file
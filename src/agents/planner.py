@@ -1,18 +1,22 @@
-import json
-from src.model import analytical_llm
+import asyncio
+from src.model import analytical_llm, llm_for_node
 from src.rag_retriever import retrieve_context
+from src.schemas import DevPlan
+from src.tools.json_repair import ainvoke_structured
+from src.tools.artifact_store import resolve
 
-def planner_node(state: dict) -> dict:
+async def planner_node(state: dict) -> dict:
     print("---AGENTE: PLANIFICADOR DE PROYECTO---")
 
 
-    context_ui_ux = state.get("ui_ux_spec")
+    context_ui_ux = resolve(state.get("ui_ux_spec"))
     context_user = state.get("user_input")
-    context_media= state.get("analysis_result")
+    context_media= resolve(state.get("analysis_result"))
 
     # --- Recuperación de Contexto con RAG ---
  
-    retrieved_info = retrieve_context(context_user)
+    # La búsqueda vectorial es CPU-bound: se ejecuta en un hilo para no bloquear el event loop.
+    retrieved_info = await asyncio.to_thread(retrieve_context, context_user)
 
     prompt = f"""
         Eres un jefe de proyecto técnico. Tu tarea es analizar la siguiente información y generar un plan de desarrollo en formato JSON.
@@ -39,7 +43,7 @@ def planner_node(state: dict) -> dict:
 
         **IMPORTANTE:** Tu salida debe ser un objeto JSON VÁLIDO con la siguiente estructura y NADA MÁS:
         {{
-            "plan_type": "frontend", "backend","database".
+            "plan_type": "frontend" | "backend" | "database" | "both",
             "frontend_task": "(string | null) Descripción clara de la tarea para el desarrollador frontend, incluyendo justificación si aplica.",
             "frontend_tech": "(string | null) Tecnología específica para el frontend (ej. 'HTML, CSS y JavaScript').",
             "backend_task": "(string | null) Descripción clara de la tarea para el desarrollador backend, incluyendo justificación si aplica.",
@@ -58,17 +62,17 @@ def planner_node(state: dict) -> dict:
         No sugieras frameworks, librerías o herramientas de construcción a menos que se pidan explícitamente.  
     """
     
-    response = analytical_llm.invoke(prompt)
-    
-    try:
-        json_response = response.content.strip().replace("```json", "").replace("```", "").strip()
-        plan = json.loads(json_response)
+    # Modo JSON del proveedor + validación contra DevPlan (con reparación local antes de re-preguntar).
+    llm = llm_for_node(analytical_llm, "planner", json_mode=True)
+    plan, _ = await ainvoke_structured(llm, prompt, DevPlan)
+
+    if plan is not None:
+        plan = plan.model_dump(exclude_none=True)
         print(f"Plan de desarrollo generado: {plan}")
         return {"dev_plan": plan}
-    except json.JSONDecodeError:
-        print("Error: El planificador no devolvió un JSON válido.")
-        return {
-            "dev_plan": {"plan_type": "none"},
-            "supervisor_iterations": state.get("supervisor_iterations")+1
-            }
+    print("Error: El planificador no devolvió un JSON válido.")
+    return {
+        "dev_plan": {"plan_type": "none"},
+        "supervisor_iterations": state.get("supervisor_iterations")+1
+        }
 
@@ -1,14 +1,18 @@
 import os
-import json
-from src.model import analytical_llm
+import asyncio
+from src.model import analytical_llm, llm_for_node
+from src.schemas import AuditVerdict
+from src.tools.json_repair import ainvoke_structured
 from src.rag_retriever import retrieve_context
+from src.tools.generate_hyperlink import generate_local_html_hyperlink, create_hyperlink_message
 from src.tools.code_reader import (
     list_code_files_in_directory, 
-    read_code_from_files, 
-    format_code_for_prompt
+    build_code_context,
+    build_incremental_code_context,
+    DEFAULT_TOKEN_BUDGET
 )
 
-def quality_auditor_node(state: dict) -> dict:
+async def quality_auditor_node(state: dict) -> dict:
     """
     Agente Auditor de Calidad que impulsa el ciclo de RAG Iterativo.
 
@@ -32,32 +36,48 @@ def quality_auditor_node(state: dict) -> dict:
     review_count = state.get("review_count", 0)
     
     # --- 2. Determinar qué archivos auditar ---
-    output_dir = "outputs"
-    files_to_read = list_code_files_in_directory(output_dir)
+    # Solo los archivos producidos en esta tarea; si no constan, la carpeta de trabajo
+    # de esta sesión (nunca se auditan archivos de otros usuarios).
+    output_dir = state.get("workspace_dir") or "outputs"
+    files_to_read = state.get("generated_files") or await asyncio.to_thread(list_code_files_in_directory, output_dir)
 
     if not files_to_read:
         print("Auditor: No se encontraron archivos para auditar.")
         return {"review_feedback": "Error: No se encontró código en la carpeta de salida para auditar."}
     
-    # --- 3. Leer el código usando la herramienta centralizada ---
-    
-    code_files_content = read_code_from_files(files_to_read)
-
-    # --- 4. Formatear el código para el prompt del LLM (¡NUEVA LÓGICA SIMPLIFICADA!) ---
-    code_to_review = format_code_for_prompt(code_files_content)
+    # --- 3. Leer y formatear el código respetando el presupuesto de tokens ---
+    # Si la iteración anterior fue una corrección, solo se revisan los diffs y un
+    # resumen de los archivos que no cambiaron.
+    code_changes = state.get("code_changes") or {}
+    incremental = bool(code_changes) and review_count > 0
+    if incremental:
+        code_to_review, context_report = await asyncio.to_thread(
+            build_incremental_code_context, code_changes, files_to_read, output_dir, DEFAULT_TOKEN_BUDGET
+        )
+    else:
+        code_to_review, context_report = await asyncio.to_thread(
+            build_code_context, files_to_read, output_dir, DEFAULT_TOKEN_BUDGET
+        )
     
     if not code_to_review:
         print("Advertencia: No se encontró contenido auditable en los archivos.")
         return {"review_feedback": "Error: Los archivos encontrados estaban vacíos. Por favor, genera el código de nuevo."}
     
-    # --- 5. Enriquecer con RAG ---
+    # --- 4. Enriquecer con RAG ---
     task_description_for_rag = plan.get("frontend_task") or plan.get("backend_task") or plan.get("db_task") or user_input
     print(f"Buscando principios de calidad relevantes para: '{task_description_for_rag[:80]}...'")
     #Invocación al sistema de recuperación para obtener principios de calidad.
-    quality_principles = retrieve_context(task_description_for_rag)
+    quality_principles = await asyncio.to_thread(retrieve_context, task_description_for_rag)
     print("Contexto de calidad recuperado.")
 
-    # --- 6. Construir el Prompt para el LLM ---
+    # --- 5. Construir el Prompt para el LLM ---
+    incremental_note = ""
+    if incremental:
+        incremental_note = f"""
+    **REVISIÓN INCREMENTAL:** El código ya fue auditado antes. Arriba solo se muestran los diffs
+    de esta corrección y un resumen de los archivos sin cambios (que ya fueron revisados).
+    Verifica principalmente que se haya resuelto el feedback anterior: "{state.get('feedback')}"
+    """
     prompt_text = f"""
     Eres un auditor de calidad de software meticuloso y experto. Tu misión es evaluar si el código generado cumple no solo con la solicitud del usuario, sino también con los principios de alta calidad definidos en nuestra base de conocimientos.
 
@@ -73,6 +93,7 @@ def quality_auditor_node(state: dict) -> dict:
 
     **CÓDIGO GENERADO A AUDITAR (leído de los archivos):**
     {code_to_review}
+    {incremental_note}
     
 
     **Tus Criterios de Auditoría:**
@@ -87,24 +108,41 @@ def quality_auditor_node(state: dict) -> dict:
     """
     
     # --- 6. Invocar al LLM y Procesar la Respuesta ---
-    response = analytical_llm.invoke(prompt_text)
+    # Modo JSON del proveedor + validación contra AuditVerdict (con reparación local antes de re-preguntar).
+    llm = llm_for_node(analytical_llm, "quality_auditor", json_mode=True)
+    verdict, responses = await ainvoke_structured(llm, prompt_text, AuditVerdict)
     review_count += 1 # Incrementa el contador de revisiones (útil para limitar iteraciones)
+
+    # Tokens consumidos por esta auditoría (reales si el proveedor los reporta).
+    usages = [getattr(response, "usage_metadata", None) or {} for response in responses]
+    audit_token_usage = {
+        "estimated_code_tokens": context_report["estimated_tokens"],
+        "prompt_tokens": sum(usage.get("input_tokens", 0) for usage in usages),
+        "completion_tokens": sum(usage.get("output_tokens", 0) for usage in usages),
+        "llm_calls": len(responses),
+        "files_truncated": len(context_report["truncated"]),
+        "files_skipped": len(context_report["skipped"]),
+    }
+    print(f"Auditor: tokens consumidos en esta auditoría: {audit_token_usage}")
     
-    try:
-        json_response = response.content.strip().replace("```json", "").replace("```", "").strip()
-        audit_result = json.loads(json_response)
-        feedback = audit_result.get("feedback", "No se proporcionó feedback.")
-        is_approved = audit_result.get("approved", False)
+    if verdict is not None:
+        feedback = verdict.feedback
+        is_approved = verdict.approved
 
         review_count += 1 # este contador se incrementa dos veces, aquí y arriba.
 
         if is_approved:
             print(f"Auditoría de Calidad: APROBADO. Feedback: {feedback}")
+            # Si se generó un sitio web en la carpeta de la sesión, se ofrece el enlace.
+            site_path = os.path.join(output_dir, "frontend", "index.html")
+            feedback += create_hyperlink_message(generate_local_html_hyperlink(site_path))
             # Debemos devolver el feedback Y la bandera de aprobación para que el frontend los vea.
             return {
                 "feedback": feedback,         # Devolver el feedback de aprobación.
                 "review_feedback": None,      # Limpiar el feedback de rechazo.
+                "code_changes": None,         # Diffs ya revisados.
                 "review_count": review_count,
+                "audit_token_usage": audit_token_usage,
                 "code_approved": True         # Señal para que el supervisor finalice.
             }
         else:
@@ -112,18 +150,20 @@ def quality_auditor_node(state: dict) -> dict:
             return {
                 "feedback": feedback,         # Devolver el feedback.
                 "review_feedback": feedback,  # Llenar el campo de feedback de rechazo.
+                "code_changes": None,         # Diffs ya revisados.
                 "review_count": review_count,
+                "audit_token_usage": audit_token_usage,
                 "code_approved": False        # Indicar que no está aprobado.
             }
 
-    except (json.JSONDecodeError, KeyError) as e:
-        print(f"Error: El auditor no devolvió un JSON válido. Error: {e}")
-        # Asegurarnos de que el feedback de error también se devuelva.
-        feedback_error = "Error interno del auditor: La respuesta no fue un JSON válido. Por favor, intenta generar el código de nuevo."
-        return {
-            "feedback": feedback_error,
-            "review_feedback": feedback_error,
-            "review_count": review_count,
-            "code_approved": False,
-            "supervisor_iterations": state.get("supervisor_iterations")+1
-        }
\ No newline at end of file
+    print("Error: El auditor no devolvió un JSON válido ni tras la reparación.")
+    # Asegurarnos de que el feedback de error también se devuelva.
+    feedback_error = "Error interno del auditor: La respuesta no fue un JSON válido. Por favor, intenta generar el código de nuevo."
+    return {
+        "feedback": feedback_error,
+        "review_feedback": feedback_error,
+        "review_count": review_count,
+        "audit_token_usage": audit_token_usage,
+        "code_approved": False,
+        "supervisor_iterations": state.get("supervisor_iterations")+1
+    }
\ No newline at end of file
@@ -1,17 +1,43 @@
 # Contenido para: src/agents/supervisor_agent.py
 
-from src.model import analytical_llm
+from src.model import analytical_llm, llm_for_node
 from src.tools.generate_hyperlink import generate_local_html_hyperlink, create_hyperlink_message
+from src.tools.fast_router import fast_route, router_metrics
 from langchain_core.messages import HumanMessage
 import os
 import re
+import time
+import asyncio
 
 AVAILABLE_NODES = [
     "conversational_agent", "multimodal_analyzer", "ui_ux_designer", "planner",
     "develop_backend", "develop_frontend", "quality_auditor", "database_architech","__end__"
 ]
 
-def supervisor_node(state: dict) -> dict:
+# Decisión especial: varios desarrolladores independientes se ejecutan en paralelo.
+PARALLEL_DEVELOPERS = "parallel_developers"
+
+
+def get_ready_developers(state: dict) -> list:
+    """
+    Para planes "both", devuelve los desarrolladores pendientes cuyas dependencias
+    ya están resueltas. El frontend y la base de datos son independientes; el backend
+    usa el esquema de BD en su prompt, por lo que espera a que el esquema exista.
+    """
+    plan = state.get("dev_plan") or {}
+    has_db_schema = bool(state.get("db_schema"))
+
+    ready = []
+    if not has_db_schema:
+        ready.append("database_architech")
+    if plan.get("frontend_task") and not state.get("frontend_code"):
+        ready.append("develop_frontend")
+    if plan.get("backend_task") and not state.get("backend_code") and has_db_schema:
+        ready.append("develop_backend")
+    return ready
+
+
+async def supervisor_node(state: dict) -> dict:
     """
     Supervisor orquestador puro. Enruta la tarea basándose en el estado actual de la sesión.
     La gestión del estado entre tareas (incluido el historial) se maneja en main.py.
@@ -39,6 +65,7 @@ def supervisor_node(state: dict) -> dict:
     has_feedback = bool(state.get("review_feedback"))
     rag_status = state.get("rag_status")
     decision_route = ""
+    parallel_routes = []
 
     # --- 3. ENRUTAMIENTO BASADO EN ESTADO (TAREAS EN CURSO) ---
     if has_analysis_result and not has_plan:
@@ -53,11 +80,16 @@ def supervisor_node(state: dict) -> dict:
             decision_route = "database_architech"
         else: 
             decision_route = "develop_backend"   
+    elif plan.get("plan_type") == "both" and get_ready_developers(state):
+        # Fan-out: los desarrolladores independientes se ejecutan a la vez y se
+        # reúnen de nuevo en el supervisor antes de pasar al auditor.
+        parallel_routes = get_ready_developers(state)
+        decision_route = parallel_routes[0] if len(parallel_routes) == 1 else PARALLEL_DEVELOPERS
     elif has_code or has_db_schema:
         decision_route = "quality_auditor"
     elif has_plan:
         plan_type = plan.get("plan_type")
-        if plan_type in ["database", "both"] and not has_db_schema:
+        if plan_type == "database" and not has_db_schema:
             decision_route = "database_architech"
         elif plan_type in ["frontend", "both"]:
             decision_route = "develop_frontend"
@@ -73,7 +105,17 @@ def supervisor_node(state: dict) -> dict:
         #print("No se encontró una regla de enrutamiento explícita. Consultando al LLM.")
         user_input = state.get("user_input", "")
         chat_history = state.get("chat_history", [])
-        
+
+        # 4a. Enrutador local (reglas + similitud de embeddings): resuelve en milisegundos
+        # los casos claros y evita la llamada al modelo de 70B.
+        local_route = await asyncio.to_thread(fast_route, user_input, has_files)
+        if local_route.is_confident:
+            print(f"Enrutamiento local ({local_route.source}, confianza {local_route.confidence:.2f}): '{local_route.node}'")
+            decision_route = local_route.node
+
+    if not decision_route:
+        # 4b. Caso dudoso: se consulta al LLM.
+        llm_start = time.perf_counter()
         
         prompt_route = f"""
         Eres un enrutador de tareas experto. Tu objetivo es analizar la petición del usuario y decidir el PRIMER paso correcto en un flujo de trabajo.
@@ -100,7 +142,7 @@ def supervisor_node(state: dict) -> dict:
         """
 
         message = HumanMessage(content=prompt_route)
-        response = analytical_llm.invoke([message])
+        response = await llm_for_node(analytical_llm, "supervisor").ainvoke([message])
         llm_response_content = response.content.strip()
         print(f"Respuesta del LLM para enrutamiento: '{llm_response_content}'")
         
@@ -110,8 +152,13 @@ def supervisor_node(state: dict) -> dict:
             if node in llm_response_content:
                 decision_route = node
                 break
+        router_metrics.record_llm(local_route, decision_route, (time.perf_counter() - llm_start) * 1000)
 
     # --- 5. VALIDACIÓN FINAL ---
+    if decision_route == PARALLEL_DEVELOPERS:
+        print(f"Decisión del Supervisor: Ejecutar en paralelo {parallel_routes}")
+        return {"routing_decision": decision_route, "parallel_routes": parallel_routes}
+
     if decision_route not in AVAILABLE_NODES:
         print(f"ADVERTENCIA: Decisión inválida ('{decision_route}'). Forzando a '__end__'.")
         decision_route = "__end__"
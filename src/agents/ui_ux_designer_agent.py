@@ -1,11 +1,17 @@
 # src/agents/ui_ux_designer_agent.py
 
-from src.model import creative_llm
+import asyncio
+from src.model import creative_llm, llm_for_node
 from src.tools.file_analyzer import prepare_multimodal_input
+from src.tools.analysis_cache import analysis_cache_key, get_cached_analysis, store_analysis, model_identity
+from src.tools.artifact_store import put_text
 from langchain_core.messages import HumanMessage
 
+# Subir al cambiar los prompts: invalida las especificaciones cacheadas.
+UI_UX_PROMPT_VERSION = 1
 
-def ui_ux_designer_node(state: dict) -> dict:
+
+async def ui_ux_designer_node(state: dict) -> dict:
     print("---AGENTE: DISEÑADOR UI/UX (ESPECIALISTA)---")
     user_input = state["user_input"]
     file_paths = state.get("file_paths", [])
@@ -13,6 +19,19 @@ def ui_ux_designer_node(state: dict) -> dict:
     if not file_paths:
         return {"ui_ux_spec": "Error: No se proporcionó ninguna imagen o video para el análisis de UI/UX."}
 
+    # Iterar sobre el mismo mockup es habitual: si ya se analizó, no se vuelve a llamar a Gemini.
+    cache_key = await asyncio.to_thread(
+        analysis_cache_key, "ui_ux_designer", UI_UX_PROMPT_VERSION,
+        model_identity(creative_llm), file_paths, user_input
+    )
+    cached_spec = await asyncio.to_thread(get_cached_analysis, cache_key)
+    if cached_spec is not None:
+        print("--- ESPECIFICACIÓN DE UI/UX RECUPERADA DE LA CACHÉ ---")
+        return {
+            "ui_ux_spec": await asyncio.to_thread(put_text, cached_spec),
+            "supervisor_iterations": state.get("supervisor_iterations")+1
+            }
+
     is_video = any(path.lower().endswith(('.mp4', '.mov', '.avi', '.webm')) for path in file_paths)
 
     if is_video:
@@ -62,12 +81,13 @@ def ui_ux_designer_node(state: dict) -> dict:
         La petición original del usuario es: "{user_input}".
         """
 
-    content = prepare_multimodal_input(prompt, file_paths)
-    response = creative_llm.invoke([HumanMessage(content=content)])
+    content = await asyncio.to_thread(prepare_multimodal_input, prompt, file_paths)
+    response = await llm_for_node(creative_llm, "ui_ux_designer").ainvoke([HumanMessage(content=content)])
     ui_ux_spec = response.content.strip()
+    await asyncio.to_thread(store_analysis, cache_key, ui_ux_spec)
 
     print(f"--- ESPECIFICACIÓN DE UI/UX GENERADA ---\n{ui_ux_spec[:500]}...\n---")
     return {
-        "ui_ux_spec": ui_ux_spec,
+        "ui_ux_spec": await asyncio.to_thread(put_text, ui_ux_spec),
         "supervisor_iterations": state.get("supervisor_iterations")+1
         }
@@ -25,5 +25,16 @@ def get_config():
     
     return {"model_name": model_name}
 
-# Obtenemos la configuración una vez y la hacemos disponible para importar
-APP_CONFIG = get_config()
\ No newline at end of file
+_app_config = None
+
+def __getattr__(name):
+    """
+    `APP_CONFIG` se resuelve de forma perezosa (PEP 562): la validación solo ocurre
+    la primera vez que alguien la importa, no al cargar el módulo.
+    """
+    global _app_config
+    if name == "APP_CONFIG":
+        if _app_config is None:
+            _app_config = get_config()
+        return _app_config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
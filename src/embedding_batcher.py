@@ -0,0 +1,183 @@
+# Contenido para: src/embedding_batcher.py
+
+"""
+Micro-batching de embeddings.
+
+Con el modelo mpnet en CPU, una pasada con 16 textos cuesta poco más que una con uno,
+pero el planificador, el auditor y el enrutador rápido de varias tareas concurrentes
+piden sus consultas de una en una. Un hilo dedicado recoge las peticiones que llegan
+durante unos milisegundos (EMBEDDING_BATCH_MAX_WAIT_MS) y las codifica juntas, hasta
+EMBEDDING_BATCH_MAX_SIZE textos por pasada.
+
+  - La cola está acotada (EMBEDDING_QUEUE_MAX): si se llena, la petición espera como
+    mucho EMBEDDING_TIMEOUT_S y después falla con `EmbeddingBatcherError`.
+  - Cada petición espera su resultado como mucho EMBEDDING_TIMEOUT_S.
+  - Los textos repetidos dentro de un lote se codifican una sola vez.
+"""
+
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "true").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
+EMBEDDING_QUEUE_MAX = int(os.getenv("EMBEDDING_QUEUE_MAX", 1024))
+EMBEDDING_TIMEOUT_S = float(os.getenv("EMBEDDING_TIMEOUT_S", 30))
+THROUGHPUT_WINDOW_S = 60
+
+
+class EmbeddingBatcherError(RuntimeError):
+    """Cola llena o tiempo de espera agotado."""
+
+
+class BatcherMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.encode_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.max_batch_size = 0
+        # (instante, textos) de los lotes recientes, para el throughput de la ventana.
+        self._recent = deque()
+
+    def record_batch(self, size: int, encode_s: float, waits: List[float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            self.texts += size
+            self.encode_seconds += encode_s
+            self.queue_wait_seconds += sum(waits)
+            self.max_batch_size = max(self.max_batch_size, size)
+            self._recent.append((now, size))
+            while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW_S:
+                self._recent.popleft()
+
+    def inc(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            recent_texts = sum(size for t, size in self._recent if now - t <= THROUGHPUT_WINDOW_S)
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": queue_depth,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "avg_queue_wait_ms": round(1000 * self.queue_wait_seconds / self.requests, 2) if self.requests else 0.0,
+                # Textos codificados por segundo de cómputo y en la última ventana (carga real).
+                "texts_per_encode_second": round(self.texts / self.encode_seconds, 1) if self.encode_seconds else 0.0,
+                f"texts_per_second_{THROUGHPUT_WINDOW_S}s": round(recent_texts / THROUGHPUT_WINDOW_S, 2),
+            }
+
+
+class EmbeddingBatcher:
+    """Hilo que agrupa peticiones de embeddings y las codifica por lotes con `base.embed_documents`."""
+
+    def __init__(self, base: Embeddings, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS, max_queue: int = EMBEDDING_QUEUE_MAX,
+                 timeout_s: float = EMBEDDING_TIMEOUT_S):
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.timeout_s = timeout_s
+        self.metrics = BatcherMetrics()
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Encola `texts` y bloquea hasta tener sus vectores (se llama desde hilos de trabajo)."""
+        future: Future = Future()
+        self.metrics.inc("requests")
+        try:
+            self._queue.put((texts, future, time.monotonic()), timeout=self.timeout_s)
+        except queue.Full:
+            self.metrics.inc("rejected")
+            raise EmbeddingBatcherError(f"Cola de embeddings llena ({self._queue.maxsize} peticiones).")
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeoutError:
+            self.metrics.inc("timeouts")
+            future.cancel()  # si aún no se procesó, el hilo la descartará
+            raise EmbeddingBatcherError(f"Embeddings no disponibles tras {self.timeout_s}s.")
+
+    def _collect(self) -> List[tuple]:
+        """Espera la primera petición y añade las que lleguen hasta llenar el lote o agotar la espera."""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_s
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            unique = list(dict.fromkeys(text for texts, _, _ in batch for text in texts))
+            try:
+                vectors = dict(zip(unique, self.base.embed_documents(unique)))
+            except Exception as e:
+                self.metrics.inc("errors")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(unique), time.monotonic() - started, [started - queued for _, _, queued in batch])
+            for texts, future, _ in batch:
+                future.set_result([vectors[text] for text in texts])
+
+    def stats(self) -> dict:
+        return self.metrics.snapshot(self._queue.qsize())
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings que pasan por el `EmbeddingBatcher`. Con el modelo de este proyecto
+    (sin instrucción de consulta) `embed_query(t)` equivale a `embed_documents([t])[0]`,
+    así que consultas y documentos pueden compartir lote.
+    """
+
+    def __init__(self, base: Embeddings):
+        self.base = base
+        self.batcher = EmbeddingBatcher(base)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embed([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Las listas grandes (ingesta, ejemplos del enrutador) ya son un lote: van directas.
+        if len(texts) >= self.batcher.max_batch_size:
+            return self.base.embed_documents(texts)
+        return self.batcher.embed(texts)
+
+    def stats(self) -> dict:
+        return self.batcher.stats()
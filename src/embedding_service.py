@@ -0,0 +1,201 @@
+# Contenido para: src/embedding_service.py
+
+"""
+Servicio compartido de embeddings y recuperación RAG.
+
+En el modo multi-worker (`serve.py`) cada worker de uvicorn es un proceso distinto;
+para no cargar una copia del modelo de sentence-transformers (y de torch) por worker,
+un único proceso carga el modelo y la colección de Chroma y atiende a todos por un
+socket local (`multiprocessing.connection`, autenticado con EMBEDDING_SERVICE_AUTHKEY).
+
+Si EMBEDDING_SERVICE_ADDRESS está definida, `src/rag_retriever.py` usa este servicio
+en lugar de cargar el modelo en el propio proceso. Formatos de dirección:
+  - "host:puerto" (TCP, p. ej. "127.0.0.1:8765")
+  - una ruta del sistema de archivos (socket Unix, solo POSIX)
+
+Peticiones (tuplas serializadas por la conexión):
+  ("ping",) | ("embed_query", texto) | ("embed_documents", [textos])
+  ("retrieve", consulta) | ("stats",)
+Respuestas: ("ok", resultado) o ("error", mensaje).
+"""
+
+import os
+import time
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", "")
+EMBEDDING_SERVICE_AUTHKEY = os.getenv("EMBEDDING_SERVICE_AUTHKEY", "")
+EMBEDDING_SERVICE_TIMEOUT_S = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT_S", 60))
+
+# True dentro del propio proceso del servicio: allí los embeddings siempre son locales.
+_serving = False
+
+
+class EmbeddingServiceError(RuntimeError):
+    """El servicio no está disponible o devolvió un error."""
+
+
+def parse_address(address: str):
+    """'host:puerto' -> (host, puerto); cualquier otra cadena es la ruta de un socket Unix."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def is_remote_enabled() -> bool:
+    return bool(EMBEDDING_SERVICE_ADDRESS) and not _serving
+
+
+# --- Servidor (un único proceso con el modelo cargado) ---
+
+def _handle_request(request: tuple):
+    from src import rag_retriever
+
+    command, *args = request
+    if command == "ping":
+        return {"rag_ready": rag_retriever.is_rag_ready()}
+    if command == "embed_query":
+        return rag_retriever.get_embeddings().embed_query(args[0])
+    if command == "embed_documents":
+        return rag_retriever.get_embeddings().embed_documents(args[0])
+    if command == "retrieve":
+        return {
+            "context": rag_retriever.retrieve_context(args[0]),
+            "signature": rag_retriever.collection_signature(),
+        }
+    if command == "stats":
+        return rag_retriever.get_rag_cache_stats()
+    raise ValueError(f"Comando desconocido: {command!r}")
+
+
+def _serve_connection(conn) -> None:
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return  # el worker cerró la conexión
+            try:
+                response = ("ok", _handle_request(request))
+            except Exception as e:
+                response = ("error", f"{type(e).__name__}: {e}")
+            try:
+                conn.send(response)
+            except (BrokenPipeError, OSError):
+                return
+
+
+def serve_forever(address: str = None, authkey: str = None) -> None:
+    """
+    Carga el modelo y la colección y atiende peticiones hasta que se termine el proceso.
+    Cada conexión (una por hilo de cada worker) se atiende en su propio hilo y las
+    consultas concurrentes de todos los workers se codifican juntas (src/embedding_batcher.py).
+    """
+    global _serving
+    from src import rag_retriever
+
+    _serving = True
+    address = parse_address(address or EMBEDDING_SERVICE_ADDRESS)
+    authkey = (authkey or EMBEDDING_SERVICE_AUTHKEY).encode()
+    if not authkey:
+        raise EmbeddingServiceError("EMBEDDING_SERVICE_AUTHKEY es obligatoria: la conexión transporta objetos serializados.")
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # socket de una ejecución anterior
+
+    start = time.perf_counter()
+    rag_retriever.get_embeddings()
+    rag_retriever.initialize_rag()
+    print(f"Servicio de embeddings listo en {address} ({time.perf_counter() - start:.1f}s de carga).")
+
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:  # p. ej. un cliente con una clave incorrecta
+                print(f"Servicio de embeddings: conexión rechazada ({e})")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn,), daemon=True).start()
+
+
+# --- Cliente (en cada worker) ---
+
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not EMBEDDING_SERVICE_AUTHKEY:
+            raise EmbeddingServiceError("Falta EMBEDDING_SERVICE_AUTHKEY para conectar con el servicio de embeddings.")
+        conn = Client(parse_address(EMBEDDING_SERVICE_ADDRESS), authkey=EMBEDDING_SERVICE_AUTHKEY.encode())
+        _local.conn = conn
+    return conn
+
+
+def _drop_connection() -> None:
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def call_service(*request):
+    """
+    Envía una petición al servicio y espera la respuesta. Una conexión por hilo (las
+    conexiones no son seguras entre hilos); si se cayó, se reconecta una vez.
+    """
+    for attempt in range(2):
+        try:
+            conn = _connection()
+            conn.send(request)
+            if not conn.poll(EMBEDDING_SERVICE_TIMEOUT_S):
+                _drop_connection()  # la respuesta tardía desincronizaría la conexión
+                raise EmbeddingServiceError(f"El servicio de embeddings no respondió en {EMBEDDING_SERVICE_TIMEOUT_S}s.")
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            _drop_connection()
+            if attempt == 0:
+                continue
+            raise EmbeddingServiceError(f"Servicio de embeddings no disponible en {EMBEDDING_SERVICE_ADDRESS}: {e}") from e
+        if status != "ok":
+            raise EmbeddingServiceError(result)
+        return result
+
+
+def wait_until_ready(timeout_s: float = 600) -> dict:
+    """Espera a que el servicio acepte conexiones (la carga del modelo tarda)."""
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            return call_service("ping")
+        except EmbeddingServiceError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings calculados por el servicio compartido."""
+
+    def embed_query(self, text: str) -> List[float]:
+        return call_service("embed_query", text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return call_service("embed_documents", texts)
+
+
+def remote_retrieve(query: str) -> dict:
+    """Devuelve {"context": texto, "signature": firma de la colección o None}."""
+    return call_service("retrieve", query)
+
+
+if __name__ == "__main__":
+    serve_forever()
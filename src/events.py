@@ -0,0 +1,163 @@
+# Contenido para: src/events.py
+
+"""
+Protocolo de eventos del websocket (versión PROTOCOL_VERSION).
+
+Todos los mensajes del servidor son objetos con `v` (versión) y `type`:
+
+  hello          respuesta al saludo del cliente: versión y compresión acordada
+  session        inicio (o reanudación) de una tarea: {thread_id, resumed}
+  node_started   un nodo empieza a ejecutarse: {node}
+  token          fragmento generado por el LLM de un nodo: {node, delta}
+  file_written   un desarrollador ha guardado un archivo: {node, file}
+  node_finished  un nodo ha terminado: {node, set?, patch?, append?}
+  audit_verdict  veredicto del auditor: {approved, feedback, review_count}
+  done           fin de la tarea: {thread_id}
+  error          {message}
+
+`node_finished` solo lleva lo que cambió respecto a lo ya enviado en la tarea:
+  - set:    campos nuevos o reemplazados  -> {campo: valor}
+  - patch:  diccionarios con claves cambiadas (p. ej. un archivo de `frontend_code`)
+            -> {campo: {clave: valor | null}}, donde null elimina la clave
+  - append: listas que crecieron por el final (p. ej. `rag_steps`) -> {campo: [nuevos]}
+
+Los mensajes se serializan con orjson. Si el cliente lo ofrece en su `hello` y
+zstandard está instalado, los mensajes grandes se envían comprimidos con zstd en
+frames binarios; el resto viaja como texto.
+"""
+
+import os
+import copy
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from src.graph.state import append_bounded, merge_unique
+
+try:
+    import zstandard
+except ImportError:  # la compresión es opcional
+    zstandard = None
+
+PROTOCOL_VERSION = 1
+EVENTS_COMPRESSION_MIN_BYTES = int(os.getenv("EVENTS_COMPRESSION_MIN_BYTES", 2048))
+EVENTS_ZSTD_LEVEL = int(os.getenv("EVENTS_ZSTD_LEVEL", 3))
+
+SUPPORTED_COMPRESSION = ["zstd"] if zstandard is not None else []
+
+# Un diccionario con más claves cambiadas que esto se reenvía entero (`set`).
+_MAX_PATCH_RATIO = 0.5
+
+# Campos con reductor acumulativo en GraphState: la salida de un nodo es solo el
+# incremento, así que se acumula igual que en el grafo antes de calcular el delta.
+_ACCUMULATED_FIELDS = {
+    "rag_steps": lambda current, update: list(current or []) + list(update or []),
+    "chat_history": append_bounded,
+    "generated_files": merge_unique,
+}
+
+
+def negotiate_compression(offered: Optional[List[str]]) -> Optional[str]:
+    """Primera compresión ofrecida por el cliente que el servidor soporta."""
+    for codec in offered or []:
+        if codec in SUPPORTED_COMPRESSION:
+            return codec
+    return None
+
+
+def field_delta(previous: Any, current: Any) -> Optional[tuple]:
+    """
+    Compara el último valor enviado de un campo con el nuevo.
+
+    Returns:
+        None si no cambió, o una tupla (operación, carga) con operación en
+        "set", "patch" o "append".
+    """
+    if previous == current:
+        return None
+    if isinstance(previous, dict) and isinstance(current, dict) and previous:
+        changes = {key: value for key, value in current.items() if previous.get(key) != value}
+        changes.update({key: None for key in previous if key not in current})
+        if len(changes) <= max(1, len(current) * _MAX_PATCH_RATIO):
+            return "patch", changes
+    if isinstance(previous, list) and isinstance(current, list) and previous:
+        if len(current) > len(previous) and current[:len(previous)] == previous:
+            return "append", current[len(previous):]
+    return "set", current
+
+
+class EventChannel:
+    """
+    Canal de eventos de una conexión websocket: recuerda qué se envió en la tarea en
+    curso para mandar solo deltas, y aplica la compresión acordada en el `hello`.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.compression: Optional[str] = None
+        self._compressor = None
+        self._sent: Dict[str, Any] = {}
+
+    # --- Transporte ---
+
+    async def send(self, message_type: str, **fields) -> None:
+        message = {"v": PROTOCOL_VERSION, "type": message_type, **fields}
+        data = orjson.dumps(message, default=str)
+        if self._compressor is not None and len(data) >= EVENTS_COMPRESSION_MIN_BYTES:
+            await self.websocket.send_bytes(self._compressor.compress(data))
+        else:
+            await self.websocket.send_text(data.decode("utf-8"))
+
+    async def hello(self, client_hello: dict) -> None:
+        self.compression = negotiate_compression(client_hello.get("compression"))
+        # Cada frame es independiente: el cliente los descomprime de uno en uno.
+        self._compressor = zstandard.ZstdCompressor(level=EVENTS_ZSTD_LEVEL) if self.compression == "zstd" else None
+        await self.send(
+            "hello", protocol=PROTOCOL_VERSION, compression=self.compression,
+            client_protocol=client_hello.get("protocol"),
+        )
+
+    # --- Eventos de la tarea ---
+
+    async def session(self, thread_id: str, resumed: bool = False) -> None:
+        # Tarea nueva o reanudada: el cliente reinicia su copia y se reenvía todo lo que cambie.
+        self._sent = {}
+        await self.send("session", thread_id=thread_id, resumed=resumed)
+
+    async def token(self, node: str, delta: str) -> None:
+        await self.send("token", node=node, delta=delta)
+
+    async def custom(self, event: dict) -> None:
+        """Eventos emitidos por los nodos con `get_stream_writer` (file_written, node_started)."""
+        event = dict(event)
+        message_type = event.pop("type", None)
+        if message_type:
+            await self.send(message_type, **event)
+
+    async def node_update(self, node: str, update: Optional[dict]) -> None:
+        """Traduce la salida de un nodo en `node_finished` (solo deltas) y eventos específicos."""
+        delta: Dict[str, Dict[str, Any]] = {}
+        for field, value in (update or {}).items():
+            if field in _ACCUMULATED_FIELDS:
+                value = _ACCUMULATED_FIELDS[field](self._sent.get(field), value)
+            change = field_delta(self._sent.get(field), value)
+            if change is None:
+                continue
+            operation, payload = change
+            delta.setdefault(operation, {})[field] = payload
+            self._sent[field] = copy.deepcopy(value)
+        await self.send("node_finished", node=node, **delta)
+
+        if node == "quality_auditor" and update and "code_approved" in update:
+            await self.send(
+                "audit_verdict",
+                approved=bool(update.get("code_approved")),
+                feedback=update.get("feedback"),
+                review_count=update.get("review_count"),
+            )
+
+    async def done(self, thread_id: str) -> None:
+        await self.send("done", thread_id=thread_id)
+
+    async def error(self, message: str) -> None:
+        await self.send("error", message=message)
@@ -0,0 +1,132 @@
+# Contenido para: src/graph/checkpointer.py
+
+"""
+Checkpointer compartido por todas las conexiones.
+
+El grafo se compila una sola vez al arrancar el servidor con este checkpointer, de modo
+que el estado de cada tarea (thread_id) sobrevive a la desconexión del websocket y se
+puede reanudar. Backends (CHECKPOINT_BACKEND):
+  - "sqlite" (por defecto): archivo en disco en modo WAL (CHECKPOINT_DB_PATH).
+  - "memory": en memoria del proceso, útil para desarrollo y benchmarks.
+
+La poda (`prune_checkpoints`) elimina los hilos inactivos y deja solo los últimos
+checkpoints de cada hilo para acotar el crecimiento del archivo.
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(".cache", "checkpoints.sqlite"))
+CHECKPOINT_RETENTION_HOURS = float(os.getenv("CHECKPOINT_RETENTION_HOURS", 24))
+# Para reanudar basta el último; se guardan algunos más para depurar.
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", 5))
+
+CHECKPOINT_BUSY_TIMEOUT_MS = int(os.getenv("CHECKPOINT_BUSY_TIMEOUT_MS", 10000))
+
+_ACTIVITY_TABLE = "thread_activity"
+
+
+@asynccontextmanager
+async def open_checkpointer():
+    """Abre el checkpointer configurado y lo cierra al salir (ciclo de vida del servidor)."""
+    if CHECKPOINT_BACKEND == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        print("Checkpointer: memoria del proceso (el estado no sobrevive a reinicios).")
+        yield MemorySaver()
+        return
+
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    directory = os.path.dirname(CHECKPOINT_DB_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = await aiosqlite.connect(CHECKPOINT_DB_PATH)
+    try:
+        # WAL: las lecturas (reanudar, consultar estado) no bloquean a la escritura en curso.
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        # Con varios workers (serve.py) comparten el archivo: se espera al bloqueo en vez de fallar.
+        await conn.execute(f"PRAGMA busy_timeout={CHECKPOINT_BUSY_TIMEOUT_MS}")
+        await conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {_ACTIVITY_TABLE} (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+        )
+        await conn.commit()
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        print(f"Checkpointer: SQLite en '{CHECKPOINT_DB_PATH}' (WAL).")
+        yield saver
+    finally:
+        await conn.close()
+
+
+async def touch_thread(checkpointer, thread_id: str) -> None:
+    """Marca un hilo como activo (la poda usa esta marca para decidir qué caduca)."""
+    conn = getattr(checkpointer, "conn", None)
+    if conn is None:
+        return
+    async with checkpointer.lock:
+        await conn.execute(
+            f"INSERT INTO {_ACTIVITY_TABLE} (thread_id, last_seen) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen",
+            (thread_id, time.time()),
+        )
+        await conn.commit()
+
+
+async def prune_checkpoints(
+    checkpointer,
+    max_age_hours: float | None = None,
+    keep_per_thread: int | None = None,
+) -> dict:
+    """
+    Poda del almacén de checkpoints SQLite:
+      1. Borra por completo los hilos sin actividad en `max_age_hours`.
+      2. En el resto, conserva solo los `keep_per_thread` checkpoints más recientes
+         (los IDs de checkpoint son UUIDv6, ordenables por tiempo) y sus escrituras.
+
+    Returns:
+        Un resumen con el número de hilos y checkpoints eliminados.
+    """
+    conn = getattr(checkpointer, "conn", None)
+    if conn is None:
+        return {"threads": 0, "checkpoints": 0}
+    max_age_hours = CHECKPOINT_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    keep_per_thread = CHECKPOINT_KEEP_PER_THREAD if keep_per_thread is None else keep_per_thread
+    cutoff = time.time() - max_age_hours * 3600
+
+    async with checkpointer.lock:
+        cursor = await conn.execute(f"SELECT thread_id FROM {_ACTIVITY_TABLE} WHERE last_seen < ?", (cutoff,))
+        stale = [row[0] for row in await cursor.fetchall()]
+        for thread_id in stale:
+            await conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            await conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            await conn.execute(f"DELETE FROM {_ACTIVITY_TABLE} WHERE thread_id = ?", (thread_id,))
+
+        cursor = await conn.execute(
+            "DELETE FROM checkpoints WHERE rowid IN ("
+            "  SELECT rowid FROM ("
+            "    SELECT rowid, ROW_NUMBER() OVER ("
+            "      PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC"
+            "    ) AS position FROM checkpoints"
+            "  ) WHERE position > ?"
+            ")",
+            (keep_per_thread,),
+        )
+        removed_checkpoints = cursor.rowcount
+        await conn.execute(
+            "DELETE FROM writes WHERE NOT EXISTS ("
+            "  SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id"
+            "  AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id"
+            ")"
+        )
+        await conn.commit()
+        # Devuelve al archivo principal lo acumulado en el WAL y lo trunca.
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    summary = {"threads": len(stale), "checkpoints": removed_checkpoints}
+    if stale or removed_checkpoints:
+        print(f"Checkpointer: poda completada {summary}")
+    return summary
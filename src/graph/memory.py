@@ -0,0 +1,141 @@
+# Contenido para: src/graph/memory.py
+
+"""
+Memoria de conversación en el servidor.
+
+Cada conversación (la sesión del navegador) tiene un hilo propio en el checkpointer
+compartido, "memory:<conversation_id>", gestionado por un grafo mínimo de un solo nodo.
+Se guarda:
+  - `recent_turns`: los últimos turnos literales (acotados en número y longitud),
+  - `summary`: un resumen acumulado de todo lo anterior, generado de forma incremental
+    por el modelo conversacional (barato) cada vez que los turnos recientes se desbordan.
+
+Así el cliente ya no reenvía el historial y el tamaño de los prompts, de los mensajes
+del websocket y de cada checkpoint se mantiene constante aunque la conversación crezca.
+"""
+
+import os
+import re
+import asyncio
+import weakref
+from typing import List, Optional, Tuple, TypedDict
+
+from langgraph.graph import StateGraph, END
+
+from src.model import conversational_llm, llm_for_node
+from src.telemetry import traced_node
+from src.graph.checkpointer import touch_thread
+from src.tools.artifact_store import resolve
+
+# Turnos literales que se conservan tras cada resumen; se resume al llegar al doble.
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 8))
+MEMORY_MAX_TURN_CHARS = int(os.getenv("MEMORY_MAX_TURN_CHARS", 1200))
+MEMORY_MAX_SUMMARY_CHARS = int(os.getenv("MEMORY_MAX_SUMMARY_CHARS", 2000))
+
+_SAFE_ID = re.compile(r"^[\w-]+$")
+
+# Un candado por conversación: dos tareas que terminan a la vez leerían el mismo
+# checkpoint de memoria y la última escritura borraría los turnos de la otra.
+_conversation_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class MemoryState(TypedDict):
+    summary: Optional[str]
+    recent_turns: List[str]
+    new_turns: List[str]
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+async def summarize_turns(summary: str, turns: List[str]) -> str:
+    """Integra `turns` en el resumen existente con el modelo conversacional."""
+    prompt = f"""
+    Mantienes la memoria de una conversación entre un usuario y DevTeam-Bot (un equipo de agentes de desarrollo).
+    Actualiza el resumen incorporando los nuevos turnos. Conserva lo que siga siendo relevante:
+    objetivos del usuario, decisiones técnicas, tecnologías elegidas, archivos o proyectos generados
+    y tareas pendientes. Omite saludos y detalles irrelevantes. Máximo 10 líneas, en español.
+
+    Resumen actual:
+    {summary or "(vacío)"}
+
+    Nuevos turnos:
+    {chr(10).join(turns)}
+
+    Devuelve únicamente el resumen actualizado.
+    """
+    response = await llm_for_node(conversational_llm, "memory_summarizer").ainvoke(prompt)
+    return _clip(response.content.strip(), MEMORY_MAX_SUMMARY_CHARS)
+
+
+async def update_memory_node(state: MemoryState) -> dict:
+    turns = list(state.get("recent_turns") or []) + [
+        _clip(turn, MEMORY_MAX_TURN_CHARS) for turn in state.get("new_turns") or []
+    ]
+    summary = state.get("summary") or ""
+    if len(turns) > 2 * MEMORY_RECENT_TURNS:
+        overflow, turns = turns[:-MEMORY_RECENT_TURNS], turns[-MEMORY_RECENT_TURNS:]
+        try:
+            summary = await summarize_turns(summary, overflow)
+            print(f"Memoria: {len(overflow)} turnos integrados en el resumen.")
+        except Exception as e:
+            # Sin resumen nuevo se pierden los turnos desbordados, pero el estado sigue acotado.
+            print(f"Advertencia: no se pudo resumir la conversación ({e}).")
+    return {"summary": summary, "recent_turns": turns, "new_turns": []}
+
+
+def build_memory_graph(checkpointer):
+    workflow = StateGraph(MemoryState)
+    workflow.add_node("update_memory", traced_node("update_memory", update_memory_node))
+    workflow.set_entry_point("update_memory")
+    workflow.add_edge("update_memory", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _memory_config(conversation_id: str) -> dict:
+    return {"configurable": {"thread_id": f"memory:{conversation_id}"}}
+
+
+def is_valid_conversation_id(conversation_id: Optional[str]) -> bool:
+    return bool(conversation_id) and bool(_SAFE_ID.match(conversation_id))
+
+
+async def load_memory(memory_graph, conversation_id: Optional[str]) -> Tuple[str, List[str]]:
+    """Devuelve (resumen, turnos recientes) de la conversación; vacíos si no existe."""
+    if not is_valid_conversation_id(conversation_id):
+        return "", []
+    snapshot = await memory_graph.aget_state(_memory_config(conversation_id))
+    values = snapshot.values or {}
+    return values.get("summary") or "", list(values.get("recent_turns") or [])
+
+
+async def append_turns(memory_graph, checkpointer, conversation_id: Optional[str], turns: List[str]) -> None:
+    """Añade los turnos de una tarea terminada (y resume si hace falta)."""
+    if not turns or not is_valid_conversation_id(conversation_id):
+        return
+    config = _memory_config(conversation_id)
+    lock = _conversation_locks.get(conversation_id)
+    if lock is None:
+        lock = _conversation_locks[conversation_id] = asyncio.Lock()
+    async with lock:
+        await touch_thread(checkpointer, config["configurable"]["thread_id"])
+        await memory_graph.ainvoke({"new_turns": turns}, config=config)
+
+
+def collect_turns(values: dict) -> List[str]:
+    """Extrae del estado final de una tarea lo que el usuario pidió y lo que vio como respuesta."""
+    turns = []
+    if values.get("user_input"):
+        turns.append(f"Usuario: {values['user_input']}")
+    for key in ("final_response", "ui_ux_spec", "analysis_result"):
+        if values.get(key):
+            turns.append(f"Bot: {resolve(values[key])}")
+    plan = values.get("dev_plan") or {}
+    if plan.get("plan_type") not in (None, "none"):
+        tasks = "; ".join(plan[key] for key in ("frontend_task", "backend_task", "db_task") if plan.get(key))
+        turns.append(f"Bot: Plan de desarrollo ({plan['plan_type']}): {tasks}")
+    if values.get("feedback"):
+        prefix = "Auditoría" if values.get("code_approved") else "Feedback del Auditor"
+        turns.append(f"Bot: {prefix}: {values['feedback']}")
+    return turns
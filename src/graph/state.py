@@ -1,33 +1,96 @@
-from typing import TypedDict, List, Dict, Annotated, Optional, Union
+from typing import TypedDict, List, Dict, Annotated, Optional, Union, Any
+
+
+# --- Reductores para las ramas paralelas de desarrollo ---
+# Cuando varios desarrolladores se ejecutan en el mismo paso del grafo, LangGraph
+# exige un reductor para cada clave que escriben a la vez.
+
+def keep_last(current: Any, update: Any) -> Any:
+    """
+    Conserva el último valor escrito. Solo para claves que las ramas paralelas
+    escriben con el mismo valor: en la ronda paralela no hay correcciones, así que
+    todos los desarrolladores devuelven `review_feedback=None`.
+    """
+    return update
+
+
+def merge_dicts(current: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Une los diccionarios de las ramas paralelas (claves distintas por archivo).
+    Escribir None lo vacía: así el auditor descarta los diffs que ya revisó.
+    """
+    if update is None:
+        return {}
+    return {**(current or {}), **update}
+
+
+def keep_max(current: Optional[int], update: Optional[int]) -> Optional[int]:
+    """Para contadores: las ramas paralelas cuentan como un único salto del supervisor."""
+    if current is None:
+        return update
+    if update is None:
+        return current
+    return max(current, update)
+
+
+def merge_unique(current: Optional[List[str]], update: Optional[List[str]]) -> List[str]:
+    """Une listas sin duplicados conservando el orden (p. ej. archivos generados en la tarea)."""
+    merged = list(current or [])
+    for item in update or []:
+        if item not in merged:
+            merged.append(item)
+    return merged
+
+
+# Turnos literales que viajan en el estado de una tarea; lo anterior vive resumido
+# en la memoria de la conversación (src/graph/memory.py).
+CHAT_HISTORY_MAX_TURNS = 16
+
+
+def append_bounded(current: Optional[List[str]], update: Optional[List[str]]) -> List[str]:
+    """Añade turnos al historial conservando solo los CHAT_HISTORY_MAX_TURNS más recientes."""
+    return (list(current or []) + list(update or []))[-CHAT_HISTORY_MAX_TURNS:]
+
+
+# Handle del almacén de artefactos (src/tools/artifact_store.py): {"artifact", "size", "path"?}.
+# El código y los textos largos se guardan allí; el estado (y cada checkpoint) solo lleva esto.
+ArtifactRef = Dict[str, Any]
+
 
 class GraphState(TypedDict):
     # --- Campos de Conversación y Decisión ---
     user_input: str
-    chat_history: Annotated[List[str], lambda x, y: x + y]
+    chat_history: Annotated[List[str], append_bounded]
+    conversation_summary: Optional[str]
     final_response: Optional[str]
     task_complete: Optional[bool]
     routing_decision: str
-    supervisor_iterations: Optional[int] 
+    supervisor_iterations: Annotated[Optional[int], keep_max]
 
     # --- Campos de Desarrollo y Archivos ---
     file_paths: List[str]
-    ui_ux_spec: Optional[str]
+    workspace_dir: Optional[str]
+    ui_ux_spec: Optional[Union[str, ArtifactRef]]
     dev_plan: Optional[Dict[str, str]]
+    parallel_routes: Optional[List[str]]
 
-    frontend_code: Optional[Dict[str, str]]
-    backend_code: Optional[str]
-    last_code_generated: Optional[Union[str, Dict[str, str]]]
-    db_schema: Optional[str]
+    frontend_code: Optional[Dict[str, ArtifactRef]]
+    backend_code: Optional[Dict[str, ArtifactRef]]
+    db_schema: Optional[Dict[str, ArtifactRef]]
+    generated_files: Annotated[List[str], merge_unique]
+    # Diffs (ruta -> diff unificado) pendientes de auditar, para la auditoría incremental.
+    code_changes: Annotated[Optional[Dict[str, str]], merge_dicts]
 
     # --- Campos de Auditoría y Feedback --
     feedback: Optional[str]
-    review_feedback: Optional[str]
+    review_feedback: Annotated[Optional[str], keep_last]
     review_count: int
     code_approved: Optional[bool] 
     rag_status: Optional[str]
     rag_context: Optional[str]
     rag_queries_made: Optional[List[str]]
-    analysis_result: Optional[str]
+    analysis_result: Optional[Union[str, ArtifactRef]]
+    audit_token_usage: Optional[Dict[str, int]]
 
     # --- CAMPO CLAVE PARA VISUALIZAR EL PROCESO RAG ITERATIVO ---
     rag_steps: Annotated[List[str], lambda x, y: x + y]
@@ -1,8 +1,9 @@
 from langgraph.graph import StateGraph, END
 from src.graph.state import GraphState
+from src.telemetry import traced_node
 
 # --- Importar todos los nodos de los agentes y herramientas ---
-from src.agents.supervisor_agent import supervisor_node
+from src.agents.supervisor_agent import supervisor_node, PARALLEL_DEVELOPERS
 from src.agents.conversational_agent import conversational_node
 from src.agents.multimodal_analyzer_agent import multimodal_analyzer_node
 from src.agents.ui_ux_designer_agent import ui_ux_designer_node
@@ -13,10 +14,18 @@ from src.agents.quality_auditor import quality_auditor_node
 from src.agents.database_architech_agent import database_architech_node
 
 
-def route_to_specialist(state: dict) -> str:
-    """Enruta desde el supervisor a los especialistas o finaliza."""
+def route_to_specialist(state: dict) -> str | list[str]:
+    """
+    Enruta desde el supervisor a los especialistas o finaliza.
+
+    Si el supervisor decide un fan-out, se devuelve la lista de desarrolladores:
+    LangGraph los ejecuta en el mismo paso y, como todos regresan al supervisor,
+    este se ejecuta una sola vez cuando terminan (punto de unión antes del auditor).
+    """
     decision = state.get("routing_decision")
     print(f"---LÓGICA DE ENRUTAMIENTO CENTRAL: Decisión del Supervisor = {decision}---")
+    if decision == PARALLEL_DEVELOPERS:
+        return state.get("parallel_routes") or "__end__"
     return decision
 
 
@@ -53,15 +62,18 @@ def build_graph(checkpointer):
     workflow = StateGraph(GraphState)
 
     # --- Añadir TODOS los nodos al grafo ---
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("conversational_agent", conversational_node)
-    workflow.add_node("multimodal_analyzer", multimodal_analyzer_node)
-    workflow.add_node("ui_ux_designer", ui_ux_designer_node)
-    workflow.add_node("planner", planner_node)
-    workflow.add_node("develop_backend", backend_developer_node)
-    workflow.add_node("develop_frontend", frontend_developer_node)
-    workflow.add_node("quality_auditor", quality_auditor_node)
-    workflow.add_node("database_architech", database_architech_node)
+    # Todos los nodos son corutinas (usan `ainvoke`), de modo que `astream` en main.py
+    # puede atender varias sesiones concurrentes en un mismo worker sin bloquear el event loop.
+    # `traced_node` emite un span y métricas por invocación (ver src/telemetry.py).
+    workflow.add_node("supervisor", traced_node("supervisor", supervisor_node))
+    workflow.add_node("conversational_agent", traced_node("conversational_agent", conversational_node))
+    workflow.add_node("multimodal_analyzer", traced_node("multimodal_analyzer", multimodal_analyzer_node))
+    workflow.add_node("ui_ux_designer", traced_node("ui_ux_designer", ui_ux_designer_node))
+    workflow.add_node("planner", traced_node("planner", planner_node))
+    workflow.add_node("develop_backend", traced_node("develop_backend", backend_developer_node))
+    workflow.add_node("develop_frontend", traced_node("develop_frontend", frontend_developer_node))
+    workflow.add_node("quality_auditor", traced_node("quality_auditor", quality_auditor_node))
+    workflow.add_node("database_architech", traced_node("database_architech", database_architech_node))
     
     # Punto de entrada
     workflow.set_entry_point("supervisor")
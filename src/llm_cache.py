@@ -0,0 +1,209 @@
+# Contenido para: src/llm_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+
+class SQLiteTTLCache:
+    """
+    Almacén clave/valor persistente en SQLite con caducidad (TTL), expulsión por
+    tamaño (LRU según el último acceso) y contadores de aciertos/fallos.
+    Es seguro para usarse desde varios hilos (las llamadas async usan un executor).
+    """
+
+    def __init__(self, db_path: str, table: str, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.db_path = db_path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table}(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def contains(self, key: str) -> bool:
+        """Comprueba si hay una entrada vigente sin contarla como acierto ni tocar su último acceso."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl_seconds
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Elimina lo caducado y, si se superan los límites, las entradas menos usadas."""
+        expired = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self.evictions += max(expired, 0)
+
+        count, total_size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total_size -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", to_delete)
+        self.evictions += len(to_delete)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total_size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "size_bytes": total_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class PersistentLLMCache(BaseCache):
+    """
+    Caché de respuestas de LLM direccionada por contenido. La clave es un hash de
+    `llm_string` (modelo, temperatura y demás parámetros que LangChain serializa)
+    más el prompt/mensajes serializados, así que solo se reutiliza una respuesta
+    cuando la petición es idéntica.
+    """
+
+    def __init__(self, store: SQLiteTTLCache):
+        self.store = store
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self.store.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            return [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            print(f"ADVERTENCIA (Caché LLM): Entrada corrupta ignorada: {e}")
+            return None
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        return self.store.contains(self._key(prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = json.dumps([dumps(generation) for generation in return_val])
+        self.store.set(self._key(prompt, llm_string), value)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+
+def _create_llm_cache() -> Optional[PersistentLLMCache]:
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        print("Caché de LLM desactivada (LLM_CACHE_ENABLED=false).")
+        return None
+    store = SQLiteTTLCache(
+        db_path=os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite")),
+        table="llm_responses",
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)),
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", 200)) * 1024 * 1024,
+    )
+    return PersistentLLMCache(store)
+
+
+# Instancia compartida por todos los modelos de src/model.py
+llm_cache = _create_llm_cache()
+
+
+def has_cached_response(client, input, stop=None, **kwargs) -> bool:
+    """
+    Indica si `client.ainvoke(input, stop=stop, **kwargs)` se respondería desde la
+    caché persistente sin llamar al proveedor. Calcula la misma clave que LangChain
+    (mensajes serializados + `llm_string`); ante cualquier duda devuelve False y la
+    llamada se trata como una petición real.
+    """
+    cache = getattr(client, "cache", None)
+    if cache is None or cache is True:
+        from langchain_core.globals import get_llm_cache
+        cache = get_llm_cache()
+    if not isinstance(cache, PersistentLLMCache):
+        return False
+    try:
+        messages = client._convert_input(input).to_messages()
+        llm_string = client._get_llm_string(stop=stop, **kwargs)
+    except Exception:
+        return False
+    return cache.contains(dumps(messages), llm_string)
+
+
+def get_llm_cache_stats() -> dict:
+    """Devuelve los contadores de la caché de LLM (o un indicador de que está desactivada)."""
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.store.stats()}
@@ -0,0 +1,540 @@
+# Contenido para: src/llm_scheduler.py
+
+"""
+Planificador compartido de llamadas a los LLM.
+
+Todas las llamadas `ainvoke` de los tres handles de `src/model.py` pasan por aquí:
+  - cubetas de tokens por proveedor (peticiones/min, tokens/min y peticiones/día),
+  - cola de prioridad: las respuestas conversacionales van antes que la generación
+    de código masiva,
+  - límite de llamadas simultáneas por proveedor,
+  - reintentos con backoff exponencial y jitter ante errores 429, pausando el
+    proveedor completo para no seguir chocando contra la cuota,
+  - métricas de profundidad de cola y tiempos de espera.
+
+Las respuestas que ya están en la caché persistente (src/llm_cache.py) no llegan al
+proveedor: se sirven sin consumir cuota ni turno en la cola.
+
+Límites configurables por entorno: GROQ_RPM, GROQ_TPM, GROQ_RPD, GROQ_MAX_CONCURRENCY
+y los equivalentes GEMINI_*. Un valor 0 desactiva ese límite.
+
+Con varios workers (`serve.py` fija LLM_QUOTA_WORKERS) las cubetas, las llamadas en
+curso y las pausas por 429 de cada proveedor viven en una base SQLite compartida
+(LLM_QUOTA_DB): todos los procesos gastan de la misma cuota en lugar de un reparto fijo.
+La cola de prioridad sigue siendo de cada proceso.
+"""
+
+import os
+import time
+import heapq
+import sqlite3
+import random
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.llm_cache import has_cached_response
+
+# Prioridades: menor número = se atiende antes.
+PRIORITY_INTERACTIVE = 0   # respuestas conversacionales
+PRIORITY_ANALYTICAL = 1    # supervisor, planificador, auditor
+PRIORITY_BULK = 2          # generación de código e imágenes
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "1.0"))
+BACKOFF_CAP_S = float(os.getenv("LLM_BACKOFF_CAP_S", "30"))
+# Si la cuota no se libera en este tiempo (p. ej. la diaria de Gemini), se falla rápido.
+MAX_QUEUE_WAIT_S = float(os.getenv("LLM_MAX_QUEUE_WAIT_S", "180"))
+# Tokens de salida que se reservan por llamada hasta conocer el uso real.
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Modo multi-worker: cuota compartida entre procesos.
+LLM_QUOTA_WORKERS = max(1, int(os.getenv("LLM_QUOTA_WORKERS", "1")))
+LLM_QUOTA_DB = os.getenv("LLM_QUOTA_DB", os.path.join(".cache", "llm_quota.sqlite"))
+# Las liberaciones de otros procesos no despiertan a esta cola: se vuelve a mirar con esta frecuencia.
+SHARED_QUOTA_POLL_S = float(os.getenv("LLM_SHARED_QUOTA_POLL_S", "0.25"))
+
+
+class QuotaExhaustedError(RuntimeError):
+    """La cuota del proveedor no se liberará dentro del tiempo máximo de espera."""
+
+
+@dataclass
+class ProviderLimits:
+    rpm: int
+    tpm: int
+    rpd: int
+    max_concurrency: int
+
+    @classmethod
+    def from_env(cls, prefix: str, rpm: int, tpm: int, rpd: int, max_concurrency: int) -> "ProviderLimits":
+        return cls(
+            rpm=int(os.getenv(f"{prefix}_RPM", rpm)),
+            tpm=int(os.getenv(f"{prefix}_TPM", tpm)),
+            rpd=int(os.getenv(f"{prefix}_RPD", rpd)),
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_concurrency)),
+        )
+
+    def bucket_specs(self) -> Dict[str, tuple]:
+        """(capacidad, periodo en segundos) de cada cubeta activa."""
+        specs = {
+            "requests_per_minute": (self.rpm, 60),
+            "tokens_per_minute": (self.tpm, 60),
+            "requests_per_day": (self.rpd, 86400),
+        }
+        return {key: spec for key, spec in specs.items() if spec[0]}
+
+
+# Valores por defecto de los planes gratuitos (Groq por minuto; Gemini 2.5 Flash-Lite 250 req/día).
+PROVIDER_LIMITS = {
+    "groq": ProviderLimits.from_env("GROQ", rpm=30, tpm=12000, rpd=1000, max_concurrency=8),
+    "gemini": ProviderLimits.from_env("GEMINI", rpm=15, tpm=250000, rpd=250, max_concurrency=4),
+}
+
+
+class TokenBucket:
+    """Cubeta de tokens clásica. `capacity` es también el consumo máximo de una sola petición."""
+
+    def __init__(self, capacity: float, period_s: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_s
+        self.level = self.capacity
+        self.updated = time.time()
+
+    def _refill(self) -> None:
+        now = time.time()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos hasta poder consumir `amount` (0 si ya es posible)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Consume sin comprobar; admite ajustes negativos (devolver lo reservado de más)."""
+        self._refill()
+        self.level = min(self.capacity, self.level - min(amount, self.capacity))
+
+
+class LocalQuota:
+    """Cubetas, llamadas en curso y pausa de un proveedor dentro de este proceso."""
+
+    # Las liberaciones son del propio proceso y despiertan a la cola: no hace falta sondear.
+    poll_s = None
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        self.limits = limits
+        self.buckets = {key: TokenBucket(capacity, period) for key, (capacity, period) in limits.bucket_specs().items()}
+        self._in_flight = 0
+        self._paused_until = 0.0
+
+    def try_acquire(self, amounts: Dict[str, float]) -> float:
+        """Consume la cuota y devuelve 0, o los segundos a esperar (inf: límite de concurrencia)."""
+        if self.limits.max_concurrency and self._in_flight >= self.limits.max_concurrency:
+            return float("inf")
+        wait = max(0.0, self._paused_until - time.time())
+        for key, bucket in self.buckets.items():
+            wait = max(wait, bucket.wait_time(amounts[key]))
+        if wait == 0:
+            for key, bucket in self.buckets.items():
+                bucket.consume(amounts[key])
+            self._in_flight += 1
+        return wait
+
+    def release(self, token_adjustment: Optional[int]) -> None:
+        self._in_flight -= 1
+        if token_adjustment is not None and "tokens_per_minute" in self.buckets:
+            self.buckets["tokens_per_minute"].consume(token_adjustment)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.time() + seconds)
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def daily_fraction(self) -> float:
+        """Fracción que queda del cupo diario de peticiones (1.0 si no hay límite diario)."""
+        bucket = self.buckets.get("requests_per_day")
+        if bucket is None:
+            return 1.0
+        bucket._refill()
+        return max(0.0, bucket.level / bucket.capacity)
+
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.time())
+
+
+class SharedQuota:
+    """
+    Igual que `LocalQuota`, pero el estado vive en SQLite y lo comparten todos los
+    workers: cada comprobación y consumo es una transacción `BEGIN IMMEDIATE`. Las
+    llamadas en curso se anotan por PID; las de procesos que ya no existen se descartan.
+    """
+
+    poll_s = SHARED_QUOTA_POLL_S
+
+    def __init__(self, name: str, limits: ProviderLimits, db_path: str = LLM_QUOTA_DB):
+        self.name = name
+        self.limits = limits
+        self._specs = limits.bucket_specs()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_quota_buckets ("
+            "provider TEXT NOT NULL, bucket TEXT NOT NULL, level REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (provider, bucket))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_quota_pauses (provider TEXT PRIMARY KEY, paused_until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_quota_in_flight ("
+            "provider TEXT NOT NULL, pid INTEGER NOT NULL, calls INTEGER NOT NULL, PRIMARY KEY (provider, pid))"
+        )
+        # Restos de un proceso anterior que tuviera este mismo PID.
+        self._conn.execute("DELETE FROM llm_quota_in_flight WHERE provider = ? AND pid = ?", (name, os.getpid()))
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn, time.time())
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _levels(self, conn, now: float) -> Dict[str, float]:
+        rows = dict(
+            (bucket, (level, updated)) for bucket, level, updated in conn.execute(
+                "SELECT bucket, level, updated FROM llm_quota_buckets WHERE provider = ?", (self.name,)
+            )
+        )
+        levels = {}
+        for key, (capacity, period) in self._specs.items():
+            level, updated = rows.get(key, (capacity, now))
+            levels[key] = min(capacity, level + max(0.0, now - updated) * capacity / period)
+        return levels
+
+    def _store_levels(self, conn, now: float, levels: Dict[str, float]) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO llm_quota_buckets (provider, bucket, level, updated) VALUES (?, ?, ?, ?)",
+            [(self.name, key, level, now) for key, level in levels.items()],
+        )
+
+    def _count_in_flight(self, conn) -> int:
+        total = 0
+        for pid, calls in conn.execute(
+            "SELECT pid, calls FROM llm_quota_in_flight WHERE provider = ?", (self.name,)
+        ).fetchall():
+            if pid != os.getpid() and not _process_alive(pid):
+                conn.execute("DELETE FROM llm_quota_in_flight WHERE provider = ? AND pid = ?", (self.name, pid))
+                continue
+            total += calls
+        return total
+
+    def _paused_until(self, conn) -> float:
+        row = conn.execute("SELECT paused_until FROM llm_quota_pauses WHERE provider = ?", (self.name,)).fetchone()
+        return row[0] if row else 0.0
+
+    def try_acquire(self, amounts: Dict[str, float]) -> float:
+        def attempt(conn, now):
+            if self.limits.max_concurrency and self._count_in_flight(conn) >= self.limits.max_concurrency:
+                return float("inf")
+            wait = max(0.0, self._paused_until(conn) - now)
+            levels = self._levels(conn, now)
+            for key, (capacity, period) in self._specs.items():
+                amount = min(amounts[key], capacity)
+                if levels[key] < amount:
+                    wait = max(wait, (amount - levels[key]) * period / capacity)
+            if wait > 0:
+                return wait
+            self._store_levels(conn, now, {key: levels[key] - min(amounts[key], capacity)
+                                           for key, (capacity, _) in self._specs.items()})
+            conn.execute(
+                "INSERT INTO llm_quota_in_flight (provider, pid, calls) VALUES (?, ?, 1) "
+                "ON CONFLICT (provider, pid) DO UPDATE SET calls = calls + 1",
+                (self.name, os.getpid()),
+            )
+            return 0.0
+
+        return self._transaction(attempt)
+
+    def release(self, token_adjustment: Optional[int]) -> None:
+        def apply(conn, now):
+            conn.execute(
+                "UPDATE llm_quota_in_flight SET calls = MAX(calls - 1, 0) WHERE provider = ? AND pid = ?",
+                (self.name, os.getpid()),
+            )
+            if token_adjustment is not None and "tokens_per_minute" in self._specs:
+                capacity = self._specs["tokens_per_minute"][0]
+                level = self._levels(conn, now)["tokens_per_minute"]
+                adjustment = min(token_adjustment, capacity)
+                self._store_levels(conn, now, {"tokens_per_minute": min(capacity, level - adjustment)})
+
+        self._transaction(apply)
+
+    def pause(self, seconds: float) -> None:
+        self._transaction(lambda conn, now: conn.execute(
+            "INSERT INTO llm_quota_pauses (provider, paused_until) VALUES (?, ?) "
+            "ON CONFLICT (provider) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)",
+            (self.name, now + seconds),
+        ))
+
+    def in_flight(self) -> int:
+        return self._transaction(lambda conn, now: self._count_in_flight(conn))
+
+    def daily_fraction(self) -> float:
+        if "requests_per_day" not in self._specs:
+            return 1.0
+        capacity = self._specs["requests_per_day"][0]
+        return self._transaction(lambda conn, now: max(0.0, self._levels(conn, now)["requests_per_day"] / capacity))
+
+    def paused_for(self) -> float:
+        return self._transaction(lambda conn, now: max(0.0, self._paused_until(conn) - now))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Reconoce los 429 de Groq (RateLimitError) y de Gemini (ResourceExhausted)."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    name = type(error).__name__
+    text = str(error)
+    return "RateLimit" in name or "ResourceExhausted" in name or "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_prompt_tokens(prompt: Any) -> int:
+    """Estimación barata (~4 caracteres por token) de un prompt de texto o de mensajes."""
+    if isinstance(prompt, str):
+        return len(prompt) // 4 + 1
+    total = 0
+    for message in prompt if isinstance(prompt, (list, tuple)) else [prompt]:
+        content = getattr(message, "content", message)
+        if isinstance(content, list):
+            # Solo las partes de texto: las imágenes en base64 no cuentan como tokens de texto.
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += len(str(content)) // 4 + 1
+    return total
+
+
+class ProviderScheduler:
+    """Cola de prioridad y límites de un proveedor. Vive en el event loop del servidor."""
+
+    def __init__(self, name: str, limits: ProviderLimits, shared: bool = False):
+        self.name = name
+        self.limits = limits
+        self.quota = SharedQuota(name, limits) if shared else LocalQuota(name, limits)
+        self._waiters: List[tuple] = []
+        self._events: Dict[int, asyncio.Event] = {}
+        self._counter = itertools.count()
+        # Métricas
+        self.granted = 0
+        self.cache_hits = 0
+        self.retries_429 = 0
+        self.failures = 0
+        self.wait_s_total = 0.0
+        self.max_depth = 0
+
+    def _amounts(self, tokens: int) -> Dict[str, float]:
+        return {
+            "requests_per_minute": 1,
+            "tokens_per_minute": tokens,
+            "requests_per_day": 1,
+        }
+
+    def _wake_head(self) -> None:
+        if self._waiters:
+            self._events[self._waiters[0][1]].set()
+
+    async def acquire(self, priority: int, tokens: int) -> None:
+        seq = next(self._counter)
+        entry = (priority, seq)
+        event = asyncio.Event()
+        self._events[seq] = event
+        heapq.heappush(self._waiters, entry)
+        self.max_depth = max(self.max_depth, len(self._waiters))
+        start = time.monotonic()
+        try:
+            while True:
+                if self._waiters[0] == entry:
+                    wait = self.quota.try_acquire(self._amounts(tokens))
+                    if wait == 0:
+                        break
+                    if wait != float("inf") and time.monotonic() - start + wait > MAX_QUEUE_WAIT_S:
+                        raise QuotaExhaustedError(
+                            f"Cuota de '{self.name}' agotada: la siguiente petición tendría que esperar {wait:.0f}s."
+                        )
+                    if self.quota.poll_s is not None:
+                        # Otro proceso puede liberar cuota antes: no se duerme más que el sondeo.
+                        wait = min(wait, self.quota.poll_s)
+                else:
+                    wait = None  # no es su turno: espera a que lo despierten
+                event.clear()
+                try:
+                    timeout = None if wait in (None, float("inf")) else wait
+                    await asyncio.wait_for(event.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            heapq.heappop(self._waiters)
+            self.granted += 1
+            self.wait_s_total += time.monotonic() - start
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            self._events.pop(seq, None)
+            self._wake_head()
+
+    def release(self, reserved_tokens: int, used_tokens: Optional[int]) -> None:
+        # Corrige la reserva con el uso real (negativo = devolver tokens a la cubeta).
+        self.quota.release(None if used_tokens is None else used_tokens - reserved_tokens)
+        self._wake_head()
+
+    def pause(self, seconds: float) -> None:
+        """Tras un 429 nadie vuelve a llamar al proveedor hasta que pase la pausa."""
+        self.quota.pause(seconds)
+
+    def snapshot(self) -> dict:
+        depth_by_priority: Dict[int, int] = {}
+        for priority, _ in self._waiters:
+            depth_by_priority[priority] = depth_by_priority.get(priority, 0) + 1
+        return {
+            "queue_depth": len(self._waiters),
+            "queue_depth_by_priority": depth_by_priority,
+            "max_queue_depth": self.max_depth,
+            "in_flight": self.quota.in_flight(),
+            "shared_quota": isinstance(self.quota, SharedQuota),
+            "granted": self.granted,
+            "cache_hits": self.cache_hits,
+            "retries_429": self.retries_429,
+            "failures": self.failures,
+            "avg_wait_s": round(self.wait_s_total / self.granted, 3) if self.granted else 0.0,
+            "paused_for_s": round(self.quota.paused_for(), 2),
+            "limits": vars(self.limits),
+        }
+
+
+class LLMScheduler:
+    """Punto de entrada único: un `ProviderScheduler` por proveedor."""
+
+    def __init__(self, limits: Dict[str, ProviderLimits], shared: bool = False):
+        self._limits = limits
+        self._shared = shared
+        self._providers: Dict[str, ProviderScheduler] = {}
+        self._lock = threading.Lock()
+
+    def provider(self, name: str) -> ProviderScheduler:
+        with self._lock:
+            if name not in self._providers:
+                limits = self._limits.get(name) or ProviderLimits(rpm=0, tpm=0, rpd=0, max_concurrency=0)
+                self._providers[name] = ProviderScheduler(name, limits, shared=self._shared)
+            return self._providers[name]
+
+    async def run(self, provider_name: str, priority: int, prompt: Any, call, is_cached=None):
+        """
+        Ejecuta `call()` (una corutina nueva por intento) respetando cuotas y prioridad,
+        reintentando los 429 con backoff exponencial y jitter. Si `is_cached()` (una
+        consulta síncrona a SQLite, que corre en un hilo) indica que la respuesta sale
+        de la caché, se ejecuta directamente, sin reservar cuota.
+        """
+        provider = self.provider(provider_name)
+        if is_cached is not None and await asyncio.to_thread(is_cached):
+            provider.cache_hits += 1
+            return await call()
+        reserved = estimate_prompt_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+        for attempt in range(MAX_RETRIES + 1):
+            await provider.acquire(priority, reserved)
+            used = None
+            try:
+                response = await call()
+                usage = getattr(response, "usage_metadata", None) or {}
+                used = usage.get("total_tokens")
+                return response
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == MAX_RETRIES:
+                    provider.failures += 1
+                    raise
+                provider.retries_429 += 1
+                delay = _retry_after(e) or random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2 ** attempt))
+                print(f"⏳ 429 de '{provider_name}' (intento {attempt + 1}/{MAX_RETRIES}); reintentando en {delay:.1f}s")
+                provider.pause(delay)
+            finally:
+                provider.release(reserved, used)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: scheduler.snapshot() for name, scheduler in providers.items()}
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP devteam_llm_queue_depth Llamadas LLM esperando turno por proveedor.",
+            "# TYPE devteam_llm_queue_depth gauge",
+        ]
+        snapshot = self.snapshot()
+        for name, stats in sorted(snapshot.items()):
+            lines.append(f'devteam_llm_queue_depth{{provider="{name}"}} {stats["queue_depth"]}')
+        lines += ["# TYPE devteam_llm_in_flight gauge"]
+        lines += [f'devteam_llm_in_flight{{provider="{n}"}} {s["in_flight"]}' for n, s in sorted(snapshot.items())]
+        lines += ["# TYPE devteam_llm_cache_hits_total counter"]
+        lines += [f'devteam_llm_cache_hits_total{{provider="{n}"}} {s["cache_hits"]}' for n, s in sorted(snapshot.items())]
+        lines += ["# TYPE devteam_llm_rate_limit_retries_total counter"]
+        lines += [f'devteam_llm_rate_limit_retries_total{{provider="{n}"}} {s["retries_429"]}' for n, s in sorted(snapshot.items())]
+        return "\n".join(lines) + "\n"
+
+
+llm_scheduler = LLMScheduler(PROVIDER_LIMITS, shared=LLM_QUOTA_WORKERS > 1)
+
+
+class ScheduledLLM:
+    """
+    Envuelve un cliente de chat para que `ainvoke` pase por el planificador.
+    El resto de atributos se delegan en el cliente.
+    """
+
+    def __init__(self, client, provider: str, priority: int):
+        self._client = client
+        self.provider = provider
+        self._provider = provider
+        self._priority = priority
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await llm_scheduler.run(
+            self._provider, self._priority, input,
+            lambda: self._client.ainvoke(input, config=config, **kwargs),
+            is_cached=lambda: has_cached_response(self._client, input, **kwargs),
+        )
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
@@ -1,7 +1,12 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
 import os
+import threading
 from dotenv import load_dotenv
+from src.llm_cache import llm_cache, has_cached_response
+from src.llm_scheduler import (
+    ScheduledLLM, llm_scheduler,
+    PRIORITY_INTERACTIVE, PRIORITY_ANALYTICAL, PRIORITY_BULK,
+)
+from src.model_router import RoutedLLM, NODE_MODEL_CANDIDATES, HEDGED_NODES, timeout_for_node
 
 load_dotenv()
 
@@ -9,63 +14,194 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 
-try:
-    analytical_llm = ChatGroq(
+class LazyLLM:
+    """
+    Proxy que construye el cliente del LLM la primera vez que se usa, de modo que
+    importar este módulo (y por tanto el grafo) no paga el coste de los SDKs.
+    Cualquier atributo (`invoke`, `astream`...) se delega en el cliente real; `ainvoke`
+    pasa además por el planificador compartido (cuotas del proveedor y prioridad),
+    salvo que la respuesta ya esté en la caché.
+    """
+
+    def __init__(self, name: str, factory, help_url: str, provider: str, priority: int):
+        self.name = name
+        self.provider = provider
+        self.priority = priority
+        self._factory = factory
+        self._help_url = help_url
+        self._client = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Devuelve el cliente real, o None si no se pudo configurar."""
+        if self._client is None and not self._failed:
+            with self._lock:
+                if self._client is None and not self._failed:
+                    try:
+                        self._client = self._factory()
+                        print(f"✅ {self.name} configurado correctamente")
+                    except Exception as e:
+                        print(f"⚠️ Error configurando {self.name}: {e}")
+                        print(f"   Obtén tu API key en: {self._help_url}")
+                        self._failed = True
+        return self._client
+
+    def override(self, client) -> None:
+        """Sustituye el cliente real (p. ej. por un LLM falso en los benchmarks offline)."""
+        with self._lock:
+            self._client = client
+            self._failed = client is None
+
+    def _require(self):
+        client = self.get()
+        if client is None:
+            raise RuntimeError(f"El modelo '{self.name}' no está configurado.")
+        return client
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        client = self._require()
+        return await llm_scheduler.run(
+            self.provider, self.priority, input,
+            lambda: client.ainvoke(input, config=config, **kwargs),
+            is_cached=lambda: has_cached_response(client, input, **kwargs),
+        )
+
+    def __getattr__(self, attr):
+        return getattr(self._require(), attr)
+
+
+def _build_analytical_llm():
+    from langchain_groq import ChatGroq
+    return ChatGroq(
         model="llama-3.3-70b-versatile",  
         groq_api_key=GROQ_API_KEY,
-        temperature=0.3
+        temperature=0.3,
+        cache=llm_cache
     )
 
-    conversational_llm = ChatGroq(
+def _build_conversational_llm():
+    from langchain_groq import ChatGroq
+    return ChatGroq(
         model="llama-3.1-8b-instant",  
         groq_api_key=GROQ_API_KEY,
-        temperature=0.7
+        temperature=0.7,
+        cache=llm_cache
     )
-    
-    print("✅ Groq configurado correctamente")
-except Exception as e:
-    print(f"⚠️ Error configurando Groq: {e}")
-    print("   Obtén tu API key en: https://console.groq.com/")
-    analytical_llm = None
-    conversational_llm = None
 
 # --- GEMINI (GRATIS - 250 req/día) ---
 # Para: Generación de código (Frontend, Backend, Database)
-try:
-    creative_llm = ChatGoogleGenerativeAI(
+def _build_creative_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
         model="gemini-2.5-flash-lite",
         google_api_key=GOOGLE_API_KEY,
         temperature=0.3,
-        max_output_tokens=8192
+        max_output_tokens=8192,
+        cache=llm_cache
     )
-    print("✅ Gemini configurado correctamente")
-except Exception as e:
-    print(f"⚠️ Error configurando Gemini: {e}")
-    print("   Obtén tu API key en: https://aistudio.google.com/apikey")
-    creative_llm = None
+
+
+# Los tres handles comparten el planificador de `src/llm_scheduler.py`: las respuestas
+# conversacionales se atienden antes que el análisis, y este antes que la generación de código.
+analytical_llm = LazyLLM("Groq (analytical)", _build_analytical_llm, "https://console.groq.com/",
+                         provider="groq", priority=PRIORITY_ANALYTICAL)
+conversational_llm = LazyLLM("Groq (conversational)", _build_conversational_llm, "https://console.groq.com/",
+                             provider="groq", priority=PRIORITY_INTERACTIVE)
+creative_llm = LazyLLM("Gemini (creative)", _build_creative_llm, "https://aistudio.google.com/apikey",
+                       provider="gemini", priority=PRIORITY_BULK)
+
+_HANDLES = {"analytical": analytical_llm, "conversational": conversational_llm, "creative": creative_llm}
+
+
+def override_llms(analytical=None, creative=None, conversational=None) -> None:
+    """Sustituye los clientes indicados en los tres handles compartidos por los agentes."""
+    for handle, client in ((analytical_llm, analytical), (creative_llm, creative), (conversational_llm, conversational)):
+        if client is not None:
+            handle.override(client)
+    _uncached_llms.clear()
+
+
+# --- CACHÉ POR NODO ---
+# Nodos (normalmente los creativos) que quieren una respuesta nueva en cada ejecución.
+# Ej: LLM_CACHE_OPT_OUT="develop_frontend,ui_ux_designer"
+LLM_CACHE_OPT_OUT = {
+    node.strip() for node in os.getenv("LLM_CACHE_OPT_OUT", "").split(",") if node.strip()
+}
+_uncached_llms = {}
+
+
+def _json_mode_update(client) -> dict:
+    """Campos que activan el modo JSON nativo del proveedor (vacío si no lo tiene)."""
+    fields = type(client).model_fields
+    if "response_mime_type" in fields:  # Gemini
+        return {"response_mime_type": "application/json"}
+    if "model_kwargs" in fields:  # Groq (API compatible con OpenAI)
+        return {"model_kwargs": {**(client.model_kwargs or {}), "response_format": {"type": "json_object"}}}
+    return {}
+
+
+def _resolve_for_node(llm, node_name: str, json_mode: bool = False):
+    """
+    El handle tal cual o, si el nodo ha hecho opt-out de la caché o pide JSON, una copia
+    del cliente con esos ajustes. None si el modelo no está configurado.
+    """
+    client = llm.get()
+    if client is None:
+        return None
+    update = {}
+    if node_name in LLM_CACHE_OPT_OUT:
+        update["cache"] = False
+    if json_mode:
+        update.update(_json_mode_update(client))
+    if not update:
+        return llm
+    key = (id(client), "cache" in update, json_mode)
+    if key not in _uncached_llms:
+        _uncached_llms[key] = ScheduledLLM(client.model_copy(update=update), llm.provider, llm.priority)
+    return _uncached_llms[key]
+
+
+def llm_for_node(llm, node_name: str, json_mode: bool = False):
+    """
+    Devuelve el LLM que debe usar un nodo. `llm` es el modelo preferido; si falla, no
+    está configurado o tarda demasiado, se usan los candidatos de NODE_MODEL_CANDIDATES
+    (ver src/model_router.py). Respeta el opt-out de caché por nodo y, con `json_mode`,
+    obliga al proveedor a devolver un objeto JSON.
+    """
+    primary = next(label for label, handle in _HANDLES.items() if handle is llm)
+    labels = [primary] + [label for label in NODE_MODEL_CANDIDATES.get(node_name, []) if label != primary]
+    candidates = [
+        (label, lambda handle=_HANDLES[label]: _resolve_for_node(handle, node_name, json_mode))
+        for label in labels
+    ]
+    return RoutedLLM(node_name, candidates, hedged=node_name in HEDGED_NODES, timeout_s=timeout_for_node(node_name))
 
 
 def validate_configuration():
-    """Valida que al menos un modelo esté configurado."""
-    if analytical_llm is None and creative_llm is None:
+    """
+    Construye los clientes y valida que al menos un modelo esté configurado.
+    Se llama durante el calentamiento del servidor, no al importar el módulo.
+    """
+    if analytical_llm.get() is None and creative_llm.get() is None:
         print("\n❌ ERROR CRÍTICO: No hay modelos configurados")
         return False
     
     print("\n Configuración de modelos lista:")
-    if analytical_llm:
+    if analytical_llm.get():
         print("   ✓ Analytical LLM: Groq Llama 3.3 70B")
-    if conversational_llm:
+    if conversational_llm.get():
         print("   ✓ Conversational LLM: Groq llama-3.1-8b-instant")
-    if creative_llm:
+    if creative_llm.get():
         print("   ✓ Creative LLM: Gemini 2.0 Flash")
     print()
     return True
 
-# Ejecutar validación al importar
-validate_configuration()
-
 __all__ = [
     'analytical_llm',
     'creative_llm',
-    'conversational_llm'
-]
\ No newline at end of file
+    'conversational_llm',
+    'llm_for_node',
+    'override_llms',
+    'validate_configuration'
+]
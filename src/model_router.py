@@ -0,0 +1,238 @@
+# Contenido para: src/model_router.py
+
+"""
+Enrutador de modelos por nodo: failover entre proveedores y peticiones "hedged".
+
+Cada nodo tiene una lista ordenada de candidatos (handles de `src/model.py`):
+  - si el primero no está configurado, falla o supera el timeout, se prueba el siguiente;
+  - en los nodos sensibles a la latencia (supervisor, conversacional) se lanza además
+    una segunda petición al primer candidato de *otro* proveedor si la primera tarda
+    más que su p95 reciente, y gana la primera respuesta válida. Cubrirse con el mismo
+    proveedor solo duplicaría el consumo de su cuota justo cuando va lento. La cobertura
+    solo se lanza si al proveedor de respaldo le queda más de MODEL_HEDGE_DAILY_RESERVE
+    de su cupo diario: los 250 req/día de Gemini son para los nodos multimodales y de código.
+
+La petición de cobertura se hace sin los callbacks de streaming del nodo, para que el
+cliente no reciba dos flujos de tokens mezclados en la misma burbuja.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.llm_scheduler import llm_scheduler
+
+HEDGING_ENABLED = os.getenv("MODEL_HEDGING_ENABLED", "true").lower() not in ("0", "false", "no")
+# Retraso de cobertura mientras no haya muestras suficientes para estimar el p95.
+HEDGE_DEFAULT_DELAY_S = float(os.getenv("MODEL_HEDGE_DEFAULT_DELAY_S", "3.0"))
+HEDGE_MIN_DELAY_S = float(os.getenv("MODEL_HEDGE_MIN_DELAY_S", "0.5"))
+HEDGE_MIN_SAMPLES = 20
+# Fracción del cupo diario del proveedor de respaldo que la cobertura no puede tocar.
+HEDGE_DAILY_RESERVE = float(os.getenv("MODEL_HEDGE_DAILY_RESERVE", "0.5"))
+LATENCY_WINDOW = 200
+
+# Candidatos por nodo, en orden de preferencia. Los nodos multimodales solo tienen a
+# Gemini: los modelos de Groq configurados no aceptan imágenes.
+NODE_MODEL_CANDIDATES: Dict[str, List[str]] = {
+    "supervisor": ["analytical", "conversational", "creative"],
+    "conversational_agent": ["conversational", "analytical", "creative"],
+    "planner": ["analytical", "creative"],
+    "quality_auditor": ["analytical", "creative"],
+    "develop_frontend": ["creative", "analytical"],
+    "develop_backend": ["creative", "analytical"],
+    "database_architech": ["creative", "analytical"],
+    "ui_ux_designer": ["creative"],
+    "multimodal_analyzer": ["creative"],
+    "memory_summarizer": ["conversational", "analytical"],
+}
+
+HEDGED_NODES = {"supervisor", "conversational_agent"}
+
+# Tiempo máximo por intento (incluye la espera en la cola del planificador).
+DEFAULT_CALL_TIMEOUT_S = float(os.getenv("MODEL_CALL_TIMEOUT_S", "60"))
+CODE_CALL_TIMEOUT_S = float(os.getenv("MODEL_CODE_CALL_TIMEOUT_S", "240"))
+CODE_NODES = {"develop_frontend", "develop_backend", "database_architech", "ui_ux_designer", "multimodal_analyzer"}
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias correctas por modelo, para estimar el p95."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self._window)).append(seconds)
+
+    def p95(self, model: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def hedge_delay(self, model: str) -> float:
+        p95 = self.p95(model)
+        return HEDGE_DEFAULT_DELAY_S if p95 is None else max(HEDGE_MIN_DELAY_S, p95)
+
+
+class ModelRouterMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.failovers: Dict[str, int] = {}
+        self.hedges_fired: Dict[str, int] = {}
+        self.hedges_won: Dict[str, int] = {}
+        self.hedges_skipped: Dict[str, int] = {}
+        self.served_by: Dict[str, Dict[str, int]] = {}
+
+    def _inc(self, counter: Dict[str, int], key: str) -> None:
+        with self._lock:
+            counter[key] = counter.get(key, 0) + 1
+
+    def record_served(self, node: str, model: str) -> None:
+        with self._lock:
+            per_node = self.served_by.setdefault(node, {})
+            per_node[model] = per_node.get(model, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "failovers": dict(self.failovers),
+                "hedges_fired": dict(self.hedges_fired),
+                "hedges_won": dict(self.hedges_won),
+                "hedges_skipped": dict(self.hedges_skipped),
+                "served_by": {node: dict(models) for node, models in self.served_by.items()},
+                "p95_s": {model: latency_tracker.p95(model) for model in latency_tracker._samples},
+            }
+
+
+latency_tracker = LatencyTracker()
+model_router_metrics = ModelRouterMetrics()
+
+# (etiqueta del modelo, función que devuelve el LLM a usar o None si no está configurado)
+Candidate = Tuple[str, Callable[[], object]]
+
+
+class RoutedLLM:
+    """LLM de un nodo con failover y, si procede, cobertura de latencia."""
+
+    def __init__(self, node_name: str, candidates: List[Candidate], hedged: bool, timeout_s: float):
+        self.node_name = node_name
+        self._candidates = candidates
+        self._hedged = hedged and HEDGING_ENABLED
+        self._timeout_s = timeout_s
+
+    @staticmethod
+    def _hedge_backup(available: List[Tuple[str, object]]) -> Optional[Tuple[str, object]]:
+        """Primer candidato de un proveedor distinto al del principal (None si no hay)."""
+        primary_provider = getattr(available[0][1], "provider", None)
+        for label, llm in available[1:]:
+            if getattr(llm, "provider", None) != primary_provider:
+                return label, llm
+        return None
+
+    @staticmethod
+    async def _backup_has_budget(llm) -> bool:
+        """True si al proveedor de respaldo le queda cupo diario por encima de la reserva."""
+        provider = getattr(llm, "provider", None)
+        if provider is None:
+            return True
+        fraction = await asyncio.to_thread(llm_scheduler.provider(provider).quota.daily_fraction)
+        return fraction > HEDGE_DAILY_RESERVE
+
+    def _available(self) -> List[Tuple[str, object]]:
+        available = []
+        for label, resolve in self._candidates:
+            llm = resolve()
+            if llm is not None:
+                available.append((label, llm))
+        return available
+
+    async def _call(self, label: str, llm, input, config, kwargs):
+        start = time.perf_counter()
+        response = await asyncio.wait_for(llm.ainvoke(input, config=config, **kwargs), timeout=self._timeout_s)
+        latency_tracker.record(label, time.perf_counter() - start)
+        return response
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        available = self._available()
+        if not available:
+            raise RuntimeError(f"No hay ningún modelo configurado para el nodo '{self.node_name}'.")
+        model_router_metrics._inc(model_router_metrics.calls, self.node_name)
+
+        backup = self._hedge_backup(available) if self._hedged else None
+        if backup is not None:
+            return await self._hedged_call(available[0], backup, input, config, kwargs)
+
+        last_error = None
+        for index, (label, llm) in enumerate(available):
+            try:
+                response = await self._call(label, llm, input, config, kwargs)
+                model_router_metrics.record_served(self.node_name, label)
+                return response
+            except Exception as e:
+                last_error = e
+                if index + 1 < len(available):
+                    model_router_metrics._inc(model_router_metrics.failovers, self.node_name)
+                    reason = "timeout" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                    print(f"⚠️ {self.node_name}: fallo con '{label}' ({reason}); probando '{available[index + 1][0]}'")
+        raise last_error
+
+    async def _hedged_call(self, primary_candidate, backup_candidate, input, config, kwargs):
+        (primary_label, primary), (backup_label, backup) = primary_candidate, backup_candidate
+        primary_task = asyncio.create_task(self._call(primary_label, primary, input, config, kwargs))
+        tasks = {primary_task: primary_label}
+        delay = latency_tracker.hedge_delay(primary_label)
+
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if not done and not await self._backup_has_budget(backup):
+            # Sin cobertura: se espera al principal y el respaldo queda como failover.
+            model_router_metrics._inc(model_router_metrics.hedges_skipped, self.node_name)
+            await asyncio.wait({primary_task})
+            done = {primary_task}
+        hedged = not done
+        if hedged:
+            model_router_metrics._inc(model_router_metrics.hedges_fired, self.node_name)
+            print(f"🔀 {self.node_name}: '{primary_label}' supera {delay:.2f}s; lanzando cobertura con '{backup_label}'")
+            # La cobertura no lleva los callbacks de streaming del nodo.
+            backup_config = {**(config or {}), "callbacks": []}
+        elif primary_task.exception() is not None:
+            model_router_metrics._inc(model_router_metrics.failovers, self.node_name)
+            backup_config = config
+        if hedged or primary_task.exception() is not None:
+            tasks[asyncio.create_task(self._call(backup_label, backup, input, backup_config, kwargs))] = backup_label
+
+        last_error = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        label = tasks[task]
+                        if hedged and label != primary_label:
+                            model_router_metrics._inc(model_router_metrics.hedges_won, self.node_name)
+                        model_router_metrics.record_served(self.node_name, label)
+                        return task.result()
+                    last_error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    def __getattr__(self, attr):
+        available = self._available()
+        if not available:
+            raise RuntimeError(f"No hay ningún modelo configurado para el nodo '{self.node_name}'.")
+        return getattr(available[0][1], attr)
+
+
+def timeout_for_node(node_name: str) -> float:
+    return CODE_CALL_TIMEOUT_S if node_name in CODE_NODES else DEFAULT_CALL_TIMEOUT_S
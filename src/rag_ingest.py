@@ -0,0 +1,228 @@
+# Contenido para: src/rag_ingest.py
+
+"""
+Pipeline de ingesta incremental de la base de conocimientos.
+
+Cada PDF de `knowledge_base/` se identifica por su huella (sha256 + mtime + tamaño),
+guardada en un manifiesto junto a la base de vectores. En cada ejecución solo se
+parsean y embeben los archivos nuevos o modificados, y se eliminan los chunks de
+los archivos borrados. El parseo se hace en un pool de procesos y los embeddings
+se calculan por lotes.
+
+Uso offline:
+    python -m src.rag_ingest [--knowledge-base DIR] [--workers N] [--batch-size N] [--rebuild]
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from src.rag_retriever import persist_directory, get_embeddings, invalidate_rag_cache, INGEST_GENERATION_PATH
+
+KNOWLEDGE_BASE_DIR = "knowledge_base"
+MANIFEST_PATH = os.path.join(persist_directory, "ingest_manifest.json")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def _sha256_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint_file(file_path: str, previous: dict | None = None) -> dict:
+    """
+    Calcula la huella de un archivo. Si mtime y tamaño coinciden con la huella
+    anterior se reutiliza el hash, evitando leer el archivo completo.
+    """
+    stat = os.stat(file_path)
+    if previous and previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+        return {"sha256": previous["sha256"], "mtime": stat.st_mtime, "size": stat.st_size}
+    return {"sha256": _sha256_file(file_path), "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def load_manifest() -> Dict[str, dict]:
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"ADVERTENCIA (Ingesta): Manifiesto ilegible, se reconstruirá: {e}")
+        return {}
+
+
+def save_manifest(manifest: Dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def bump_ingest_generation() -> None:
+    """
+    Marca la colección como modificada. Los procesos del servidor comparan esta
+    generación en su firma de colección e invalidan su caché de recuperación.
+    """
+    os.makedirs(os.path.dirname(INGEST_GENERATION_PATH), exist_ok=True)
+    tmp_path = f"{INGEST_GENERATION_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, INGEST_GENERATION_PATH)
+
+
+def chunk_ids(file_path: str, sha256: str, count: int) -> List[str]:
+    """
+    Ids de los chunks de un archivo. Incluyen la ruta además del contenido: dos PDFs
+    idénticos no deben compartir ids, o al borrar uno se borrarían los chunks del otro.
+    """
+    prefix = hashlib.sha256(f"{file_path}\x00{sha256}".encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+def load_and_split_pdf(file_path: str) -> List[Tuple[str, dict]]:
+    """
+    Parsea un PDF y lo divide en chunks. Se ejecuta en un proceso hijo, por eso
+    importa sus dependencias y devuelve tuplas simples (serializables con pickle).
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    documents = PyPDFLoader(file_path).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return [(doc.page_content, doc.metadata) for doc in splitter.split_documents(documents)]
+
+
+def open_vectorstore():
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=persist_directory, embedding_function=get_embeddings())
+
+
+def ingest_knowledge_base(
+    vectorstore=None,
+    knowledge_base_dir: str = KNOWLEDGE_BASE_DIR,
+    workers: int | None = None,
+    batch_size: int = 64,
+    rebuild: bool = False,
+) -> dict:
+    """
+    Sincroniza la colección de Chroma con los PDFs de la base de conocimientos.
+
+    Returns:
+        Un resumen con los archivos añadidos, actualizados, eliminados y sin cambios.
+    """
+    start = time.perf_counter()
+    vectorstore = vectorstore or open_vectorstore()
+    manifest = {} if rebuild else load_manifest()
+    report = {"added": [], "updated": [], "removed": [], "unchanged": [], "adopted": [], "chunks_embedded": 0}
+
+    if not os.path.isdir(knowledge_base_dir):
+        print(f"Error: Directorio de base de conocimientos no encontrado: {knowledge_base_dir}")
+        return report
+
+    pdf_paths = sorted(
+        os.path.join(knowledge_base_dir, f) for f in os.listdir(knowledge_base_dir) if f.endswith(".pdf")
+    )
+
+    # --- 1. Detectar cambios ---
+    to_index: Dict[str, dict] = {}
+    for file_path in pdf_paths:
+        previous = manifest.get(file_path)
+        fingerprint = fingerprint_file(file_path, previous)
+        if previous and previous["sha256"] == fingerprint["sha256"]:
+            manifest[file_path] = {**previous, **fingerprint}
+            report["unchanged"].append(file_path)
+            continue
+
+        existing_ids = vectorstore.get(where={"source": file_path}, include=[])["ids"]
+        if not previous and existing_ids and not rebuild:
+            # Base de vectores creada antes de existir el manifiesto: se adoptan sus chunks.
+            manifest[file_path] = {**fingerprint, "ids": existing_ids}
+            report["adopted"].append(file_path)
+            continue
+
+        if existing_ids:
+            vectorstore.delete(ids=existing_ids)
+        to_index[file_path] = fingerprint
+        report["updated" if previous else "added"].append(file_path)
+
+    known_sources = set(manifest)
+    if rebuild:
+        # El manifiesto se descarta, pero los chunks de los PDFs borrados siguen en la
+        # colección: se buscan en el manifiesto anterior y en los `source` guardados.
+        known_sources |= set(load_manifest())
+        known_sources |= {
+            metadata["source"] for metadata in vectorstore.get(include=["metadatas"])["metadatas"]
+            if metadata and metadata.get("source")
+        }
+    for file_path in sorted(path for path in known_sources if path not in pdf_paths):
+        ids = manifest.pop(file_path, {}).get("ids") or vectorstore.get(where={"source": file_path}, include=[])["ids"]
+        if ids:
+            vectorstore.delete(ids=ids)
+        report["removed"].append(file_path)
+
+    # --- 2. Parsear en paralelo y embeber por lotes ---
+    if to_index:
+        print(f"Ingesta: parseando {len(to_index)} PDF(s) en un pool de procesos...")
+        # "spawn": al calentar el servidor este código corre en un hilo, con torch y los
+        # clientes de los SDKs ya cargados; hacer fork con otros hilos vivos puede bloquearse.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parsed = dict(zip(to_index, pool.map(load_and_split_pdf, to_index)))
+
+        for file_path, chunks in parsed.items():
+            sha256 = to_index[file_path]["sha256"]
+            ids = chunk_ids(file_path, sha256, len(chunks))
+            for batch_start in range(0, len(chunks), batch_size):
+                batch = chunks[batch_start:batch_start + batch_size]
+                vectorstore.add_texts(
+                    texts=[text for text, _ in batch],
+                    metadatas=[{**metadata, "source": file_path, "file_sha256": sha256} for _, metadata in batch],
+                    ids=ids[batch_start:batch_start + batch_size],
+                )
+            manifest[file_path] = {**to_index[file_path], "ids": ids}
+            report["chunks_embedded"] += len(chunks)
+            print(f"Ingesta: {os.path.basename(file_path)} -> {len(chunks)} chunks.")
+
+    save_manifest(manifest)
+    if to_index or report["removed"]:
+        bump_ingest_generation()
+        invalidate_rag_cache()
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    print(
+        f"Ingesta completada en {report['seconds']}s: {len(report['added'])} nuevos, "
+        f"{len(report['updated'])} actualizados, {len(report['removed'])} eliminados, "
+        f"{len(report['unchanged']) + len(report['adopted'])} sin cambios."
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta incremental de la base de conocimientos en Chroma.")
+    parser.add_argument("--knowledge-base", default=KNOWLEDGE_BASE_DIR, help="Directorio con los PDFs.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para parsear PDFs.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks por llamada de embeddings.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignora el manifiesto y re-indexa todo.")
+    args = parser.parse_args()
+
+    report = ingest_knowledge_base(
+        knowledge_base_dir=args.knowledge_base,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        rebuild=args.rebuild,
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,285 @@
 import os
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.schema.vectorstore import VectorStoreRetriever
+import time
+import threading
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from src.telemetry import measure
+from src import embedding_service
+from src.embedding_batcher import EMBEDDING_BATCHING_ENABLED, BatchedEmbeddings, EmbeddingBatcherError
 
+# Las dependencias pesadas (torch, sentence-transformers, chromadb) se importan
+# dentro de las funciones: importar este módulo no debe cargar ningún modelo.
 
 model_name = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
 
 model_kwargs = {'device': 'cpu'}
 encode_kwargs = {'normalize_embeddings': True} # La normalización es una buena práctica
 
-print(f"Inicializando embeddings con el modelo multilingüe: {model_name}")
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs=model_kwargs,
-    encode_kwargs=encode_kwargs
-)
-
 # --- CONFIGURACIÓN DE CHROMA Y RETRIEVER ---
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-
 # Cambiamos el nombre del directorio para no mezclar embeddings de modelos distintos
 persist_directory = "embeddings_chroma"
+# Lo reescribe cada ingesta que cambia la colección (ver src/rag_ingest.py).
+INGEST_GENERATION_PATH = os.path.join(persist_directory, "ingest_generation")
+
+embeddings = None
+vectorstore = None
+retriever = None
+
+# Evita que dos peticiones concurrentes inicialicen el modelo a la vez.
+_init_lock = threading.Lock()
+
+
+class LRUCache:
+    """Caché LRU en memoria, segura entre hilos, con contadores de aciertos/fallos."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Las consultas del planificador y del auditor se repiten dentro de una sesión
+# (cada iteración de auditoría busca la misma tarea), así que se memorizan
+# tanto los embeddings de las consultas como los chunks recuperados.
+query_embedding_cache = LRUCache(int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", 512)))
+retrieval_cache = LRUCache(int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", 256)))
+
+# Sincronizar la base de conocimientos al inicializar (barato si nada cambió).
+RAG_AUTO_INGEST = os.getenv("RAG_AUTO_INGEST", "true").lower() not in ("0", "false", "no")
+
+# Cada cuánto (segundos) se comprueba si la colección de Chroma ha cambiado.
+COLLECTION_CHECK_INTERVAL = float(os.getenv("RAG_COLLECTION_CHECK_INTERVAL", 5))
+_collection_signature = None
+_collection_checked_at = 0.0
+
+# Modo multi-worker: el modelo y Chroma viven en el servicio compartido (src/embedding_service.py).
+_remote_ready = False
+
+
+class CachedEmbeddings(Embeddings):
+    """Envuelve un modelo de embeddings y memoriza `embed_query` por texto."""
+
+    def __init__(self, base: Embeddings):
+        self.base = base
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = query_embedding_cache.get(text)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            query_embedding_cache.put(text, vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.base.embed_documents(texts)
+
+
+def invalidate_rag_cache() -> None:
+    """Vacía la caché de resultados (llamar cuando cambie la colección de Chroma)."""
+    global _collection_signature
+    retrieval_cache.clear()
+    _collection_signature = None
+    print("Caché de recuperación RAG invalidada.")
+
+
+def read_ingest_generation():
+    """Generación de la última ingesta que modificó la colección (None si no hay)."""
+    try:
+        with open(INGEST_GENERATION_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _check_collection_changed() -> None:
+    """
+    Invalida la caché de resultados si la colección cambió. La firma combina la
+    generación que escribe cada ingesta (`python -m src.rag_ingest` en otro proceso
+    incluida, aunque re-indexe un PDF con el mismo número de chunks) con el número de
+    chunks, que cubre escrituras hechas fuera de la ingesta.
+    """
+    global _collection_signature, _collection_checked_at
+    now = time.monotonic()
+    if vectorstore is None or now - _collection_checked_at < COLLECTION_CHECK_INTERVAL:
+        return
+    _collection_checked_at = now
+    try:
+        signature = f"{read_ingest_generation()}:{vectorstore._collection.count()}"
+    except Exception:
+        return
+    if _collection_signature is not None and signature != _collection_signature:
+        retrieval_cache.clear()
+        print("La colección de Chroma cambió: caché de recuperación invalidada.")
+    _collection_signature = signature
+
+
+def collection_signature():
+    """Firma de la colección (generación de ingesta + chunks); permite a los workers invalidar su caché."""
+    _check_collection_changed()
+    return _collection_signature
+
+
+def get_rag_cache_stats() -> dict:
+    stats = {
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrievals": retrieval_cache.stats(),
+    }
+    base = getattr(embeddings, "base", None)
+    if isinstance(base, BatchedEmbeddings):
+        stats["embedding_batcher"] = base.stats()
+    return stats
+
+
+def get_embeddings():
+    """Devuelve el modelo de embeddings, cargándolo la primera vez que se necesita."""
+    global embeddings
+    if embeddings is None:
+        with _init_lock:
+            if embeddings is None and embedding_service.is_remote_enabled():
+                print(f"Usando el servicio de embeddings compartido en {embedding_service.EMBEDDING_SERVICE_ADDRESS}")
+                embeddings = CachedEmbeddings(embedding_service.RemoteEmbeddings())
+            elif embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                print(f"Inicializando embeddings con el modelo multilingüe: {model_name}")
+                model = HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    model_kwargs=model_kwargs,
+                    encode_kwargs=encode_kwargs
+                )
+                # Las consultas concurrentes se codifican juntas (src/embedding_batcher.py);
+                # la caché va delante para que los aciertos no esperen en la cola.
+                embeddings = CachedEmbeddings(BatchedEmbeddings(model) if EMBEDDING_BATCHING_ENABLED else model)
+    return embeddings
+
+
+def is_rag_ready() -> bool:
+    """Indica si el retriever ya está inicializado (para el endpoint de readiness)."""
+    return _remote_ready if embedding_service.is_remote_enabled() else retriever is not None
 
-vectorstore: Chroma | None = None
-retriever: VectorStoreRetriever | None = None
 
 def initialize_rag():
     """
     Inicializa el sistema RAG. Carga o crea la base de datos vectorial.
+    Es idempotente: si ya está inicializado no hace nada.
     """
-    global vectorstore, retriever
-    
-    knowledge_base_dir = "knowledge_base"
-    
-    try:
-        if os.path.exists(persist_directory) and os.listdir(persist_directory):
-            print(f"Cargando base de datos de vectores existente desde: {persist_directory}")
-            vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
-        else:
-            print(f"Creando nueva base de datos de vectores en: {persist_directory}")
-            if not os.path.exists(knowledge_base_dir):
-                print(f"Error: Directorio de base de conocimientos no encontrado: {knowledge_base_dir}")
-                return
-
-            documents = []
-            pdf_files = [f for f in os.listdir(knowledge_base_dir) if f.endswith(".pdf")]
-            
-            if not pdf_files:
-                print("No se encontraron archivos PDF en la base de conocimientos.")
-                return
-
-            print(f"Encontrados {len(pdf_files)} PDF(s) para procesar...")
-            for filename in pdf_files:
-                file_path = os.path.join(knowledge_base_dir, filename)
-                print(f"Cargando y procesando: {filename}")
-                loader = PyPDFLoader(file_path)
-                documents.extend(loader.load())
-
-            print("Dividiendo documentos en chunks...")
-            splits = text_splitter.split_documents(documents)
-            
-            print(f"Creando embeddings para {len(splits)} chunks y guardando en la base de datos...")
-            vectorstore = Chroma.from_documents(
-                documents=splits, 
-                embedding=embeddings,
-                persist_directory=persist_directory
+    global vectorstore, retriever, _remote_ready
+
+    if embedding_service.is_remote_enabled():
+        # El servicio ya cargó modelo y colección; aquí solo se espera a que responda.
+        try:
+            _remote_ready = embedding_service.wait_until_ready()["rag_ready"]
+        except embedding_service.EmbeddingServiceError as e:
+            print(f"Ocurrió un error conectando con el servicio de embeddings: {e}")
+        return
+
+    if retriever is not None:
+        return
+
+    from langchain_chroma import Chroma
+    from src.rag_ingest import ingest_knowledge_base
+
+    embedding_function = get_embeddings()
+
+    with _init_lock:
+        if retriever is not None:
+            return
+        try:
+            print(f"Abriendo base de datos de vectores en: {persist_directory}")
+            vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+            # Sincronización incremental: solo se procesan los PDFs nuevos o modificados.
+            if RAG_AUTO_INGEST or not vectorstore.get(limit=1, include=[])["ids"]:
+                ingest_knowledge_base(vectorstore)
+
+            retriever = vectorstore.as_retriever(
+                search_type="mmr",
+                search_kwargs={'k': 4, 'fetch_k': 20}
             )
-            print("Base de datos de vectores creada y guardada con éxito.")
+            
+            invalidate_rag_cache()
+            print("--- RAG inicializado con éxito ---")
+
+        except Exception as e:
+            print(f"Ocurrió un error durante la inicialización de RAG: {e}")
 
-        retriever = vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={'k': 4, 'fetch_k': 20}
-        )
-        
-        print("--- RAG inicializado con éxito ---")
+def _remote_retrieve_context(query: str) -> str:
+    """Recuperación a través del servicio compartido, con la caché local del worker delante."""
+    global _collection_signature
+    context = retrieval_cache.get(query)
+    if context is not None:
+        print(f"Contexto recuperado de la caché para: '{query[:80]}...'")
+        return context
+    try:
+        with measure("retrieval"):
+            result = embedding_service.remote_retrieve(query)
+    except embedding_service.EmbeddingServiceError as e:
+        print(f"Error recuperando contexto del servicio de embeddings: {e}")
+        return "Error: El sistema de recuperación de información no está disponible."
+    if _collection_signature is not None and result["signature"] != _collection_signature:
+        retrieval_cache.clear()
+        print("La colección de Chroma cambió: caché de recuperación invalidada.")
+    _collection_signature = result["signature"]
+    if not result["context"].startswith("Error:"):
+        retrieval_cache.put(query, result["context"])
+    return result["context"]
 
-    except Exception as e:
-        print(f"Ocurrió un error durante la inicialización de RAG: {e}")
 
-# (Las funciones retrieve_context e initialize_rag() se mantienen igual)
 def retrieve_context(query: str) -> str:
+    if embedding_service.is_remote_enabled():
+        return _remote_retrieve_context(query)
     if not retriever:
-        print("Error: El sistema RAG no ha sido inicializado. Llamando a initialize_rag() ahora.")
+        print("El sistema RAG aún no está inicializado. Llamando a initialize_rag() ahora.")
         initialize_rag()
         if not retriever:
             print("Error fatal: No se pudo inicializar el sistema RAG.")
             return "Error: El sistema de recuperación de información no está disponible."
-    print(f"Recuperando contexto para la consulta: '{query[:80]}...'")
-    retrieved_docs = retriever.invoke(query)
-    if not retrieved_docs:
+    _check_collection_changed()
+    chunks = retrieval_cache.get(query)
+    if chunks is not None:
+        print(f"Contexto recuperado de la caché ({len(chunks)} chunks) para: '{query[:80]}...'")
+    else:
+        print(f"Recuperando contexto para la consulta: '{query[:80]}...'")
+        try:
+            with measure("retrieval"):
+                retrieved_docs = retriever.invoke(query)
+        except EmbeddingBatcherError as e:
+            print(f"Error calculando el embedding de la consulta: {e}")
+            return "Error: El sistema de recuperación de información no está disponible."
+        chunks = [doc.page_content for doc in retrieved_docs]
+        retrieval_cache.put(query, chunks)
+        print(f"Contexto recuperado exitosamente ({len(chunks)} chunks).")
+    if not chunks:
         print("No se encontraron documentos relevantes.")
         return "No se encontró información relevante en la base de conocimientos."
-    context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
-    print(f"Contexto recuperado exitosamente ({len(retrieved_docs)} chunks).")
-    return context
-
-initialize_rag()
\ No newline at end of file
+    return "\n\n---\n\n".join(chunks)
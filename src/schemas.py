@@ -0,0 +1,61 @@
+# Contenido para: src/schemas.py
+
+"""
+Esquemas Pydantic de las salidas estructuradas de los agentes.
+
+El planificador y el auditor piden JSON al LLM (con el modo JSON nativo del proveedor
+cuando existe) y validan la respuesta contra estos modelos con `parse_llm_json`.
+"""
+
+from typing import Literal, Optional
+from pydantic import BaseModel, field_validator, model_validator
+
+PlanType = Literal["frontend", "backend", "database", "both", "none"]
+
+_PLAN_TYPE_ALIASES = {
+    "fullstack": "both", "full-stack": "both", "full stack": "both",
+    "frontend y backend": "both", "frontend, backend": "both", "frontend/backend": "both",
+    "db": "database", "base de datos": "database", "sql": "database",
+}
+
+
+class DevPlan(BaseModel):
+    """Plan de desarrollo que el supervisor usa para repartir el trabajo."""
+
+    plan_type: PlanType = "none"
+    frontend_task: Optional[str] = None
+    frontend_tech: Optional[str] = None
+    backend_task: Optional[str] = None
+    backend_tech: Optional[str] = None
+    db_task: Optional[str] = None
+    db_tech: Optional[str] = None
+
+    @field_validator("plan_type", mode="before")
+    @classmethod
+    def _normalize_plan_type(cls, value):
+        if not isinstance(value, str):
+            return value
+        value = value.strip().lower()
+        return _PLAN_TYPE_ALIASES.get(value, value)
+
+    @model_validator(mode="after")
+    def _infer_plan_type(self):
+        # Si el LLM omite el tipo (o pone "none") pero sí rellena tareas, se deduce de ellas.
+        if self.plan_type == "none":
+            has_front, has_back = bool(self.frontend_task), bool(self.backend_task)
+            if has_front and has_back:
+                self.plan_type = "both"
+            elif has_front:
+                self.plan_type = "frontend"
+            elif has_back:
+                self.plan_type = "backend"
+            elif self.db_task:
+                self.plan_type = "database"
+        return self
+
+
+class AuditVerdict(BaseModel):
+    """Veredicto del auditor de calidad."""
+
+    approved: bool
+    feedback: str = "No se proporcionó feedback."
@@ -0,0 +1,370 @@
+# Contenido para: src/telemetry.py
+
+"""
+Instrumentación por nodo: trazas OpenTelemetry y métricas estilo Prometheus.
+
+Cada invocación de un nodo del grafo genera un span `node.<nombre>` con:
+  - marcas de inicio/fin (las del propio span) e iteración del supervisor,
+  - modelos LLM usados y tokens de prompt/completion,
+  - tiempo de recuperación RAG y de E/S de archivos.
+
+Los spans se exportan a un exportador local (archivo JSONL por defecto) y los
+agregados se exponen como histogramas por nodo en `GET /metrics` (main.py).
+
+Variables de entorno:
+  TRACING_EXPORTER   file (por defecto) | console | otlp | none
+  TRACING_FILE_PATH  ruta del JSONL de spans (por defecto .cache/traces.jsonl)
+"""
+
+import os
+import json
+import time
+import inspect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tracers.context import register_configure_hook
+from langgraph.config import get_stream_writer
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult,
+    )
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", os.path.join(".cache", "traces.jsonl"))
+
+# Límites (en segundos) de los histogramas de duración por nodo.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+_tracer = None
+_tracing_lock = threading.Lock()
+
+
+# --- Exportador local ---
+
+if OTEL_AVAILABLE:
+    class JsonlFileSpanExporter(SpanExporter):
+        """Escribe cada span como una línea JSON; suficiente para analizar sin un colector."""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        def export(self, spans) -> "SpanExportResult":
+            lines = []
+            for span in spans:
+                lines.append(json.dumps({
+                    "name": span.name,
+                    "trace_id": format(span.context.trace_id, "032x"),
+                    "span_id": format(span.context.span_id, "016x"),
+                    "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+                    "start_ns": span.start_time,
+                    "end_ns": span.end_time,
+                    "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+                    "status": span.status.status_code.name,
+                    "attributes": dict(span.attributes or {}),
+                    "events": [
+                        {"name": event.name, "attributes": dict(event.attributes or {})}
+                        for event in span.events
+                    ],
+                }, ensure_ascii=False))
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                return SpanExportResult.SUCCESS
+            except OSError as e:
+                print(f"Error al exportar spans a '{self.path}': {e}")
+                return SpanExportResult.FAILURE
+
+        def shutdown(self) -> None:
+            pass
+
+
+def setup_tracing() -> bool:
+    """Configura el TracerProvider global una sola vez. Devuelve si el trazado quedó activo."""
+    global _tracer
+    if _tracer is not None:
+        return True
+    if not OTEL_AVAILABLE or TRACING_EXPORTER == "none":
+        return False
+    with _tracing_lock:
+        if _tracer is not None:
+            return True
+        if TRACING_EXPORTER == "console":
+            exporter = ConsoleSpanExporter()
+        elif TRACING_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = JsonlFileSpanExporter(TRACING_FILE_PATH)
+        provider = TracerProvider(resource=Resource.create({"service.name": "dev-team-multiagent"}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("src.telemetry")
+        print(f"Trazado OpenTelemetry activo (exportador: {TRACING_EXPORTER}).")
+        return True
+
+
+def shutdown_tracing() -> None:
+    """Vacía los spans pendientes al apagar el servidor."""
+    if _tracer is not None:
+        provider = trace.get_tracer_provider()
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+
+
+# --- Estadísticas de la invocación en curso ---
+
+@dataclass
+class NodeRunStats:
+    """Acumula lo ocurrido durante una invocación de nodo (se comparte con hilos vía contextvars)."""
+    node: str
+    models: List[str] = field(default_factory=list)
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+    span: Any = None
+
+
+_current_run: ContextVar[Optional[NodeRunStats]] = ContextVar("node_run_stats", default=None)
+
+
+@contextmanager
+def measure(kind: str):
+    """
+    Mide un bloque (p. ej. "retrieval" o "file_io") y lo suma al nodo en curso.
+    Fuera de un nodo instrumentado no hace nada más que ejecutar el bloque.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run = _current_run.get()
+        if run is not None:
+            run.timings[kind] = run.timings.get(kind, 0.0) + (time.perf_counter() - start)
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Registra modelo y tokens de cada llamada LLM hecha dentro de un nodo instrumentado."""
+
+    run_inline = True
+
+    def __init__(self, run: NodeRunStats):
+        self.run = run
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        model = llm_output.get("model_name") or llm_output.get("model")
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                metadata = getattr(message, "response_metadata", None) or {}
+                model = model or metadata.get("model_name") or metadata.get("model")
+        if not (prompt_tokens or completion_tokens):
+            token_usage = llm_output.get("token_usage") or {}
+            prompt_tokens = token_usage.get("prompt_tokens", 0)
+            completion_tokens = token_usage.get("completion_tokens", 0)
+
+        model = model or "desconocido"
+        self.run.llm_calls += 1
+        self.run.prompt_tokens += prompt_tokens
+        self.run.completion_tokens += completion_tokens
+        if model not in self.run.models:
+            self.run.models.append(model)
+        node_metrics.record_llm(model, prompt_tokens, completion_tokens)
+        if self.run.span is not None:
+            self.run.span.add_event("llm_call", {
+                "llm.model": model,
+                "llm.prompt_tokens": prompt_tokens,
+                "llm.completion_tokens": completion_tokens,
+            })
+
+
+# Cualquier llamada LLM ejecutada mientras la variable tenga un handler (incluidas las
+# hechas sin pasar `config`) recibe ese handler a través del CallbackManager de LangChain.
+_telemetry_handler: ContextVar[Optional[TelemetryCallbackHandler]] = ContextVar("telemetry_handler", default=None)
+register_configure_hook(_telemetry_handler, inheritable=True)
+
+
+# --- Métricas agregadas ---
+
+class _Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class NodeMetrics:
+    """Histogramas por nodo y contadores de uso de LLM, exportables en formato Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, _Histogram] = {}
+        self.timings: Dict[str, Dict[str, _Histogram]] = {}
+        self.errors: Dict[str, int] = {}
+        self.node_tokens: Dict[str, Dict[str, int]] = {}
+        self.llm_requests: Dict[str, int] = {}
+        self.llm_tokens: Dict[str, Dict[str, int]] = {}
+
+    def record_node(self, run: NodeRunStats, seconds: float, failed: bool) -> None:
+        with self._lock:
+            self.durations.setdefault(run.node, _Histogram()).observe(seconds)
+            for kind, value in run.timings.items():
+                self.timings.setdefault(kind, {}).setdefault(run.node, _Histogram()).observe(value)
+            tokens = self.node_tokens.setdefault(run.node, {"prompt": 0, "completion": 0})
+            tokens["prompt"] += run.prompt_tokens
+            tokens["completion"] += run.completion_tokens
+            if failed:
+                self.errors[run.node] = self.errors.get(run.node, 0) + 1
+
+    def record_llm(self, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.llm_requests[model] = self.llm_requests.get(model, 0) + 1
+            tokens = self.llm_tokens.setdefault(model, {"prompt": 0, "completion": 0})
+            tokens["prompt"] += prompt_tokens
+            tokens["completion"] += completion_tokens
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, labels: str, hist: _Histogram) -> None:
+        for bound, count in zip(hist.buckets, hist.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.total}')
+        lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {hist.total}")
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP devteam_node_duration_seconds Duración de cada invocación de nodo.",
+                "# TYPE devteam_node_duration_seconds histogram",
+            ]
+            for node, hist in sorted(self.durations.items()):
+                self._render_histogram(lines, "devteam_node_duration_seconds", f'node="{node}"', hist)
+
+            lines += [
+                "# HELP devteam_node_phase_seconds Tiempo de recuperación RAG y E/S de archivos por nodo.",
+                "# TYPE devteam_node_phase_seconds histogram",
+            ]
+            for kind, per_node in sorted(self.timings.items()):
+                for node, hist in sorted(per_node.items()):
+                    self._render_histogram(lines, "devteam_node_phase_seconds", f'node="{node}",phase="{kind}"', hist)
+
+            lines += [
+                "# HELP devteam_node_errors_total Invocaciones de nodo que terminaron con excepción.",
+                "# TYPE devteam_node_errors_total counter",
+            ]
+            lines += [f'devteam_node_errors_total{{node="{node}"}} {count}' for node, count in sorted(self.errors.items())]
+
+            lines += [
+                "# HELP devteam_node_llm_tokens_total Tokens LLM consumidos por nodo.",
+                "# TYPE devteam_node_llm_tokens_total counter",
+            ]
+            for node, tokens in sorted(self.node_tokens.items()):
+                for kind, count in tokens.items():
+                    lines.append(f'devteam_node_llm_tokens_total{{node="{node}",type="{kind}"}} {count}')
+
+            lines += [
+                "# HELP devteam_llm_requests_total Llamadas por modelo (útil para la cuota diaria de Gemini).",
+                "# TYPE devteam_llm_requests_total counter",
+            ]
+            lines += [f'devteam_llm_requests_total{{model="{model}"}} {count}' for model, count in sorted(self.llm_requests.items())]
+
+            lines += [
+                "# HELP devteam_llm_tokens_total Tokens por modelo.",
+                "# TYPE devteam_llm_tokens_total counter",
+            ]
+            for model, tokens in sorted(self.llm_tokens.items()):
+                for kind, count in tokens.items():
+                    lines.append(f'devteam_llm_tokens_total{{model="{model}",type="{kind}"}} {count}')
+            return "\n".join(lines) + "\n"
+
+
+node_metrics = NodeMetrics()
+
+
+# --- Envoltorio de nodos ---
+
+def _announce_node_started(name: str) -> None:
+    """Evento `node_started` para el cliente (protocolo de src/events.py), vía stream "custom"."""
+    try:
+        get_stream_writer()({"type": "node_started", "node": name})
+    except RuntimeError:
+        pass  # fuera de una ejecución del grafo (p. ej. el nodo invocado directamente)
+
+
+def traced_node(name: str, node_fn):
+    """
+    Envuelve un nodo asíncrono del grafo para emitir su span y sus métricas.
+
+    No se usa `functools.wraps`: LangGraph inspecciona la firma para decidir si pasa
+    `config`, y la del envoltorio siempre lo acepta.
+    """
+    accepts_config = "config" in inspect.signature(node_fn).parameters
+
+    async def wrapper(state: dict, config: RunnableConfig):
+        run = NodeRunStats(node=name)
+        run_token = _current_run.set(run)
+        handler_token = _telemetry_handler.set(TelemetryCallbackHandler(run))
+        span_cm = _tracer.start_as_current_span(f"node.{name}") if _tracer is not None else None
+        start = time.perf_counter()
+        error = None
+        _announce_node_started(name)
+        try:
+            if span_cm is not None:
+                run.span = span_cm.__enter__()
+                run.span.set_attribute("node.name", name)
+                run.span.set_attribute("node.supervisor_iteration", state.get("supervisor_iterations") or 0)
+                run.span.set_attribute("session.thread_id", str(config.get("configurable", {}).get("thread_id", "")))
+            if accepts_config:
+                return await node_fn(state, config)
+            return await node_fn(state)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if run.span is not None:
+                run.span.set_attribute("llm.models", run.models)
+                run.span.set_attribute("llm.calls", run.llm_calls)
+                run.span.set_attribute("llm.prompt_tokens", run.prompt_tokens)
+                run.span.set_attribute("llm.completion_tokens", run.completion_tokens)
+                for kind, value in run.timings.items():
+                    run.span.set_attribute(f"time.{kind}_ms", round(value * 1000, 2))
+                # Al propagar la excepción, OpenTelemetry la registra y marca el span con error.
+                span_cm.__exit__(type(error) if error else None, error, error.__traceback__ if error else None)
+            node_metrics.record_node(run, elapsed, failed=error is not None)
+            _telemetry_handler.reset(handler_token)
+            _current_run.reset(run_token)
+
+    wrapper.__name__ = getattr(node_fn, "__name__", name)
+    wrapper.__doc__ = node_fn.__doc__
+    return wrapper
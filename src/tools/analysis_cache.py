@@ -0,0 +1,74 @@
+# Contenido para: src/tools/analysis_cache.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import List, Optional
+
+from src.llm_cache import SQLiteTTLCache
+from src.tools.media_preprocessor import content_hash, MEDIA_VIDEO_MODE
+
+# Resultados de los nodos multimodales (`ui_ux_spec`, `analysis_result`) indexados por el
+# contenido de los archivos, la versión del prompt, el modelo y la petición normalizada.
+# Volver a subir el mismo mockup en otra tarea (u otra sesión) reutiliza el análisis sin
+# gastar cuota de Gemini.
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+_store: Optional[SQLiteTTLCache] = None
+_store_lock = threading.Lock()
+
+
+def _get_store() -> Optional[SQLiteTTLCache]:
+    global _store
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteTTLCache(
+                db_path=os.getenv("ANALYSIS_CACHE_PATH", os.path.join(".cache", "analysis_cache.sqlite")),
+                table="multimodal_analysis",
+                ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+                max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 2000)),
+                max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_MB", 50)) * 1024 * 1024,
+            )
+    return _store
+
+
+def model_identity(llm) -> str:
+    """Nombre del modelo que hay detrás de un handle de src/model.py."""
+    client = llm.get() if hasattr(llm, "get") else llm
+    return getattr(client, "model", None) or getattr(client, "model_name", None) or type(client).__name__
+
+
+def analysis_cache_key(node: str, prompt_version: int, model: str, file_paths: List[str], user_input: str) -> str:
+    """Clave estable: mismo contenido + misma petición (sin mayúsculas ni espacios extra)."""
+    normalized_input = re.sub(r"\s+", " ", (user_input or "").strip().lower())
+    payload = {
+        "node": node,
+        "prompt_version": prompt_version,
+        "model": model,
+        "video_mode": MEDIA_VIDEO_MODE,
+        "files": [content_hash(path) for path in file_paths],
+        "input": hashlib.sha256(normalized_input.encode("utf-8")).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_cached_analysis(key: str) -> Optional[str]:
+    store = _get_store()
+    return store.get(key) if store is not None else None
+
+
+def store_analysis(key: str, result: str) -> None:
+    store = _get_store()
+    if store is not None and result and result.strip():
+        store.set(key, result)
+
+
+def get_analysis_cache_stats() -> dict:
+    store = _get_store()
+    if store is None:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
@@ -0,0 +1,158 @@
+# Contenido para: src/tools/artifact_store.py
+
+"""
+Almacén de artefactos direccionado por contenido.
+
+El código generado y los textos largos (especificación de UI/UX, análisis multimodal)
+no viajan dentro del estado del grafo: se guardan una sola vez en disco bajo su SHA-256
+y el estado solo lleva un handle pequeño:
+
+    {"artifact": "<sha256>", "size": 1234, "path": "outputs/<sesión>/frontend/index.html"}
+
+Así cada checkpoint (uno por salto del supervisor) y cada evento del websocket pesan
+unos cientos de bytes en lugar de decenas de KB. Los nodos que necesitan el contenido
+usan `resolve`, que acepta indistintamente texto, handles o diccionarios de handles.
+Las lecturas repetidas se sirven desde una caché LRU en memoria.
+"""
+
+import os
+import re
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.telemetry import measure
+
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", os.path.join(".cache", "artifacts"))
+ARTIFACT_RETENTION_HOURS = float(os.getenv("ARTIFACT_RETENTION_HOURS", 48))
+ARTIFACT_MEMORY_CACHE_BYTES = int(float(os.getenv("ARTIFACT_MEMORY_CACHE_MB", 32)) * 1024 * 1024)
+
+_ARTIFACT_ID = re.compile(r"^[0-9a-f]{64}$")
+
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+_memory_cache_bytes = 0
+_lock = threading.Lock()
+
+
+def is_artifact(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get("artifact"), str) and "size" in value
+
+
+def is_valid_artifact_id(artifact_id: str) -> bool:
+    return bool(artifact_id) and bool(_ARTIFACT_ID.match(artifact_id))
+
+
+def _artifact_path(artifact_id: str) -> str:
+    # Dos niveles para no acumular miles de archivos en un solo directorio.
+    return os.path.join(ARTIFACTS_DIR, artifact_id[:2], artifact_id)
+
+
+def _remember(artifact_id: str, text: str) -> None:
+    """Caché LRU en memoria, acotada por el tamaño aproximado (caracteres) del contenido."""
+    global _memory_cache_bytes
+    size = len(text)
+    if size > ARTIFACT_MEMORY_CACHE_BYTES:
+        return
+    with _lock:
+        if artifact_id in _memory_cache:
+            _memory_cache.move_to_end(artifact_id)
+            return
+        _memory_cache[artifact_id] = text
+        _memory_cache_bytes += size
+        while _memory_cache_bytes > ARTIFACT_MEMORY_CACHE_BYTES:
+            _, evicted = _memory_cache.popitem(last=False)
+            _memory_cache_bytes -= len(evicted)
+
+
+def put_text(text: str, path: Optional[str] = None) -> dict:
+    """Guarda `text` (si no existía ya) y devuelve su handle."""
+    data = text.encode("utf-8")
+    artifact_id = hashlib.sha256(data).hexdigest()
+    target = _artifact_path(artifact_id)
+    with measure("file_io"):
+        if os.path.exists(target):
+            os.utime(target)  # renueva la retención
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, target)
+    _remember(artifact_id, text)
+    handle = {"artifact": artifact_id, "size": len(data)}
+    if path:
+        handle["path"] = path
+    return handle
+
+
+def put_files(files: Dict[str, str], saved_paths: Optional[Dict[str, str]] = None) -> Dict[str, dict]:
+    """Convierte un diccionario nombre de archivo -> código en nombre de archivo -> handle."""
+    saved_paths = saved_paths or {}
+    return {
+        filename: code if is_artifact(code) else put_text(code, saved_paths.get(filename))
+        for filename, code in files.items()
+        if code is not None
+    }
+
+
+def get_text(artifact_id: str) -> str:
+    """
+    Devuelve el contenido de un artefacto.
+
+    Raises:
+        FileNotFoundError: si el identificador no es válido o el artefacto ya caducó.
+    """
+    if not is_valid_artifact_id(artifact_id):
+        raise FileNotFoundError(f"Artefacto no válido: {artifact_id!r}")
+    with _lock:
+        cached = _memory_cache.get(artifact_id)
+        if cached is not None:
+            _memory_cache.move_to_end(artifact_id)
+            return cached
+    with measure("file_io"), open(_artifact_path(artifact_id), encoding="utf-8") as f:
+        text = f.read()
+    _remember(artifact_id, text)
+    return text
+
+
+def resolve(value: Any) -> Any:
+    """
+    Sustituye los handles por su contenido: un handle devuelve el texto y un diccionario
+    de handles (p. ej. `frontend_code`) devuelve el diccionario de textos. Cualquier otro
+    valor (texto plano, None) se devuelve sin cambios.
+    """
+    if is_artifact(value):
+        return get_text(value["artifact"])
+    if isinstance(value, dict) and value and all(is_artifact(v) for v in value.values()):
+        return {key: get_text(handle["artifact"]) for key, handle in value.items()}
+    return value
+
+
+def cleanup_artifacts(max_age_hours: float | None = None) -> int:
+    """
+    Política de retención: elimina los artefactos que no se han vuelto a escribir en
+    `max_age_hours`. Debe superar la retención de los checkpoints que los referencian.
+    """
+    global _memory_cache_bytes
+    max_age_hours = ARTIFACT_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    if not os.path.isdir(ARTIFACTS_DIR):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for bucket in os.scandir(ARTIFACTS_DIR):
+        if not bucket.is_dir():
+            continue
+        for entry in os.scandir(bucket.path):
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+                with _lock:
+                    text = _memory_cache.pop(entry.name, None)
+                    if text is not None:
+                        _memory_cache_bytes -= len(text)
+    if removed:
+        print(f"Herramienta 'artifact_store': Eliminados {removed} artefactos caducados.")
+    return removed
@@ -1,9 +1,26 @@
 # Contenido para: src/tools/code_extractor.py
 
+import os
 import re
+import asyncio
+from typing import Callable, Dict, List, Optional
+from langchain_core.callbacks import AsyncCallbackHandler
 from .save_code_to_file import save_code_to_file
+from .patch_applier import is_patch_filename, patch_target, apply_unified_diff, make_unified_diff, PatchError
 
-def extract_and_save_code(full_code_string: str, default_folder: str) -> dict:
+# Patrón universal que soporta varios tipos de comentarios: --, //, /*, <!--
+CODE_BLOCK_PATTERN = re.compile(
+    r"(?:<!---|\/\* ---|\/\/ ---|-- ---)\s*"
+    r"([\w\.-]+)_CODE_START"  # Permite '.' y '-' en el nombre del archivo
+    r"\s*(?:--- \*/|--->|---)"
+    r"([\s\S]*?)"
+    r"(?:<!---|\/\* ---|\/\/ ---|-- ---)\s*"
+    r"\1_CODE_END"
+    r"\s*(?:--- \*/|--->|---)",
+    re.IGNORECASE
+)
+
+def extract_and_save_code(full_code_string: str, default_folder: str, base_dir: str = "outputs") -> dict:
     """
     Extrae múltiples bloques de código de una cadena y los guarda en una subcarpeta
     especificada (ej. 'frontend' o 'backend'), usando nombres de archivo descriptivos
@@ -12,25 +29,14 @@ def extract_and_save_code(full_code_string: str, default_folder: str) -> dict:
     Args:
         full_code_string: La cadena completa de texto generada por el LLM.
         default_folder: La carpeta de destino ('frontend', 'backend', 'misc', etc.).
+        base_dir: La carpeta de trabajo de la sesión donde se crea `default_folder`.
 
     Returns:
         Un diccionario con el código extraído, usando el nombre de archivo como clave.
     """
     print(f"---HERRAMIENTA: EXTRACTOR Y ORGANIZADOR DE CÓDIGO (Guardando en: {default_folder})---")
-    
-    # Patrón universal que soporta varios tipos de comentarios: --, //, /*, <!--
-    pattern = re.compile(
-        r"(?:<!---|\/\* ---|\/\/ ---|-- ---)\s*"
-        r"([\w\.-]+)_CODE_START"  # Permite '.' y '-' en el nombre del archivo
-        r"\s*(?:--- \*/|--->|---)"
-        r"([\s\S]*?)"
-        r"(?:<!---|\/\* ---|\/\/ ---|-- ---)\s*"
-        r"\1_CODE_END"
-        r"\s*(?:--- \*/|--->|---)",
-        re.IGNORECASE
-    )
-
-    matches = pattern.finditer(full_code_string)
+
+    matches = CODE_BLOCK_PATTERN.finditer(full_code_string)
     
     extracted_code = {}
     for match in matches:
@@ -48,6 +54,126 @@ def extract_and_save_code(full_code_string: str, default_folder: str) -> dict:
         subdirectory = default_folder
     
         final_path = f"{subdirectory}/{filename}"
-        save_code_to_file(final_path, code)
+        save_code_to_file(final_path, code, base_dir=base_dir)
             
-    return extracted_code
\ No newline at end of file
+    return extracted_code
+
+
+class StreamingCodeExtractor:
+    """
+    Versión incremental de `extract_and_save_code`: recibe la salida del LLM por
+    fragmentos y guarda cada archivo en cuanto su bloque `_CODE_END` se cierra,
+    sin esperar a que termine la generación completa.
+
+    En modo parche (`track_changes=True`) también acepta bloques `<archivo>.patch`
+    con diffs unificados, que se aplican sobre el archivo existente, y registra el
+    diff de cada archivo modificado para la auditoría incremental.
+    """
+
+    def __init__(
+        self,
+        default_folder: str,
+        base_dir: str = "outputs",
+        on_file_saved: Optional[Callable[[str, str], None]] = None,
+        track_changes: bool = False,
+    ):
+        self.default_folder = default_folder
+        self.base_dir = base_dir
+        self.on_file_saved = on_file_saved
+        self.track_changes = track_changes
+        self.buffer = ""
+        self.extracted_code: Dict[str, str] = {}
+        self.saved_paths: Dict[str, str] = {}
+        self.changes: Dict[str, str] = {}
+        self.failed_patches: List[str] = []
+        self._processed = set()
+        self._scan_pos = 0
+
+    def _read_existing(self, filename: str) -> Optional[str]:
+        path = os.path.join(self.base_dir, self.default_folder, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _save(self, filename: str, code: str) -> None:
+        # Un mismo bloque puede verse dos veces (streaming + texto final): se procesa una sola vez.
+        if (filename, code) in self._processed:
+            return
+        self._processed.add((filename, code))
+
+        target = patch_target(filename)
+        previous = self._read_existing(target) if (self.track_changes or is_patch_filename(filename)) else None
+        if is_patch_filename(filename):
+            if previous is None:
+                print(f"ADVERTENCIA: Parche para '{target}' ignorado: el archivo no existe.")
+                self.failed_patches.append(target)
+                return
+            try:
+                code = apply_unified_diff(previous, code)
+            except PatchError as e:
+                print(f"ADVERTENCIA: No se pudo aplicar el parche de '{target}': {e}")
+                self.failed_patches.append(target)
+                return
+
+        if self.extracted_code.get(target) == code:
+            return
+        self.extracted_code[target] = code
+        saved_path = save_code_to_file(f"{self.default_folder}/{target}", code, base_dir=self.base_dir)
+        if saved_path:
+            self.saved_paths[target] = saved_path
+            if self.track_changes and previous != code:
+                self.changes[saved_path] = make_unified_diff(previous or "", code, f"{self.default_folder}/{target}")
+        if saved_path and self.on_file_saved:
+            self.on_file_saved(target, saved_path)
+
+    def unapplied_patches(self) -> List[str]:
+        """Archivos cuyo parche falló y que tampoco llegaron completos en la misma respuesta."""
+        return [name for name in dict.fromkeys(self.failed_patches) if name not in self.extracted_code]
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Añade un fragmento de texto y guarda los bloques que se hayan completado.
+        Devuelve los nombres de archivo cerrados con este fragmento.
+        """
+        self.buffer += delta
+        # Solo se vuelve a escanear si puede haber aparecido un nuevo delimitador de cierre.
+        tail = self.buffer[max(self._scan_pos, len(self.buffer) - len(delta) - 64):]
+        if "_code_end" not in tail.lower():
+            return []
+
+        closed = []
+        for match in CODE_BLOCK_PATTERN.finditer(self.buffer, self._scan_pos):
+            filename = match.group(1).lower()
+            self._save(filename, match.group(2).strip())
+            closed.append(filename)
+            self._scan_pos = match.end()
+        return closed
+
+    def finalize(self, full_code_string: Optional[str] = None) -> Dict[str, str]:
+        """
+        Procesa el texto completo (p. ej. si el modelo no transmitió tokens o la
+        respuesta vino de caché) y guarda los bloques que aún no se hubieran escrito.
+        """
+        if full_code_string is not None and full_code_string != self.buffer:
+            self.buffer = full_code_string
+            self._scan_pos = 0
+        for match in CODE_BLOCK_PATTERN.finditer(self.buffer, self._scan_pos):
+            self._save(match.group(1).lower(), match.group(2).strip())
+            self._scan_pos = match.end()
+
+        if not self.extracted_code:
+            print("ADVERTENCIA: No se encontraron bloques de código con los delimitadores esperados.")
+        return dict(self.extracted_code)
+
+
+class CodeStreamCallbackHandler(AsyncCallbackHandler):
+    """Callback de LangChain que alimenta un `StreamingCodeExtractor` token a token."""
+
+    def __init__(self, extractor: StreamingCodeExtractor):
+        self.extractor = extractor
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if token:
+            # Guardar archivos es I/O bloqueante: se delega a un hilo.
+            await asyncio.to_thread(self.extractor.feed, token)
@@ -1,6 +1,9 @@
 # En el archivo: src/tools/code_reader.py
 
 import os
+import re
+import hashlib
+from src.telemetry import measure
 from typing import List, Dict # Asegúrate de que List y Dict estén importados
 
 def list_code_files_in_directory(directory_path: str) -> List[str]:
@@ -77,4 +80,226 @@ def format_code_for_prompt(code_files: Dict[str, str]) -> str:
     formatted_string = "\n\n".join(full_code_parts)
     print(f"Herramienta 'format_code': Formateados {len(full_code_parts)} archivos en un solo bloque de texto.")
     
-    return formatted_string
\ No newline at end of file
+    return formatted_string
+
+# --- Contexto de código acotado para el auditor ---
+
+# Archivos que definen el punto de entrada de un proyecto: se auditan primero.
+ENTRY_POINT_NAMES = [
+    "index.html", "main.py", "app.py", "server.js", "index.js", "app.js", "script.js",
+]
+# Orden de preferencia por extensión para el resto de archivos.
+EXTENSION_PRIORITY = [".html", ".py", ".js", ".ts", ".sql", ".css", ".json", ".txt", ".md"]
+
+MAX_FILE_BYTES = int(os.getenv("AUDIT_MAX_FILE_BYTES", 512 * 1024))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("AUDIT_TOKEN_BUDGET", 12000))
+# Un archivo truncado conserva al menos este fragmento; si no cabe, se omite.
+MIN_TRUNCATED_CHARS = 400
+
+_DEFINITION_PATTERN = re.compile(
+    r"^\s*(?:async\s+)?(?:def|class|function|const|let|var|CREATE\s+TABLE|export\s+(?:default\s+)?(?:function|class|const))\s+[\w$]+",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata de tokens (~4 caracteres por token), suficiente para presupuestar."""
+    return len(text) // 4 + 1
+
+
+def is_binary_file(file_path: str) -> bool:
+    """Un archivo se considera binario si contiene bytes nulos al principio."""
+    try:
+        with open(file_path, "rb") as f:
+            return b"\0" in f.read(8192)
+    except OSError:
+        return True
+
+
+def _file_priority(file_path: str) -> tuple:
+    name = os.path.basename(file_path).lower()
+    ext = os.path.splitext(name)[1]
+    entry_rank = ENTRY_POINT_NAMES.index(name) if name in ENTRY_POINT_NAMES else len(ENTRY_POINT_NAMES)
+    ext_rank = EXTENSION_PRIORITY.index(ext) if ext in EXTENSION_PRIORITY else len(EXTENSION_PRIORITY)
+    return (entry_rank, ext_rank, os.path.getsize(file_path))
+
+
+def summarize_code(content: str) -> str:
+    """Resumen local (sin LLM) de un archivo: número de líneas y definiciones principales."""
+    definitions = [match.group(0).strip() for match in _DEFINITION_PATTERN.finditer(content)]
+    summary = f"{len(content.splitlines())} líneas"
+    if definitions:
+        shown = ", ".join(definitions[:15])
+        more = f" (+{len(definitions) - 15} más)" if len(definitions) > 15 else ""
+        summary += f"; definiciones: {shown}{more}"
+    return summary
+
+
+def _truncate_to_budget(content: str, token_budget: int) -> str | None:
+    """
+    Conserva el principio y el final del archivo y resume lo omitido, sin pasar de
+    `token_budget` (nota y resumen incluidos). Devuelve None si no cabe ni un
+    fragmento mínimo de MIN_TRUNCATED_CHARS caracteres.
+    """
+    summary_note = f"Resumen del archivo: {summarize_code(content)} ..."
+    # Espacio para la nota con un número de líneas de hasta 9 cifras.
+    overhead = len(f"\n\n[... {'0' * 9} líneas omitidas por límite de contexto. {summary_note}]\n\n")
+    char_budget = (token_budget - 1) * 4 - overhead
+    if char_budget < MIN_TRUNCATED_CHARS:
+        return None
+    head = content[: char_budget * 2 // 3]
+    tail = content[len(content) - char_budget // 3:]
+    omitted_lines = content.count("\n") - head.count("\n") - tail.count("\n")
+    return (
+        f"{head}\n\n[... {max(omitted_lines, 0)} líneas omitidas por límite de contexto. "
+        f"{summary_note}]\n\n{tail}"
+    )
+
+
+def build_code_context(
+    file_paths: List[str],
+    base_dir: str | None = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    max_file_bytes: int = MAX_FILE_BYTES,
+) -> tuple[str, dict]:
+    """
+    Construye el bloque de código para el prompt del auditor respetando un
+    presupuesto de tokens: omite binarios y archivos demasiado grandes, prioriza
+    los puntos de entrada y trunca (con resumen) lo que no cabe completo. Cuando el
+    presupuesto se agota, los archivos restantes se omiten en lugar de forzar un
+    fragmento mínimo de cada uno.
+
+    Returns:
+        El texto formateado y un informe con archivos incluidos, truncados,
+        omitidos y los tokens estimados.
+    """
+    report = {"included": [], "truncated": [], "skipped": [], "estimated_tokens": 0}
+    candidates = []
+    for file_path in file_paths:
+        if not os.path.isfile(file_path):
+            report["skipped"].append(f"{file_path} (no existe)")
+        elif os.path.getsize(file_path) > max_file_bytes:
+            report["skipped"].append(f"{file_path} (demasiado grande)")
+        elif is_binary_file(file_path):
+            report["skipped"].append(f"{file_path} (binario)")
+        else:
+            candidates.append(file_path)
+
+    parts = []
+    remaining = token_budget
+    for index, file_path in enumerate(sorted(candidates, key=_file_priority)):
+        display_name = os.path.relpath(file_path, base_dir) if base_dir else os.path.basename(file_path)
+        header = f"--- CÓDIGO DEL ARCHIVO: {display_name} ---\n"
+        if remaining - estimate_tokens(header) < MIN_TRUNCATED_CHARS // 4:
+            report["skipped"].append(f"{display_name} (sin presupuesto de tokens)")
+            continue
+        try:
+            with measure("file_io"), open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except (UnicodeDecodeError, OSError):
+            report["skipped"].append(f"{file_path} (no legible como texto)")
+            continue
+        if not content.strip():
+            continue
+
+        part = header + content
+        tokens = estimate_tokens(part)
+        if tokens > remaining:
+            # Se reparte lo que queda entre este archivo y los pendientes; si la parte
+            # proporcional no alcanza, el archivo (más prioritario) usa todo lo que queda.
+            pending = len(candidates) - index
+            truncated = _truncate_to_budget(content, remaining // pending - estimate_tokens(header))
+            if truncated is None:
+                truncated = _truncate_to_budget(content, remaining - estimate_tokens(header))
+            if truncated is None:
+                report["skipped"].append(f"{display_name} (sin presupuesto de tokens)")
+                continue
+            part = header + truncated
+            tokens = estimate_tokens(part)
+            report["truncated"].append(display_name)
+        else:
+            report["included"].append(display_name)
+
+        parts.append(part)
+        remaining -= tokens
+        report["estimated_tokens"] += tokens
+
+    print(
+        f"Herramienta 'build_code_context': {len(report['included'])} completos, "
+        f"{len(report['truncated'])} truncados, {len(report['skipped'])} omitidos "
+        f"(~{report['estimated_tokens']} tokens de {token_budget})."
+    )
+    return "\n\n".join(parts), report
+
+
+# Resúmenes de archivos sin cambios, cacheados por hash de contenido entre iteraciones.
+_summary_cache: Dict[str, str] = {}
+
+
+def _cached_summary(content: str) -> str:
+    key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    if key not in _summary_cache:
+        _summary_cache[key] = summarize_code(content)
+    return _summary_cache[key]
+
+
+def build_incremental_code_context(
+    changes: Dict[str, str],
+    file_paths: List[str],
+    base_dir: str | None = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> tuple[str, dict]:
+    """
+    Contexto para la auditoría incremental: los diffs de los archivos modificados
+    en la última iteración más un resumen (cacheado) de los archivos sin cambios.
+
+    Returns:
+        El texto formateado y un informe compatible con `build_code_context`.
+    """
+    report = {"included": [], "truncated": [], "skipped": [], "summarized": [], "estimated_tokens": 0}
+    parts = []
+    remaining = token_budget
+
+    for file_path, diff_text in changes.items():
+        display_name = os.path.relpath(file_path, base_dir) if base_dir else os.path.basename(file_path)
+        header = f"--- CAMBIOS (diff) EN EL ARCHIVO: {display_name} ---\n"
+        part = header + diff_text
+        tokens = estimate_tokens(part)
+        if tokens > remaining:
+            truncated = _truncate_to_budget(diff_text, remaining - estimate_tokens(header))
+            if truncated is None:
+                report["skipped"].append(f"{display_name} (sin presupuesto de tokens)")
+                continue
+            part = header + truncated
+            tokens = estimate_tokens(part)
+            report["truncated"].append(display_name)
+        else:
+            report["included"].append(display_name)
+        parts.append(part)
+        remaining -= tokens
+        report["estimated_tokens"] += tokens
+
+    for file_path in file_paths:
+        if file_path in changes or not os.path.isfile(file_path) or is_binary_file(file_path):
+            continue
+        display_name = os.path.relpath(file_path, base_dir) if base_dir else os.path.basename(file_path)
+        try:
+            with measure("file_io"), open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            summary = _cached_summary(content)
+        except (UnicodeDecodeError, OSError):
+            continue
+        line = f"--- SIN CAMBIOS DESDE LA ÚLTIMA AUDITORÍA: {display_name} ({summary}) ---"
+        if estimate_tokens(line) > remaining:
+            report["skipped"].append(f"{display_name} (sin presupuesto de tokens)")
+            continue
+        parts.append(line)
+        remaining -= estimate_tokens(line)
+        report["summarized"].append(display_name)
+        report["estimated_tokens"] += estimate_tokens(line)
+
+    print(
+        f"Herramienta 'build_incremental_code_context': {len(changes)} archivos con diff, "
+        f"{len(report['summarized'])} resumidos (~{report['estimated_tokens']} tokens)."
+    )
+    return "\n\n".join(parts), report
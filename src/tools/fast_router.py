@@ -0,0 +1,223 @@
+# Contenido para: src/tools/fast_router.py
+
+"""
+Enrutador local previo a la llamada al LLM del supervisor.
+
+Primero aplica reglas (palabras clave/regex) y después un clasificador por
+similitud de embeddings contra ejemplos etiquetados, reutilizando el modelo
+multilingüe de `src/rag_retriever.py`. Solo si ninguna etapa supera el umbral
+de confianza se consulta al LLM.
+"""
+
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.rag_retriever import get_embeddings
+
+CONFIDENCE_THRESHOLD = float(os.getenv("FAST_ROUTER_THRESHOLD", 0.62))
+MIN_MARGIN = float(os.getenv("FAST_ROUTER_MIN_MARGIN", 0.05))
+EMBEDDINGS_ENABLED = os.getenv("FAST_ROUTER_EMBEDDINGS", "true").lower() not in ("0", "false", "no")
+
+# Rutas que solo tienen sentido si el usuario adjuntó archivos.
+FILE_ROUTES = {"ui_ux_designer", "multimodal_analyzer"}
+
+# --- Etapa 1: reglas deterministas ---
+_GREETING = re.compile(
+    r"^[\s¡¿]*(hola|buenas|buenos\s+d[ií]as|buenas\s+(tardes|noches)|hey|hi|hello|saludos|"
+    r"gracias|muchas\s+gracias|adi[oó]s|chao|hasta\s+luego|qu[eé]\s+tal)"
+    r"([\s,!¡?¿.]+(bot|devteam-bot|amigo|a\s+todos|c[oó]mo\s+est[aá]s|qu[eé]\s+tal))*[\s!?.]*$",
+    re.IGNORECASE,
+)
+_SQL_ONLY = re.compile(
+    r"\b(solo|s[oó]lo|[uú]nicamente|nada\s+m[aá]s\s+que)\b.{0,40}\b(sql|esquema|base\s+de\s+datos|tablas?|script\s+de\s+bd)\b",
+    re.IGNORECASE,
+)
+_UI_FROM_FILE = re.compile(
+    r"\b(web|p[aá]gina|sitio|interfaz|landing|html|maqueta|mockup|boceto|dise[ñn]o|replica|clona)\b",
+    re.IGNORECASE,
+)
+_ANALYZE_FILE = re.compile(
+    r"\b(qu[eé]\s+(hay|contiene|dice)|describe|descr[ií]beme|analiza|transcribe|resume|resumen)\b",
+    re.IGNORECASE,
+)
+
+# --- Etapa 2: ejemplos etiquetados para el clasificador por similitud ---
+ROUTE_EXEMPLARS: Dict[str, List[str]] = {
+    "conversational_agent": [
+        "hola, ¿cómo estás?",
+        "¿qué puedes hacer?",
+        "gracias por la ayuda",
+        "¿qué es una API REST?",
+        "explícame la diferencia entre SQL y NoSQL",
+    ],
+    "database_architech": [
+        "solo necesito el esquema SQL para una tienda online",
+        "crea las tablas de una base de datos para una biblioteca",
+        "dame el script de MongoDB para insertar usuarios",
+        "diseña el modelo de datos en PostgreSQL para un blog",
+    ],
+    "planner": [
+        "crea una aplicación web completa de gestión de tareas",
+        "hazme una API en Flask con autenticación",
+        "desarrolla una landing page en HTML, CSS y JavaScript",
+        "quiero un backend en Node.js con Express y una base de datos",
+        "construye un juego de ajedrez para el navegador",
+    ],
+    "ui_ux_designer": [
+        "crea la página web a partir de esta imagen",
+        "replica este diseño en HTML y CSS",
+        "convierte este mockup en un sitio web",
+        "implementa la interfaz que aparece en el video",
+    ],
+    "multimodal_analyzer": [
+        "¿qué hay en esta imagen?",
+        "describe el contenido de este archivo",
+        "transcribe este audio",
+        "resume este documento PDF",
+    ],
+}
+
+
+@dataclass
+class RouteResult:
+    node: Optional[str]
+    confidence: float
+    source: str  # "rule" | "embedding" | "none"
+
+    @property
+    def is_confident(self) -> bool:
+        return self.node is not None and self.confidence >= CONFIDENCE_THRESHOLD
+
+
+class _ExemplarIndex:
+    """Embeddings de los ejemplos, calculados una sola vez y de forma perezosa."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.labels: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def get(self):
+        if self.matrix is None:
+            with self._lock:
+                if self.matrix is None:
+                    texts = []
+                    for label, examples in ROUTE_EXEMPLARS.items():
+                        self.labels.extend([label] * len(examples))
+                        texts.extend(examples)
+                    self.matrix = np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+        return self.labels, self.matrix
+
+
+_exemplar_index = _ExemplarIndex()
+
+
+def _route_by_rules(user_input: str, has_files: bool) -> RouteResult:
+    text = user_input.strip()
+    if has_files:
+        if _UI_FROM_FILE.search(text):
+            return RouteResult("ui_ux_designer", 0.9, "rule")
+        if _ANALYZE_FILE.search(text) or not text:
+            return RouteResult("multimodal_analyzer", 0.9, "rule")
+        return RouteResult(None, 0.0, "none")
+    if _GREETING.match(text):
+        return RouteResult("conversational_agent", 0.95, "rule")
+    if _SQL_ONLY.search(text):
+        return RouteResult("database_architech", 0.9, "rule")
+    return RouteResult(None, 0.0, "none")
+
+
+def _route_by_embeddings(user_input: str, has_files: bool) -> RouteResult:
+    labels, matrix = _exemplar_index.get()
+    # Los embeddings están normalizados: el producto escalar es la similitud coseno.
+    query = np.asarray(get_embeddings().embed_query(user_input), dtype=np.float32)
+    scores = matrix @ query
+
+    best: Dict[str, float] = {}
+    for label, score in zip(labels, scores):
+        if not has_files and label in FILE_ROUTES:
+            continue
+        best[label] = max(best.get(label, -1.0), float(score))
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    if not ranked:
+        return RouteResult(None, 0.0, "none")
+
+    top_label, top_score = ranked[0]
+    margin = top_score - ranked[1][1] if len(ranked) > 1 else top_score
+    if margin < MIN_MARGIN:
+        # Empate entre rutas: no es un caso claro.
+        return RouteResult(top_label, min(top_score, CONFIDENCE_THRESHOLD - 0.01), "embedding")
+    return RouteResult(top_label, top_score, "embedding")
+
+
+def fast_route(user_input: str, has_files: bool) -> RouteResult:
+    """
+    Clasifica la petición localmente. El resultado indica si es lo bastante fiable
+    (`is_confident`) para saltarse la llamada al LLM del supervisor.
+    """
+    start = time.perf_counter()
+    result = _route_by_rules(user_input or "", has_files)
+    if not result.is_confident and EMBEDDINGS_ENABLED and user_input:
+        try:
+            result = _route_by_embeddings(user_input, has_files)
+        except Exception as e:
+            print(f"ADVERTENCIA (Fast router): Clasificador por embeddings no disponible: {e}")
+    router_metrics.record_local(result, (time.perf_counter() - start) * 1000)
+    return result
+
+
+class RouterMetrics:
+    """Contadores de decisiones, latencia y concordancia con el LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decisions = {"rule": 0, "embedding": 0, "llm": 0}
+        self.routes: Dict[str, int] = {}
+        self.local_latency_ms_total = 0.0
+        self.llm_latency_ms_total = 0.0
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+
+    def record_local(self, result: RouteResult, latency_ms: float) -> None:
+        with self._lock:
+            self.local_latency_ms_total += latency_ms
+            if result.is_confident:
+                self.decisions[result.source] += 1
+                self.routes[result.node] = self.routes.get(result.node, 0) + 1
+
+    def record_llm(self, local_guess: RouteResult, llm_node: str, latency_ms: float) -> None:
+        """
+        Registra una decisión del LLM. La predicción local (no confiable) se compara
+        con ella como estimación de la precisión del enrutador local.
+        """
+        with self._lock:
+            self.decisions["llm"] += 1
+            self.routes[llm_node] = self.routes.get(llm_node, 0) + 1
+            self.llm_latency_ms_total += latency_ms
+            if local_guess.node is not None:
+                self.shadow_compared += 1
+                self.shadow_agreed += int(local_guess.node == llm_node)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total_local_calls = sum(self.decisions.values())
+            return {
+                "decisions": dict(self.decisions),
+                "routes": dict(self.routes),
+                "fast_path_ratio": round(
+                    (self.decisions["rule"] + self.decisions["embedding"]) / total_local_calls, 3
+                ) if total_local_calls else 0.0,
+                "avg_local_latency_ms": round(self.local_latency_ms_total / total_local_calls, 2) if total_local_calls else 0.0,
+                "avg_llm_latency_ms": round(self.llm_latency_ms_total / self.decisions["llm"], 2) if self.decisions["llm"] else 0.0,
+                "shadow_accuracy": round(self.shadow_agreed / self.shadow_compared, 3) if self.shadow_compared else None,
+                "threshold": CONFIDENCE_THRESHOLD,
+            }
+
+
+router_metrics = RouterMetrics()
@@ -2,6 +2,7 @@ import mimetypes
 import os
 import base64
 from typing import List, Dict, Any
+from src.tools.media_preprocessor import preprocess_media
 
 mimetypes.init()
 
@@ -9,39 +10,46 @@ def get_mime_type(file_path: str) -> str:
     mime_type, _ = mimetypes.guess_type(file_path)
     return mime_type if mime_type else "application/octet-stream"
 
+def _encode_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
 def prepare_multimodal_input(prompt_text: str, file_paths: List[str]) -> List[Dict[str, Any]]:
     """
     Prepara el contenido para un mensaje multimodal, combinando texto y cualquier tipo de media
-    (imágenes, audio, video) leyéndolos y codificándolos en Base64.
+    (imágenes, audio, video) codificados en Base64.
+
+    Las imágenes se envían reducidas y los videos como fotogramas clave (ver
+    `src/tools/media_preprocessor.py`), lo que recorta mucho el payload y la latencia.
     """
     content = [{"type": "text", "text": prompt_text}]
-    
-    for file_path in file_paths:
+    processed = preprocess_media(file_paths)
+
+    for file_path, parts in zip(file_paths, processed):
         try:
             mime_type = get_mime_type(file_path)
-            
+
             # Lógica para manejar PDFs y otros archivos multimedia.
             # CORRECCIÓN: Usar la extensión del archivo para PDFs es más robusto que depender del MIME type del sistema.
             if file_path.lower().endswith('.pdf'):
                 print(f"Info: Leyendo y codificando PDF de '{file_path}'...")
-                with open(file_path, "rb") as f:
-                    file_data = f.read()
-                encoded_data = base64.b64encode(file_data).decode('utf-8')
                 content.append({
                     "type": "media",
                     "mime_type": "application/pdf", # Forzar el MIME type correcto
-                    "data": encoded_data
+                    "data": _encode_file(file_path)
                 })
             elif mime_type.startswith("image/") or mime_type.startswith("audio/") or mime_type.startswith("video/"):
-                print(f"Info: Leyendo y codificando datos de media de '{file_path}'...")
-                with open(file_path, "rb") as f:
-                    file_data = f.read()
-                encoded_data = base64.b64encode(file_data).decode('utf-8')
-                content.append({
-                    "type": "media",
-                    "mime_type": mime_type,
-                    "data": encoded_data
-                })
+                print(f"Info: Codificando {len(parts)} fragmento(s) de media de '{file_path}'...")
+                if len(parts) > 1:
+                    content.append({"type": "text", "text": f"Fotogramas clave del video '{os.path.basename(file_path)}':"})
+                for part in parts:
+                    if part.label:
+                        content.append({"type": "text", "text": part.label})
+                    content.append({
+                        "type": "media",
+                        "mime_type": part.mime_type,
+                        "data": _encode_file(part.path)
+                    })
             else:
                 print(f"Advertencia: El tipo de archivo {mime_type} no es soportado. Se omitirá: {file_path}")
 
@@ -0,0 +1,154 @@
+# Contenido para: src/tools/json_repair.py
+
+"""
+Reparación local de JSON casi válido devuelto por un LLM.
+
+Antes de volver a preguntar al modelo (una llamada completa), se intentan arreglar
+los fallos típicos: bloques markdown, texto alrededor del objeto, comillas tipográficas,
+comas finales, literales de Python, comentarios y llaves sin cerrar.
+"""
+
+import re
+import json
+from typing import Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_LINE_COMMENT = re.compile(r"^\s*//.*$", re.MULTILINE)
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class StructuredOutputError(ValueError):
+    """La salida del LLM no se pudo convertir al esquema ni siquiera tras repararla."""
+
+
+def extract_json_block(text: str) -> str:
+    """Devuelve el primer objeto JSON del texto (sin bloques markdown ni texto alrededor)."""
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start == -1:
+        return text.strip()
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    # Objeto truncado: se devuelve hasta el final para que `repair_json` lo cierre.
+    return text[start:]
+
+
+def _replace_outside_strings(text: str, pattern: re.Pattern, replace) -> str:
+    """Aplica `replace` a las coincidencias que no caen dentro de una cadena JSON."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return "".join(part if i % 2 else pattern.sub(replace, part) for i, part in enumerate(parts))
+
+
+def _close_open_structures(text: str) -> str:
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """Aplica las reparaciones baratas y devuelve el texto resultante (puede seguir siendo inválido)."""
+    text = extract_json_block(text)
+    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    if '"' not in text and "'" in text:
+        text = text.replace("'", '"')
+    text = _LINE_COMMENT.sub("", text)
+    text = _replace_outside_strings(text, re.compile(r"\b(True|False|None)\b"), lambda m: _PY_LITERALS[m.group(1)])
+    text = _close_open_structures(text.strip())
+    text = _replace_outside_strings(text, _TRAILING_COMMA, r"\1")
+    return text
+
+
+def parse_llm_json(text: str, schema: Type[T]) -> T:
+    """
+    Convierte la salida de un LLM en una instancia de `schema`.
+    Primero intenta el JSON tal cual; si falla, lo repara localmente.
+    Lanza StructuredOutputError si ninguna de las dos cosas funciona.
+    """
+    last_error = None
+    for candidate in (extract_json_block(text), repair_json(text)):
+        try:
+            return schema.model_validate(json.loads(candidate))
+        except (json.JSONDecodeError, ValidationError, TypeError) as e:
+            last_error = e
+    raise StructuredOutputError(f"{type(last_error).__name__}: {last_error}")
+
+
+def build_repair_prompt(raw_output: str, error: Exception, schema: Type[BaseModel]) -> str:
+    """Prompt corto para pedir al modelo que corrija solo el formato de su respuesta anterior."""
+    return f"""
+    Tu respuesta anterior no es un JSON válido para el esquema requerido.
+    Error: {error}
+
+    Esquema JSON requerido:
+    {json.dumps(schema.model_json_schema(), ensure_ascii=False)}
+
+    Respuesta anterior:
+    {raw_output[:6000]}
+
+    Devuelve ÚNICAMENTE el objeto JSON corregido, sin texto adicional.
+    """
+
+
+async def ainvoke_structured(llm, prompt, schema: Type[T]):
+    """
+    Invoca al LLM y valida su salida contra `schema`. Si ni el JSON original ni su
+    reparación local son válidos, hace UNA sola petición corta de corrección de formato
+    (mucho más barata que otra vuelta completa por el supervisor).
+
+    Devuelve (resultado o None, lista de respuestas del LLM) para que el llamador pueda
+    contabilizar los tokens de todas las llamadas.
+    """
+    response = await llm.ainvoke(prompt)
+    responses = [response]
+    try:
+        return parse_llm_json(response.content, schema), responses
+    except StructuredOutputError as e:
+        print(f"Salida estructurada inválida ({e}); pidiendo corrección de formato al modelo.")
+        repair = await llm.ainvoke(build_repair_prompt(response.content, e, schema))
+        responses.append(repair)
+    try:
+        return parse_llm_json(repair.content, schema), responses
+    except StructuredOutputError as e:
+        print(f"La corrección de formato también falló: {e}")
+        return None, responses
@@ -0,0 +1,238 @@
+# Contenido para: src/tools/media_preprocessor.py
+
+"""
+Preprocesado de archivos multimedia antes de enviarlos al modelo.
+
+  - Imágenes: se corrige la orientación EXIF, se reducen a MEDIA_MAX_IMAGE_SIDE píxeles
+    por lado y se recomprimen a JPEG (salvo que ya sean pequeñas).
+  - Videos (MEDIA_VIDEO_MODE="frames"): se muestrean a MEDIA_FRAME_SAMPLE_FPS y se
+    conservan los fotogramas donde cambia la escena (diferencia de histogramas), con
+    un máximo de MEDIA_MAX_FRAMES. Con MEDIA_VIDEO_MODE="raw" se envía el video tal cual.
+
+Los derivados se guardan en MEDIA_CACHE_DIR bajo el hash del contenido y de los
+parámetros, así que el mismo mockup no se vuelve a procesar. El trabajo pesado
+(decodificar video y redimensionar) se hace en un pool de procesos.
+"""
+
+import os
+import re
+import json
+import hashlib
+import mimetypes
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+MEDIA_MAX_IMAGE_SIDE = int(os.getenv("MEDIA_MAX_IMAGE_SIDE", 1568))
+MEDIA_JPEG_QUALITY = int(os.getenv("MEDIA_JPEG_QUALITY", 85))
+# Las imágenes por debajo de este tamaño y resolución se envían sin tocar.
+MEDIA_PASSTHROUGH_BYTES = int(os.getenv("MEDIA_PASSTHROUGH_KB", 300)) * 1024
+MEDIA_VIDEO_MODE = os.getenv("MEDIA_VIDEO_MODE", "frames").lower()
+MEDIA_FRAME_SAMPLE_FPS = float(os.getenv("MEDIA_FRAME_SAMPLE_FPS", 1.0))
+MEDIA_SCENE_THRESHOLD = float(os.getenv("MEDIA_SCENE_THRESHOLD", 0.3))
+MEDIA_MAX_FRAMES = int(os.getenv("MEDIA_MAX_FRAMES", 12))
+MEDIA_MIN_FRAMES = 3
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(".cache", "media"))
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+
+# Subir al cambiar el algoritmo: invalida los derivados cacheados.
+PREPROCESS_VERSION = 1
+
+_CONTENT_ID = re.compile(r"^[0-9a-f]{64}$")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class MediaPart:
+    """Un fragmento listo para el mensaje multimodal (archivo en disco + etiqueta opcional)."""
+    path: str
+    mime_type: str
+    label: str | None = None
+
+
+def is_image(path: str) -> bool:
+    return (mimetypes.guess_type(path)[0] or "").startswith("image/")
+
+
+def is_video(path: str) -> bool:
+    return (mimetypes.guess_type(path)[0] or "").startswith("video/")
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 del archivo. Las subidas ya se llaman por su hash, así que se reutiliza."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if _CONTENT_ID.match(stem):
+        return stem
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _settings_fingerprint(kind: str) -> str:
+    if kind == "image":
+        settings = (PREPROCESS_VERSION, MEDIA_MAX_IMAGE_SIDE, MEDIA_JPEG_QUALITY, MEDIA_PASSTHROUGH_BYTES)
+    else:
+        settings = (PREPROCESS_VERSION, MEDIA_MAX_IMAGE_SIDE, MEDIA_JPEG_QUALITY,
+                    MEDIA_FRAME_SAMPLE_FPS, MEDIA_SCENE_THRESHOLD, MEDIA_MAX_FRAMES)
+    return hashlib.sha256(repr(settings).encode()).hexdigest()[:12]
+
+
+# --- Trabajo pesado (se ejecuta en los procesos del pool) ---
+
+def _process_image(source: str, output_dir: str) -> List[dict]:
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        small_enough = max(image.size) <= MEDIA_MAX_IMAGE_SIDE and image.format in ("JPEG", "PNG", "WEBP")
+        if small_enough and os.path.getsize(source) <= MEDIA_PASSTHROUGH_BYTES:
+            return [{"path": source, "mime_type": Image.MIME[image.format]}]
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MEDIA_MAX_IMAGE_SIDE, MEDIA_MAX_IMAGE_SIDE), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            # Mockups con transparencia: se aplanan sobre blanco antes de pasar a JPEG.
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+        target = os.path.join(output_dir, "image.jpg")
+        image.save(target, "JPEG", quality=MEDIA_JPEG_QUALITY, optimize=True)
+    return [{"path": target, "mime_type": "image/jpeg"}]
+
+
+def _select_keyframes(candidates: List[tuple], limit: int = MEDIA_MAX_FRAMES) -> List[tuple]:
+    """Limita los fotogramas a `limit` repartidos de forma uniforme."""
+    if len(candidates) <= limit:
+        return candidates
+    step = len(candidates) / limit
+    return [candidates[int(i * step)] for i in range(limit)]
+
+
+def _process_video(source: str, output_dir: str) -> List[dict]:
+    import cv2
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"No se pudo abrir el video '{source}'")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    step = max(1, int(round(fps / MEDIA_FRAME_SAMPLE_FPS)))
+
+    keyframes, samples = [], []
+    last_hist = None
+    index = 0
+    while True:
+        grabbed = capture.grab()
+        if not grabbed:
+            break
+        if index % step == 0:
+            ok, frame = capture.retrieve()
+            if ok:
+                height, width = frame.shape[:2]
+                scale = MEDIA_MAX_IMAGE_SIDE / max(height, width)
+                if scale < 1:
+                    frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                hist = cv2.calcHist([gray], [0], None, [64], [0, 256])
+                cv2.normalize(hist, hist)
+                timestamp = index / fps
+                samples.append((timestamp, frame))
+                # Cambio de escena: distancia de Bhattacharyya entre histogramas.
+                if last_hist is None or cv2.compareHist(last_hist, hist, cv2.HISTCMP_BHATTACHARYYA) > MEDIA_SCENE_THRESHOLD:
+                    keyframes.append((timestamp, frame))
+                    last_hist = hist
+                    if len(keyframes) > MEDIA_MAX_FRAMES * 4:
+                        keyframes = keyframes[::2]
+                # Solo se retienen en memoria unas pocas muestras para el relleno uniforme.
+                if len(samples) > MEDIA_MAX_FRAMES * 4:
+                    samples = samples[::2]
+        index += 1
+    capture.release()
+
+    if len(keyframes) < MEDIA_MIN_FRAMES:
+        # Video casi estático: se completa con muestras uniformes para cubrir toda la duración.
+        chosen = {round(t, 2): frame for t, frame in keyframes}
+        for t, frame in _select_keyframes(samples, MEDIA_MIN_FRAMES * 2):
+            chosen.setdefault(round(t, 2), frame)
+        keyframes = sorted(chosen.items())
+    keyframes = _select_keyframes(keyframes)
+
+    parts = []
+    for number, (timestamp, frame) in enumerate(keyframes):
+        target = os.path.join(output_dir, f"frame_{number:03d}.jpg")
+        cv2.imwrite(target, frame, [cv2.IMWRITE_JPEG_QUALITY, MEDIA_JPEG_QUALITY])
+        parts.append({"path": target, "mime_type": "image/jpeg", "label": f"Fotograma en t={timestamp:.1f}s"})
+    return parts
+
+
+def _process_file(source: str, kind: str, output_dir: str) -> List[dict]:
+    os.makedirs(output_dir, exist_ok=True)
+    parts = _process_image(source, output_dir) if kind == "image" else _process_video(source, output_dir)
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(parts, f)
+    return parts
+
+
+# --- API pública ---
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn": se crea desde un hilo del servidor, con el cliente de Gemini, torch y el
+            # hilo del batcher de embeddings vivos; un fork en ese estado puede bloquearse.
+            _pool = ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _load_cached(output_dir: str) -> List[dict] | None:
+    manifest = os.path.join(output_dir, "manifest.json")
+    if not os.path.exists(manifest):
+        return None
+    with open(manifest, encoding="utf-8") as f:
+        parts = json.load(f)
+    return parts if all(os.path.exists(part["path"]) for part in parts) else None
+
+
+def preprocess_media(file_paths: List[str]) -> List[List[MediaPart]]:
+    """
+    Devuelve, por cada archivo, los fragmentos que deben enviarse al modelo.
+    Los archivos que no son imagen ni video (PDF, audio...) se devuelven sin cambios.
+    Si el preprocesado falla, se usa el archivo original.
+    """
+    results: List[List[MediaPart] | None] = [None] * len(file_paths)
+    pending = {}
+    for i, path in enumerate(file_paths):
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        kind = "image" if is_image(path) else "video" if is_video(path) and MEDIA_VIDEO_MODE == "frames" else None
+        if kind is None:
+            results[i] = [MediaPart(path, mime_type)]
+            continue
+        try:
+            output_dir = os.path.join(MEDIA_CACHE_DIR, f"{content_hash(path)}-{_settings_fingerprint(kind)}")
+            cached = _load_cached(output_dir)
+        except OSError as e:
+            print(f"Error leyendo '{path}' para preprocesarlo: {e}")
+            results[i] = [MediaPart(path, mime_type)]
+            continue
+        if cached is not None:
+            print(f"Info: derivados de '{path}' recuperados de la caché ({len(cached)} fragmentos).")
+            results[i] = [MediaPart(**part) for part in cached]
+        else:
+            pending[i] = (_get_pool().submit(_process_file, path, kind, output_dir), path, mime_type)
+
+    for i, (future, path, mime_type) in pending.items():
+        try:
+            parts = future.result()
+            print(f"Info: '{path}' preprocesado en {len(parts)} fragmento(s).")
+            results[i] = [MediaPart(**part) for part in parts]
+        except Exception as e:
+            print(f"Advertencia: no se pudo preprocesar '{path}' ({e}); se envía el original.")
+            results[i] = [MediaPart(path, mime_type)]
+    return results
@@ -0,0 +1,130 @@
+# Contenido para: src/tools/patch_applier.py
+
+import os
+import re
+import difflib
+from typing import List, Optional
+
+# Modo parche: en las iteraciones de corrección los desarrolladores solo emiten los
+# archivos que cambian (completos o como diff unificado) en lugar de regenerarlo todo.
+PATCH_MODE_ENABLED = os.getenv("DEV_PATCH_MODE", "true").lower() not in ("0", "false", "no")
+
+PATCH_SUFFIXES = (".patch", ".diff")
+
+PATCH_MODE_INSTRUCTIONS = """
+        **MODO PARCHE (OBLIGATORIO):** No regeneres los archivos que no necesitan cambios.
+        Para CADA archivo que debas modificar, elige UNA de estas opciones:
+        - Reemplazo completo: un bloque con el nombre del archivo (ej. `style.css_CODE_START` / `style.css_CODE_END`)
+          que contenga el archivo completo corregido. Úsalo si cambias gran parte del archivo.
+        - Diff unificado: un bloque con el nombre del archivo terminado en `.patch`
+          (ej. `// --- script.js.patch_CODE_START ---` / `// --- script.js.patch_CODE_END ---`) con hunks
+          en formato `@@ -a,b +c,d @@`, líneas de contexto con ' ', eliminadas con '-' y añadidas con '+'.
+        Los archivos que no aparezcan en tu respuesta se conservan tal cual.
+"""
+
+# Encabezado de la nota que se añade al feedback cuando algún parche no se pudo aplicar.
+PATCH_RETRY_MARKER = "**PARCHES NO APLICADOS"
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """El diff no se pudo aplicar sobre el contenido actual del archivo."""
+
+
+def is_patch_filename(filename: str) -> bool:
+    return filename.lower().endswith(PATCH_SUFFIXES)
+
+
+def patch_target(filename: str) -> str:
+    """'script.js.patch' -> 'script.js'"""
+    for suffix in PATCH_SUFFIXES:
+        if filename.lower().endswith(suffix):
+            return filename[: -len(suffix)]
+    return filename
+
+
+def _parse_hunks(diff_text: str) -> List[dict]:
+    hunks = []
+    current = None
+    for line in diff_text.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = {"old_start": int(header.group(1)), "lines": []}
+            hunks.append(current)
+        elif current is not None and line[:1] in (" ", "-", "+"):
+            current["lines"].append(line)
+        elif current is not None and line == "":
+            # Algunos modelos omiten el espacio inicial en las líneas de contexto vacías.
+            current["lines"].append(" ")
+    return hunks
+
+
+def _find_block(lines: List[str], block: List[str], expected: int) -> int:
+    """Busca `block` en `lines`, empezando por la posición esperada y alejándose de ella."""
+    if not block:
+        return min(max(expected, 0), len(lines))
+    max_offset = len(lines)
+    for offset in range(max_offset + 1):
+        for candidate in (expected - offset, expected + offset):
+            if 0 <= candidate <= len(lines) - len(block):
+                if [l.rstrip() for l in lines[candidate:candidate + len(block)]] == [b.rstrip() for b in block]:
+                    return candidate
+    raise PatchError("El contexto del diff no coincide con el archivo actual.")
+
+
+def apply_unified_diff(original: str, diff_text: str) -> str:
+    """
+    Aplica un diff unificado sobre `original`. Tolera números de línea desplazados
+    buscando el contexto del hunk alrededor de la posición indicada.
+    """
+    hunks = _parse_hunks(diff_text)
+    if not hunks:
+        raise PatchError("El parche no contiene hunks '@@'.")
+
+    lines = original.splitlines()
+    delta = 0
+    for hunk in hunks:
+        old_block = [l[1:] for l in hunk["lines"] if l[:1] in (" ", "-")]
+        new_block = [l[1:] for l in hunk["lines"] if l[:1] in (" ", "+")]
+        position = _find_block(lines, old_block, hunk["old_start"] - 1 + delta)
+        lines[position:position + len(old_block)] = new_block
+        delta = position - (hunk["old_start"] - 1) + len(new_block) - len(old_block)
+    return "\n".join(lines)
+
+
+def make_unified_diff(old: str, new: str, filename: str) -> str:
+    """Diff unificado entre dos versiones de un archivo (para la auditoría incremental)."""
+    return "\n".join(difflib.unified_diff(
+        old.splitlines(), new.splitlines(),
+        fromfile=f"a/{filename}", tofile=f"b/{filename}", lineterm="",
+    ))
+
+
+def is_patch_retry(feedback: Optional[str]) -> bool:
+    """True si el feedback ya incluye la nota de parches fallidos de la iteración anterior."""
+    return bool(feedback) and PATCH_RETRY_MARKER in feedback
+
+
+def patch_retry_feedback(feedback: Optional[str], failed_patches: List[str], folder: str) -> Optional[str]:
+    """
+    Feedback que devuelve un desarrollador tras una iteración de corrección.
+
+    Si todos los parches se aplicaron devuelve None y el auditor revisa el resultado.
+    Si alguno falló, el archivo sigue igual: se conserva el feedback con una nota que
+    pide esos archivos completos, para que el supervisor devuelva la tarea al mismo
+    desarrollador en lugar de auditar código sin cambios. Solo se reintenta una vez.
+    """
+    if not failed_patches:
+        return None
+    files = ", ".join(f"{folder}/{name}" for name in failed_patches)
+    if is_patch_retry(feedback):
+        print(f"ADVERTENCIA: Parches no aplicados de nuevo ({files}); se pasa al auditor.")
+        return None
+    print(f"ADVERTENCIA: Parches no aplicados ({files}); se piden los archivos completos.")
+    names = ", ".join(f"`{name}`" for name in failed_patches)
+    return (
+        f"{feedback or ''}\n\n"
+        f"{PATCH_RETRY_MARKER}:** los diffs de {names} no coincidían con el archivo actual y NO se aplicaron. "
+        f"Envía esos archivos COMPLETOS (bloque con el nombre del archivo, sin `.patch`) con las correcciones."
+    )
@@ -1,10 +1,12 @@
 # Contenido para: src/tools/save_code_to_file.py
 
 import os
+from src.telemetry import measure
 
-def save_code_to_file(filename: str, code: str | None) -> str | None:
+def save_code_to_file(filename: str, code: str | None, base_dir: str = "outputs") -> str | None:
     """
-    Guarda el código generado en un archivo específico dentro de la carpeta 'outputs'.
+    Guarda el código generado en un archivo específico dentro de `base_dir`
+    (la carpeta de trabajo de la sesión, o 'outputs' por defecto).
     Puede manejar subdirectorios (ej: 'frontend/index.html').
     Sobrescribe el archivo si ya existe.
     """
@@ -13,16 +15,16 @@ def save_code_to_file(filename: str, code: str | None) -> str | None:
     
     try:
         # Construir la ruta completa del archivo
-        filepath = os.path.join("outputs", filename)
+        filepath = os.path.join(base_dir, filename)
         
         # --- CAMBIO CLAVE ---
-        # Obtener el directorio de la ruta del archivo (ej: 'outputs/frontend')
+        # Obtener el directorio de la ruta del archivo (ej: 'outputs/<sesión>/frontend')
         directory = os.path.dirname(filepath)
         
         # Asegurarse de que toda la estructura de directorios exista
         os.makedirs(directory, exist_ok=True)
         
-        with open(filepath, "w", encoding="utf-8") as f:
+        with measure("file_io"), open(filepath, "w", encoding="utf-8") as f:
             f.write(code)
             
         print(f"-> Código guardado/sobrescrito en '{filepath}'")
@@ -0,0 +1,201 @@
+# Contenido para: src/tools/uploads.py
+
+import os
+import re
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin serve.py hay un único proceso y basta el cerrojo de hilos
+    fcntl = None
+
+# Los archivos subidos se guardan por sesión del navegador y direccionados por contenido:
+# uploads/<session_id>/<sha256><extensión>. Dos subidas idénticas comparten archivo y
+# dos usuarios nunca se pisan aunque usen el mismo nombre.
+UPLOADS_ROOT = "uploads"
+MAX_UPLOAD_FILE_BYTES = int(float(os.getenv("MAX_UPLOAD_FILE_MB", 200)) * 1024 * 1024)
+MAX_UPLOAD_SESSION_BYTES = int(float(os.getenv("MAX_UPLOAD_SESSION_MB", 500)) * 1024 * 1024)
+UPLOAD_RETENTION_HOURS = float(os.getenv("UPLOAD_RETENTION_HOURS", 24))
+# Se acumulan los trozos de la petición hasta este tamaño antes de cada escritura en disco.
+UPLOAD_WRITE_CHUNK_BYTES = 1024 * 1024
+
+# Serializa la comprobación final del presupuesto y el renombrado entre subidas concurrentes.
+_commit_lock = threading.Lock()
+
+_SAFE_ID = re.compile(r"^[\w-]+$")
+_FILE_ID = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]{1,10})?$")
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+class UploadTooLargeError(ValueError):
+    """El archivo o el total de la sesión supera el límite configurado (HTTP 413)."""
+
+
+def get_upload_session_dir(session_id: str) -> str:
+    if not session_id or not _SAFE_ID.match(session_id):
+        raise ValueError(f"Identificador de sesión no válido: {session_id!r}")
+    return os.path.join(UPLOADS_ROOT, session_id)
+
+
+def _safe_extension(filename: str) -> str:
+    """Solo se conserva la extensión del nombre del cliente (nunca se usa como ruta)."""
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return extension if _EXTENSION.match(extension) else ""
+
+
+def session_usage_bytes(session_dir: str, include_partial: bool = True) -> int:
+    """Bytes ocupados por la sesión; sin `include_partial` solo cuentan las subidas terminadas."""
+    if not os.path.isdir(session_dir):
+        return 0
+    return sum(
+        entry.stat().st_size for entry in os.scandir(session_dir)
+        if entry.is_file() and (include_partial or not entry.name.startswith("."))
+    )
+
+
+@contextmanager
+def _session_lock(session_dir: str):
+    """Cerrojo exclusivo de la sesión, entre hilos y (con fcntl) entre los workers de serve.py."""
+    with _commit_lock, open(os.path.join(session_dir, ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _commit_upload(session_dir: str, temp_path: str, final_path: str, size: int) -> bool:
+    """
+    Mueve la subida a su ruta definitiva. El presupuesto de la sesión se vuelve a
+    comprobar bajo el cerrojo: la comprobación inicial de cada petición no ve lo que
+    suben a la vez otras peticiones de la misma sesión. Devuelve si era un duplicado.
+
+    Raises:
+        UploadTooLargeError: si con este archivo se supera el límite de la sesión.
+    """
+    with _session_lock(session_dir):
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+            os.utime(final_path)  # renueva la retención
+            return True
+        committed = session_usage_bytes(session_dir, include_partial=False)
+        if committed + size > MAX_UPLOAD_SESSION_BYTES:
+            os.remove(temp_path)
+            raise UploadTooLargeError(_limit_message(size, MAX_UPLOAD_SESSION_BYTES - committed))
+        os.replace(temp_path, final_path)
+        return False
+
+
+def _write_and_hash(f, hasher, data: bytes) -> None:
+    f.write(data)
+    hasher.update(data)
+
+
+async def store_upload_stream(
+    chunks: AsyncIterator[bytes], filename: str, session_id: str, declared_size: int | None = None
+) -> dict:
+    """
+    Guarda un archivo a partir de un flujo de bytes sin cargarlo entero en memoria.
+
+    Escribe en un archivo temporal por bloques grandes (en un hilo, para no bloquear el
+    event loop) mientras calcula el SHA-256, aplica los límites por archivo y por sesión,
+    y al terminar lo renombra a su nombre direccionado por contenido (o lo descarta si
+    ya existía uno idéntico), volviendo a comprobar el límite de la sesión bajo su cerrojo.
+
+    Raises:
+        UploadTooLargeError: si se supera algún límite (el archivo parcial se elimina).
+    """
+    session_dir = get_upload_session_dir(session_id)
+    os.makedirs(session_dir, exist_ok=True)
+    session_budget = MAX_UPLOAD_SESSION_BYTES - await asyncio.to_thread(session_usage_bytes, session_dir)
+    limit = min(MAX_UPLOAD_FILE_BYTES, session_budget)
+    if declared_size is not None and declared_size > limit:
+        raise UploadTooLargeError(_limit_message(declared_size, session_budget))
+
+    temp_path = os.path.join(session_dir, f".partial-{uuid.uuid4().hex}")
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        with open(temp_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLargeError(_limit_message(size, session_budget))
+                buffer += chunk
+                if len(buffer) >= UPLOAD_WRITE_CHUNK_BYTES:
+                    await asyncio.to_thread(_write_and_hash, f, hasher, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(_write_and_hash, f, hasher, bytes(buffer))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    digest = hasher.hexdigest()
+    file_id = f"{digest}{_safe_extension(filename)}"
+    final_path = os.path.join(session_dir, file_id)
+    deduplicated = await asyncio.to_thread(_commit_upload, session_dir, temp_path, final_path, size)
+    print(f"Herramienta 'uploads': '{filename}' -> '{final_path}' ({size} bytes{', duplicado' if deduplicated else ''})")
+    return {
+        "name": os.path.basename(filename or file_id),
+        "file_id": file_id,
+        "sha256": digest,
+        "size": size,
+        "deduplicated": deduplicated,
+    }
+
+
+def _limit_message(size: int, session_budget: int) -> str:
+    if size > MAX_UPLOAD_FILE_BYTES:
+        return f"El archivo supera el límite de {MAX_UPLOAD_FILE_BYTES // (1024 * 1024)} MB."
+    return f"La sesión supera su límite de {MAX_UPLOAD_SESSION_BYTES // (1024 * 1024)} MB (quedan {max(0, session_budget)} bytes)."
+
+
+def resolve_upload_paths(session_id: str, file_ids: List[str]) -> List[str]:
+    """Convierte los identificadores enviados por el cliente en rutas, ignorando los no válidos."""
+    if not file_ids:
+        return []
+    session_dir = get_upload_session_dir(session_id)
+    paths = []
+    for file_id in file_ids:
+        path = os.path.join(session_dir, file_id)
+        if _FILE_ID.match(file_id or "") and os.path.isfile(path):
+            os.utime(path)  # un archivo reutilizado renueva su retención
+            paths.append(path)
+        else:
+            print(f"Advertencia: archivo subido desconocido para la sesión {session_id}: {file_id!r}")
+    return paths
+
+
+def cleanup_uploads(max_age_hours: float | None = None) -> int:
+    """
+    Política de retención: elimina las carpetas de subida cuyas sesiones llevan
+    `max_age_hours` horas sin subir ni reutilizar archivos.
+    """
+    max_age_hours = UPLOAD_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    if not os.path.isdir(UPLOADS_ROOT):
+        return 0
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(UPLOADS_ROOT):
+        if not entry.is_dir() or not _SAFE_ID.match(entry.name):
+            continue
+        last_used = max([f.stat().st_mtime for f in os.scandir(entry.path)] or [entry.stat().st_mtime])
+        if last_used < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"Herramienta 'uploads': Eliminadas {removed} carpetas de subida caducadas.")
+    return removed
@@ -0,0 +1,72 @@
+# Contenido para: src/tools/workspace.py
+
+import os
+import re
+import time
+import shutil
+
+# Cada tarea (thread_id) escribe su código en su propia carpeta dentro de outputs/,
+# así las sesiones concurrentes no se pisan archivos ni el auditor revisa código ajeno.
+OUTPUTS_ROOT = "outputs"
+WORKSPACE_RETENTION_HOURS = float(os.getenv("WORKSPACE_RETENTION_HOURS", 24))
+
+_SAFE_ID = re.compile(r"^[\w-]+$")
+# Solo las carpetas con la forma de un thread_id de main.py (uuid4) son de sesión;
+# outputs/frontend, outputs/backend, etc. y las carpetas del usuario no se tocan.
+_SESSION_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$")
+
+
+def get_workspace_dir(thread_id: str) -> str:
+    """
+    Devuelve la carpeta de trabajo de una sesión. No la crea: `save_code_to_file`
+    la creará cuando se guarde el primer archivo (las tareas de solo conversación
+    no dejan carpetas vacías).
+
+    Args:
+        thread_id: Identificador de la sesión creado en main.py.
+
+    Returns:
+        La ruta de la carpeta, p. ej. 'outputs/<thread_id>'.
+    """
+    if not _SAFE_ID.match(thread_id):
+        raise ValueError(f"Identificador de sesión no válido: {thread_id!r}")
+    return os.path.join(OUTPUTS_ROOT, thread_id)
+
+
+def _last_modified(folder: str) -> float:
+    """Fecha del archivo más reciente de la carpeta (reescribir un archivo anidado
+    no cambia la fecha de la carpeta raíz)."""
+    newest = os.stat(folder).st_mtime
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+            except OSError:
+                continue
+    return newest
+
+
+def cleanup_workspaces(max_age_hours: float | None = None) -> int:
+    """
+    Política de retención: elimina las carpetas de sesión (las que crea
+    `get_workspace_dir` para un thread_id) sin archivos modificados en las
+    últimas `max_age_hours` horas.
+
+    Returns:
+        El número de carpetas eliminadas.
+    """
+    max_age_hours = WORKSPACE_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    if not os.path.isdir(OUTPUTS_ROOT):
+        return 0
+
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(OUTPUTS_ROOT):
+        if not entry.is_dir(follow_symlinks=False) or not _SESSION_DIR.match(entry.name):
+            continue
+        if _last_modified(entry.path) < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"Herramienta 'workspace': Eliminadas {removed} carpetas de sesión caducadas.")
+    return removed
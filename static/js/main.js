@@ -4,13 +4,9 @@ import { initTheme } from './modules/theme.js';
 import { initFileHandler } from './modules/fileHandler.js';
 import { initWebSocket } from './modules/websocketHandler.js';
 import { initFormHandler } from './modules/formHandler.js';
-import { initializeHistory } from './modules/chatState.js'; // <-- CAMBIO CLAVE: Importar el inicializador
 
 document.addEventListener("DOMContentLoaded", () => {
     console.log("DOM cargado. Inicializando aplicación...");
-    
-    // <-- CAMBIO CLAVE: Inicializa el historial del chat al cargar la página
-    initializeHistory();
 
     // 1. Configura funcionalidades que no dependen de otras
     initTheme();
@@ -0,0 +1,26 @@
+// Contenido para: static/js/modules/artifacts.js
+
+// El servidor envía el código y los textos largos como referencias
+// ({ artifact, size, path }) y su contenido se descarga aparte de /artifacts/<sha256>.
+const artifactRequests = new Map();
+
+/**
+ * Devuelve (como promesa) el texto de un artefacto. Acepta también texto plano,
+ * que se devuelve tal cual. Cada artefacto se descarga una sola vez.
+ * @param {string|{artifact: string}} value
+ */
+export function loadArtifact(value) {
+    if (typeof value === "string") return Promise.resolve(value);
+    if (!value || !value.artifact) return Promise.resolve("");
+
+    if (!artifactRequests.has(value.artifact)) {
+        const request = fetch(`/artifacts/${value.artifact}`).then((response) => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.text();
+        });
+        // Si falla, se permite reintentar en el siguiente evento.
+        request.catch(() => artifactRequests.delete(value.artifact));
+        artifactRequests.set(value.artifact, request);
+    }
+    return artifactRequests.get(value.artifact);
+}
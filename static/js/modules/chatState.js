@@ -1,28 +1,19 @@
 // Contenido para: static/js/modules/chatState.js
 
-// Este módulo simple mantiene el estado de la conversación en el frontend.
-export let chat_history = [];
+// Este módulo mantiene el identificador de la conversación. El historial y su
+// resumen viven en el servidor (memoria por sesión), así que no se reenvían.
 
-/**
- * Inicializa el historial con el saludo del bot.
- * Se llama una vez cuando la aplicación se carga.
- */
-export function initializeHistory() {
-    // Asegurarse de que el historial esté vacío antes de inicializar
-    if (chat_history.length === 0) {
-        const initialBotMessage = "¡Hola! Soy DevTeam-Bot. ¿En qué puedo ayudarte hoy?";
-        chat_history.push(`Bot: ${initialBotMessage}`);
-    }
-}
+const SESSION_KEY = "devteam_session_id";
 
 /**
- * Añade una nueva entrada al historial de la conversación.
- * @param {string} role - 'Usuario' o 'Bot'.
- * @param {string} message - El contenido del mensaje.
+ * Identificador de la sesión del navegador (una por pestaña). El servidor guarda
+ * los archivos subidos y la memoria de la conversación bajo este identificador.
  */
-export function addToHistory(role, message) {
-    // Evitar añadir mensajes de estado o vacíos al historial conversacional
-    if (message && message.trim().length > 0) {
-        chat_history.push(`${role}: ${message}`);
+export function getSessionId() {
+    let sessionId = sessionStorage.getItem(SESSION_KEY);
+    if (!sessionId) {
+        sessionId = crypto.randomUUID();
+        sessionStorage.setItem(SESSION_KEY, sessionId);
     }
+    return sessionId;
 }
\ No newline at end of file
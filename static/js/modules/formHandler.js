@@ -3,24 +3,28 @@
 import { addMessage, selectors } from './ui.js';
 import { getSelectedFiles, clearSelectedFiles } from './fileHandler.js';
 // <-- CAMBIO CLAVE: Importar el estado del chat y la función para añadir al historial
-import { chat_history, addToHistory } from './chatState.js';
+import { getSessionId } from './chatState.js';
 
 let isThinking = false;
 
 async function uploadFiles() {
-    // ... (El código de esta función no cambia) ...
+    // Cada archivo se envía como cuerpo de la petición: el servidor lo escribe por
+    // bloques mientras llega y devuelve su identificador direccionado por contenido.
     const files = getSelectedFiles();
     if (files.length === 0) return [];
-    const formData = new FormData();
-    files.forEach(file => formData.append("files", file));
+    const sessionId = getSessionId();
     try {
-        const response = await fetch("/upload", { method: "POST", body: formData });
-        const result = await response.json();
-        if (!response.ok) throw new Error(result.error || "Error al subir archivos.");
-        //addMessage(`<i>Archivos subidos: ${result.filenames.join(", ")}</i>`, 'agent-status');
-        return result.filenames;
+        const fileIds = [];
+        for (const file of files) {
+            const url = `/upload/${sessionId}?filename=${encodeURIComponent(file.name)}`;
+            const response = await fetch(url, { method: "PUT", body: file });
+            const result = await response.json();
+            if (!response.ok) throw new Error(result.error || `Error al subir ${file.name}.`);
+            fileIds.push(result.file_id);
+        }
+        return fileIds;
     } catch (error) {
-        addMessage(`<i>Error de red al subir: ${error.message}</i>`, 'agent-status');
+        addMessage(`<i>Error al subir: ${error.message}</i>`, 'agent-status');
         return null;
     }
 }
@@ -34,29 +38,27 @@ export function initFormHandler(socket) {
         if ((!message.trim() && getSelectedFiles().length === 0) || isThinking) return;
 
         addMessage(message, "user");
-        // <-- CAMBIO CLAVE: Actualiza el historial con el mensaje del usuario
-        addToHistory("Usuario", message); 
-        
+
         selectors.messageInput.value = "";
         selectors.messageInput.disabled = true;
         isThinking = true;
         //addMessage("<i>DevTeam-Bot está pensando...</i>", 'agent-status');
 
-        const uploadedFileNames = await uploadFiles();
+        const uploadedFileIds = await uploadFiles();
 
-        if (uploadedFileNames === null) {
+        if (uploadedFileIds === null) {
             isThinking = false;
             selectors.messageInput.disabled = false;
             return;
         }
         
-        // <-- CAMBIO CLAVE: El payload ahora incluye el historial completo
+        // El historial no viaja: el servidor lo recupera de la memoria de la sesión.
         const payload = {
             user_input: message,
-            file_names: uploadedFileNames,
-            chat_history: chat_history 
+            session_id: getSessionId(),
+            file_ids: uploadedFileIds
         };
-        console.log("Enviando payload con historial al WebSocket:", payload);
+        console.log("Enviando payload al WebSocket:", payload);
         socket.send(JSON.stringify(payload));
     });
     
@@ -4,7 +4,7 @@ export const selectors = {
     fileListDiv: document.getElementById("file-list"),
 };
 
-export function addMessage(content, type, options = {}) {
+function buildMessage(content, type, options) {
     const messageDiv = document.createElement("div");
     messageDiv.classList.add("message", `${type}-message`);
 
@@ -56,6 +56,59 @@ export function addMessage(content, type, options = {}) {
         p.innerHTML = (type === 'bot') ? marked.parse(content) : content;
         messageDiv.appendChild(p);
     }
-    selectors.chatBox.appendChild(messageDiv);
+    return messageDiv;
+}
+
+export function addMessage(content, type, options = {}) {
+    selectors.chatBox.appendChild(buildMessage(content, type, options));
     selectors.chatBox.scrollTop = selectors.chatBox.scrollHeight;
-}
\ No newline at end of file
+}
+
+/**
+ * Reserva el hueco de un mensaje cuyo contenido llega más tarde (p. ej. un artefacto
+ * que se descarga aparte), para que los mensajes conserven su orden en el chat.
+ */
+export function addPendingMessage(contentPromise, type, options = {}) {
+    const placeholder = document.createElement("div");
+    placeholder.classList.add("message", "agent-status-message");
+    placeholder.innerHTML = "<i>Cargando...</i>";
+    selectors.chatBox.appendChild(placeholder);
+    selectors.chatBox.scrollTop = selectors.chatBox.scrollHeight;
+
+    contentPromise
+        .then((content) => {
+            placeholder.replaceWith(buildMessage(content, type, options));
+            selectors.chatBox.scrollTop = selectors.chatBox.scrollHeight;
+        })
+        .catch((error) => {
+            placeholder.innerHTML = `<i>No se pudo cargar el contenido: ${error.message}</i>`;
+        });
+}
+
+/**
+ * Crea una burbuja que se va rellenando con los tokens que llegan por el WebSocket.
+ * Se muestra como texto plano y se elimina cuando llega el resultado final del nodo.
+ */
+export function createStreamingMessage(label) {
+    const messageDiv = document.createElement("div");
+    messageDiv.classList.add("message", "bot-message", "streaming-message");
+
+    const header = document.createElement("small");
+    header.textContent = label;
+    const pre = document.createElement("pre");
+    messageDiv.appendChild(header);
+    messageDiv.appendChild(pre);
+    selectors.chatBox.appendChild(messageDiv);
+
+    return {
+        setText: (text) => {
+            pre.textContent = text;
+            selectors.chatBox.scrollTop = selectors.chatBox.scrollHeight;
+        },
+        appendText: (text) => {
+            pre.append(text);
+            selectors.chatBox.scrollTop = selectors.chatBox.scrollHeight;
+        },
+        remove: () => messageDiv.remove(),
+    };
+}
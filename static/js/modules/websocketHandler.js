@@ -1,32 +1,114 @@
 // Contenido para: static/js/modules/websocketHandler.js
 
-import { addMessage } from './ui.js';
-// <-- CAMBIO CLAVE: Importar la función para añadir al historial
-import { addToHistory } from './chatState.js';
+import { addMessage, addPendingMessage, createStreamingMessage } from './ui.js';
+import { loadArtifact } from './artifacts.js';
+import { getSessionId } from './chatState.js';
 
-function handleAgentMessage(nodeName, nodeOutput) {
-    const friendlyNodeName = nodeName.replace(/_/g, ' ').replace('agent', '').trim().toUpperCase();
+// Burbujas de streaming activas, una por nodo (varios nodos pueden generar en paralelo).
+const streamingBubbles = {};
+
+function friendlyName(nodeName) {
+    return nodeName.replace(/_/g, ' ').replace('agent', '').trim().toUpperCase();
+}
+
+function handleTokenMessage(nodeName, delta) {
+    let stream = streamingBubbles[nodeName];
+    if (!stream) {
+        stream = { text: "", shown: 0, bubble: createStreamingMessage(`${friendlyName(nodeName)} escribiendo...`) };
+        streamingBubbles[nodeName] = stream;
+    }
+    stream.text += delta;
+    let start = 0;
+    // El agente conversacional antepone su decisión; solo se muestra la respuesta.
+    if (nodeName === 'conversational_agent') {
+        if (stream.start === undefined) {
+            const responseIndex = stream.text.indexOf("[RESPONSE]");
+            if (responseIndex < 0) return;
+            stream.start = responseIndex + "[RESPONSE]".length;
+        }
+        if (stream.shown === 0) {
+            while (/\s/.test(stream.text.charAt(stream.start))) stream.start++;
+        }
+        start = stream.start;
+    }
+    // Solo se añade a la burbuja el texto nuevo, sin volver a pintar lo anterior.
+    const pending = stream.text.slice(start + stream.shown);
+    if (pending) {
+        stream.bubble.appendText(pending);
+        stream.shown += pending.length;
+    }
+}
+
+function clearStreamingBubble(nodeName) {
+    const stream = streamingBubbles[nodeName];
+    if (stream) {
+        stream.bubble.remove();
+        delete streamingBubbles[nodeName];
+    }
+}
+
+// --- Estado de la tarea reconstruido a partir de los deltas de `node_finished` ---
+let taskState = {};
+
+/**
+ * Aplica un delta al estado local y devuelve solo lo que cambió, para que cada
+ * evento pinte únicamente lo nuevo (p. ej. el archivo modificado, no los tres).
+ */
+function applyDelta(message) {
+    const changed = {};
+    for (const [field, value] of Object.entries(message.set || {})) {
+        taskState[field] = value;
+        changed[field] = value;
+    }
+    for (const [field, entries] of Object.entries(message.patch || {})) {
+        const merged = { ...(taskState[field] || {}) };
+        changed[field] = {};
+        for (const [key, value] of Object.entries(entries)) {
+            if (value === null) {
+                delete merged[key];
+            } else {
+                merged[key] = value;
+                changed[field][key] = value;
+            }
+        }
+        taskState[field] = merged;
+    }
+    for (const [field, items] of Object.entries(message.append || {})) {
+        taskState[field] = (taskState[field] || []).concat(items);
+        changed[field] = items;
+    }
+    return changed;
+}
+
+function handleNodeStarted(nodeName) {
+    const friendlyNodeName = friendlyName(nodeName);
     if (friendlyNodeName && !["SUPERVISOR", "CONVERSATIONAL", "MULTIMODAL ANALYZER"].includes(friendlyNodeName)) {
         addMessage(`<i>Paso: ${friendlyNodeName}</i>`, 'agent-status');
     }
+}
+
+function renderCodeFiles(files) {
+    for (const [lang, code] of Object.entries(files)) {
+        if (code) addPendingMessage(loadArtifact(code), 'bot', { isCode: true, lang });
+    }
+}
 
-    if (!nodeOutput) return;
+function handleNodeFinished(nodeName, changed) {
+    clearStreamingBubble(nodeName);
 
-    if (nodeName === 'conversational_agent' && nodeOutput.final_response) {
-        const botResponse = marked.parse(nodeOutput.final_response);
+    if (nodeName === 'conversational_agent' && changed.final_response) {
+        const botResponse = marked.parse(changed.final_response);
         addMessage(botResponse, 'bot');
-        addToHistory("Bot", nodeOutput.final_response); 
     }
-    if (nodeOutput.ui_ux_spec) {
-        addMessage(marked.parse(nodeOutput.ui_ux_spec), 'bot');
-        addToHistory("Bot", nodeOutput.ui_ux_spec);
+    if (changed.ui_ux_spec) {
+        addPendingMessage(loadArtifact(changed.ui_ux_spec).then((text) => marked.parse(text)), 'bot');
     }
-    if (nodeOutput.analysis_result) {
-        addMessage(marked.parse(nodeOutput.analysis_result), 'bot');
-        addToHistory("Bot", nodeOutput.analysis_result); 
+    if (changed.analysis_result) {
+        addPendingMessage(loadArtifact(changed.analysis_result).then((text) => marked.parse(text)), 'bot');
     }
-    if (nodeOutput.dev_plan) {
-        const plan = nodeOutput.dev_plan;
+    if (changed.dev_plan) {
+        // El delta puede traer solo algunas claves: se pinta el plan completo.
+        const plan = taskState.dev_plan;
         let planHtml = "<h4>Plan de Desarrollo</h4><ul>" +
             (plan.plan_type ? `<li><strong>Tipo:</strong> ${plan.plan_type}</li>` : '') +
             (plan.frontend_task ? `<li><strong>Tarea Frontend:</strong> ${plan.frontend_task}</li>` : '') +
@@ -35,65 +117,129 @@ function handleAgentMessage(nodeName, nodeOutput) {
             "</ul>";
 
         addMessage(planHtml, 'bot');
+    }
+    if (nodeName === 'develop_frontend' && changed.frontend_code) renderCodeFiles(changed.frontend_code);
+    if (nodeName === 'database_architech' && changed.db_schema) renderCodeFiles(changed.db_schema);
+    if (nodeName === 'develop_backend' && changed.backend_code) renderCodeFiles(changed.backend_code);
+}
 
-        const planTextParts = ["Plan de Desarrollo:"];
-        if (plan.plan_type) planTextParts.push(`Tipo=${plan.plan_type}`);
-        if (plan.frontend_task) planTextParts.push(`Tarea Frontend=${plan.frontend_task}`);
-        if (plan.backend_task) planTextParts.push(`Tarea Backend=${plan.backend_task}`); 
+function handleAuditVerdict(message) {
+    if (!message.feedback) return;
+    const prefix = message.approved ? "Auditoría" : "Feedback del Auditor";
+    addMessage(`**${prefix}:** ${message.feedback}`, 'bot');
+}
 
+// --- Protocolo de eventos (ver src/events.py) ---
+const PROTOCOL_VERSION = 1;
+
+function supportsZstd() {
+    try {
+        new DecompressionStream("zstd");
+        return true;
+    } catch {
+        return false;
     }
-    if (nodeName === 'develop_frontend' && nodeOutput.frontend_code) {
-        for (const [lang, code] of Object.entries(nodeOutput.frontend_code)) {
-            if (code) addMessage(code, 'bot', { isCode: true, lang });
-        }
-    }
-    if (nodeName === 'database_architech' && nodeOutput.db_schema) {
-        for (const [lang, code] of Object.entries(nodeOutput.db_schema)) {
-            if (code) addMessage(code, 'bot', { isCode: true, lang });
-        }
-    }
-    if (nodeName === 'develop_backend' && nodeOutput.backend_code) {
-        for (const [lang, code] of Object.entries(nodeOutput.backend_code)) {
-            if (code) addMessage(code, 'bot', { isCode: true, lang });
-        }
-    }
-    if (nodeName === 'quality_auditor' && nodeOutput.feedback) {
-        const prefix = nodeOutput.code_approved ? "Auditoría" : "Feedback del Auditor";
-        const feedbackMessage = `**${prefix}:** ${nodeOutput.feedback}`;
-        addMessage(feedbackMessage, 'bot');
-        addToHistory("Bot", feedbackMessage); // <-- CAMBIO CLAVE
-    }
 }
 
+// Los frames binarios son mensajes comprimidos con zstd; los de texto, JSON sin comprimir.
+async function decodeFrame(data) {
+    if (typeof data === "string") return JSON.parse(data);
+    const stream = data.stream().pipeThrough(new DecompressionStream("zstd"));
+    return JSON.parse(await new Response(stream).text());
+}
+
+// Tarea en curso: si la conexión se corta, al reconectar se pide al servidor que la reanude.
+const ACTIVE_THREAD_KEY = "devteam_active_thread";
+const MAX_RECONNECT_DELAY_MS = 10000;
+
 export function initWebSocket(callbacks) {
-    // ... (El código de esta función no cambia) ...
-    const socket = new WebSocket(`ws://${window.location.host}/ws`);
-    socket.onerror = () => addMessage("Error de conexión. Por favor, refresca la página.", "bot");
-
-    socket.onmessage = (event) => {
-        const eventData = JSON.parse(event.data);
-        console.log("Mensaje recibido del servidor:", eventData);
-
-        if (eventData.error) {
-            addMessage(`Error del servidor: ${eventData.error}`, 'agent-status');
-            callbacks.onDone();
-            return;
-        }
-        if (eventData.type === "done") {
-            callbacks.onDone();
-            return;
-        }
-        if (eventData.type === "final_response") {
-            const finalMessage = marked.parse(eventData.content);
-            addMessage(finalMessage, 'bot');
-            addToHistory("Bot", eventData.content); // <-- CAMBIO CLAVE
-            return;
-        }
+    let socket = null;
+    let reconnectDelay = 500;
 
-        const nodeName = Object.keys(eventData)[0];
-        if (nodeName) {
-            handleAgentMessage(nodeName, eventData[nodeName]);
+    // Envoltorio estable: el resto de módulos siempre envían por la conexión vigente.
+    const connection = {
+        send(data) {
+            if (socket && socket.readyState === WebSocket.OPEN) {
+                socket.send(data);
+            } else {
+                addMessage("<i>Sin conexión con el servidor. Reintentando...</i>", 'agent-status');
+                callbacks.onDone();
+            }
         }
     };
-    return socket;
-}
\ No newline at end of file
+
+    function connect() {
+        socket = new WebSocket(`ws://${window.location.host}/ws`);
+        // Los mensajes se procesan en orden aunque alguno tarde más en descomprimirse.
+        let messageQueue = Promise.resolve();
+        socket.onopen = () => {
+            reconnectDelay = 500;
+            socket.send(JSON.stringify({
+                type: "hello",
+                protocol: PROTOCOL_VERSION,
+                compression: supportsZstd() ? ["zstd"] : [],
+            }));
+            const activeThread = sessionStorage.getItem(ACTIVE_THREAD_KEY);
+            if (activeThread) {
+                addMessage("<i>Reconectado. Reanudando la tarea en curso...</i>", 'agent-status');
+                socket.send(JSON.stringify({ resume_thread_id: activeThread, session_id: getSessionId() }));
+            }
+        };
+        socket.onclose = () => {
+            setTimeout(connect, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY_MS);
+        };
+        socket.onerror = () => console.warn("Error de conexión con el servidor.");
+        socket.onmessage = (event) => {
+            messageQueue = messageQueue
+                .then(() => decodeFrame(event.data))
+                .then(handleServerMessage)
+                .catch((error) => console.error("Mensaje del servidor no válido:", error));
+        };
+    }
+
+    function handleServerMessage(message) {
+        console.log("Mensaje recibido del servidor:", message);
+
+        switch (message.type) {
+            case "hello":
+                if (message.protocol !== PROTOCOL_VERSION) {
+                    console.warn(`Protocolo del servidor v${message.protocol}, cliente v${PROTOCOL_VERSION}.`);
+                }
+                break;
+            case "session":
+                taskState = {};
+                sessionStorage.setItem(ACTIVE_THREAD_KEY, message.thread_id);
+                break;
+            case "node_started":
+                handleNodeStarted(message.node);
+                break;
+            case "token":
+                handleTokenMessage(message.node, message.delta);
+                break;
+            case "file_written":
+                addMessage(`<i>Archivo generado: ${message.file}</i>`, 'agent-status');
+                break;
+            case "node_finished":
+                handleNodeFinished(message.node, applyDelta(message));
+                break;
+            case "audit_verdict":
+                handleAuditVerdict(message);
+                break;
+            case "done":
+                sessionStorage.removeItem(ACTIVE_THREAD_KEY);
+                callbacks.onDone();
+                break;
+            case "error":
+                addMessage(`Error del servidor: ${message.message}`, 'agent-status');
+                sessionStorage.removeItem(ACTIVE_THREAD_KEY);
+                callbacks.onDone();
+                break;
+            default:
+                console.warn("Tipo de mensaje desconocido:", message.type);
+        }
+    }
+
+    connect();
+    return connection;
+}